@@ -0,0 +1,446 @@
+#!/usr/bin/env python3
+"""
+US street address canonicalization and stable address keys.
+
+Provider requests, the result caches and comparable deduplication all key
+on addresses, and users and providers spell the same address many ways
+("123 Main Street Apt. 4" and "123 MAIN ST #4"). parse() splits an address
+into USPS components, standardizing case, whitespace, punctuation, street
+suffixes (Publication 28 abbreviations), directionals, ordinal street
+names, secondary unit designators and state names:
+
+    canonical()  one-line USPS style form, "123 N MAIN ST APT 4, SAN
+                 FRANCISCO, CA 94105", used when sending an address to a
+                 provider so that equal addresses produce equal requests
+    key()        stable 32-character hex digest of the parts that identify
+                 a delivery point (street line and unit, plus the ZIP code,
+                 or city and state when there is no ZIP)
+
+Structured fields (unit, city, state, ZIP) passed alongside the address
+take precedence over anything parsed out of the address string.
+Parsing is a single pass of dictionary lookups over the tokens, and
+results are memoized per input, so repeated addresses cost one dict hit.
+
+Usage:
+    python scripts/address_key.py parse "123 Main Street Apt. 4, San Francisco, CA 94105"
+    python scripts/address_key.py bench [count]
+"""
+import re
+import sys
+import json
+import time
+import random
+import hashlib
+from functools import lru_cache
+from collections import namedtuple
+
+ParsedAddress = namedtuple(
+    "ParsedAddress",
+    "number predirectional name suffix postdirectional unit_type unit city state zip_code"
+)
+
+# Memoized parses kept per process
+CACHE_SIZE = 65536
+
+# USPS Publication 28, Appendix C1: common suffix spellings -> abbreviation
+_SUFFIXES = {
+    "ALLEY": "ALY", "ALY": "ALY", "ANNEX": "ANX", "ANX": "ANX", "ARCADE": "ARC", "ARC": "ARC",
+    "AVENUE": "AVE", "AVE": "AVE", "AV": "AVE", "AVEN": "AVE", "AVENU": "AVE", "AVN": "AVE", "AVNUE": "AVE",
+    "BAYOU": "BYU", "BEACH": "BCH", "BCH": "BCH", "BEND": "BND", "BND": "BND", "BLUFF": "BLF", "BLF": "BLF",
+    "BOULEVARD": "BLVD", "BLVD": "BLVD", "BOUL": "BLVD", "BOULV": "BLVD", "BRANCH": "BR", "BR": "BR",
+    "BRIDGE": "BRG", "BRG": "BRG", "BROOK": "BRK", "BRK": "BRK", "BYPASS": "BYP", "BYP": "BYP",
+    "CAMP": "CP", "CP": "CP", "CANYON": "CYN", "CYN": "CYN", "CAPE": "CPE", "CPE": "CPE",
+    "CAUSEWAY": "CSWY", "CSWY": "CSWY", "CENTER": "CTR", "CENTRE": "CTR", "CTR": "CTR", "CIRCLE": "CIR",
+    "CIR": "CIR", "CIRC": "CIR", "CLIFF": "CLF", "CLF": "CLF", "CLUB": "CLB", "CLB": "CLB",
+    "COMMON": "CMN", "CMN": "CMN", "CORNER": "COR", "COR": "COR", "COURSE": "CRSE", "CRSE": "CRSE",
+    "COURT": "CT", "CT": "CT", "COURTS": "CTS", "CTS": "CTS", "COVE": "CV", "CV": "CV", "CREEK": "CRK",
+    "CRK": "CRK", "CRESCENT": "CRES", "CRES": "CRES", "CROSSING": "XING", "XING": "XING",
+    "DALE": "DL", "DL": "DL", "DAM": "DM", "DM": "DM", "DIVIDE": "DV", "DV": "DV", "DRIVE": "DR",
+    "DR": "DR", "DRIV": "DR", "DRV": "DR", "DRIVES": "DRS", "DRS": "DRS", "ESTATE": "EST", "EST": "EST",
+    "ESTATES": "ESTS", "ESTS": "ESTS", "EXPRESSWAY": "EXPY", "EXPY": "EXPY", "EXTENSION": "EXT",
+    "EXT": "EXT", "FALLS": "FLS", "FLS": "FLS", "FERRY": "FRY", "FRY": "FRY", "FIELD": "FLD",
+    "FLD": "FLD", "FIELDS": "FLDS", "FLDS": "FLDS", "FLAT": "FLT", "FLT": "FLT", "FOREST": "FRST",
+    "FRST": "FRST", "FORK": "FRK", "FRK": "FRK", "FORT": "FT", "FT": "FT", "FREEWAY": "FWY",
+    "FWY": "FWY", "GARDEN": "GDN", "GDN": "GDN", "GARDENS": "GDNS", "GDNS": "GDNS", "GATEWAY": "GTWY",
+    "GTWY": "GTWY", "GLEN": "GLN", "GLN": "GLN", "GREEN": "GRN", "GRN": "GRN", "GROVE": "GRV",
+    "GRV": "GRV", "HARBOR": "HBR", "HBR": "HBR", "HAVEN": "HVN", "HVN": "HVN", "HEIGHTS": "HTS",
+    "HTS": "HTS", "HIGHWAY": "HWY", "HWY": "HWY", "HILL": "HL", "HL": "HL", "HILLS": "HLS", "HLS": "HLS",
+    "HOLLOW": "HOLW", "HOLW": "HOLW", "ISLAND": "IS", "IS": "IS", "JUNCTION": "JCT", "JCT": "JCT",
+    "KEY": "KY", "KY": "KY", "KNOLL": "KNL", "KNL": "KNL", "LAKE": "LK", "LK": "LK", "LAKES": "LKS",
+    "LKS": "LKS", "LANDING": "LNDG", "LNDG": "LNDG", "LANE": "LN", "LN": "LN", "LOOP": "LOOP",
+    "MALL": "MALL", "MANOR": "MNR", "MNR": "MNR", "MEADOW": "MDW", "MDW": "MDW", "MEADOWS": "MDWS",
+    "MDWS": "MDWS", "MILL": "ML", "ML": "ML", "MISSION": "MSN", "MSN": "MSN", "MOTORWAY": "MTWY",
+    "MTWY": "MTWY", "MOUNT": "MT", "MT": "MT", "MOUNTAIN": "MTN", "MTN": "MTN", "ORCHARD": "ORCH",
+    "ORCH": "ORCH", "OVAL": "OVAL", "OVERPASS": "OPAS", "OPAS": "OPAS", "PARK": "PARK", "PARKS": "PARK",
+    "PARKWAY": "PKWY", "PKWY": "PKWY", "PKY": "PKWY", "PASS": "PASS", "PATH": "PATH", "PIKE": "PIKE",
+    "PINES": "PNES", "PNES": "PNES", "PLACE": "PL", "PL": "PL", "PLAIN": "PLN", "PLN": "PLN",
+    "PLAINS": "PLNS", "PLNS": "PLNS", "PLAZA": "PLZ", "PLZ": "PLZ", "POINT": "PT", "PT": "PT",
+    "POINTE": "PT", "PORT": "PRT", "PRT": "PRT", "PRAIRIE": "PR", "PR": "PR", "RADIAL": "RADL",
+    "RADL": "RADL", "RANCH": "RNCH", "RNCH": "RNCH", "RIDGE": "RDG", "RDG": "RDG", "RIVER": "RIV",
+    "RIV": "RIV", "ROAD": "RD", "RD": "RD", "ROUTE": "RTE", "RTE": "RTE", "ROW": "ROW", "RUN": "RUN",
+    "SHORE": "SHR", "SHR": "SHR", "SPRING": "SPG", "SPG": "SPG", "SPRINGS": "SPGS", "SPGS": "SPGS",
+    "SQUARE": "SQ", "SQ": "SQ", "STATION": "STA", "STA": "STA", "STREAM": "STRM", "STRM": "STRM",
+    "STREET": "ST", "ST": "ST", "STR": "ST", "STRT": "ST", "STREETS": "STS", "STS": "STS",
+    "SUMMIT": "SMT", "SMT": "SMT", "TERRACE": "TER", "TER": "TER", "TERR": "TER", "TRACE": "TRCE",
+    "TRCE": "TRCE", "TRAIL": "TRL", "TRL": "TRL", "TRAILS": "TRL", "TUNNEL": "TUNL", "TUNL": "TUNL",
+    "TURNPIKE": "TPKE", "TPKE": "TPKE", "UNION": "UN", "UN": "UN", "VALLEY": "VLY", "VLY": "VLY",
+    "VIEW": "VW", "VW": "VW", "VILLAGE": "VLG", "VLG": "VLG", "VILLE": "VL", "VL": "VL", "VISTA": "VIS",
+    "VIS": "VIS", "WALK": "WALK", "WAY": "WAY", "WY": "WAY", "WELLS": "WLS", "WLS": "WLS",
+}
+
+_DIRECTIONS = {
+    "N": "N", "NORTH": "N", "S": "S", "SOUTH": "S", "E": "E", "EAST": "E", "W": "W", "WEST": "W",
+    "NE": "NE", "NORTHEAST": "NE", "NW": "NW", "NORTHWEST": "NW",
+    "SE": "SE", "SOUTHEAST": "SE", "SW": "SW", "SOUTHWEST": "SW",
+}
+
+# USPS Publication 28, Appendix C2: secondary unit designators
+_UNIT_TYPES = {
+    "APARTMENT": "APT", "APT": "APT", "BUILDING": "BLDG", "BLDG": "BLDG", "DEPARTMENT": "DEPT",
+    "DEPT": "DEPT", "FLOOR": "FL", "FL": "FL", "HANGAR": "HNGR", "HNGR": "HNGR", "LOT": "LOT",
+    "PIER": "PIER", "ROOM": "RM", "RM": "RM", "SLIP": "SLIP", "SPACE": "SPC", "SPC": "SPC",
+    "STOP": "STOP", "SUITE": "STE", "STE": "STE", "TRAILER": "TRLR", "TRLR": "TRLR", "UNIT": "UNIT",
+    "#": "#", "NO": "#", "NUMBER": "#",
+}
+# Designators that never take a unit number
+_UNIT_TYPES_WITHOUT_NUMBER = {"BASEMENT": "BSMT", "BSMT": "BSMT", "FRONT": "FRNT", "FRNT": "FRNT",
+                              "LOBBY": "LBBY", "LBBY": "LBBY", "LOWER": "LOWR", "LOWR": "LOWR",
+                              "PENTHOUSE": "PH", "PH": "PH", "REAR": "REAR", "UPPER": "UPPR", "UPPR": "UPPR"}
+
+_ORDINALS = {
+    "FIRST": "1ST", "SECOND": "2ND", "THIRD": "3RD", "FOURTH": "4TH", "FIFTH": "5TH",
+    "SIXTH": "6TH", "SEVENTH": "7TH", "EIGHTH": "8TH", "NINTH": "9TH", "TENTH": "10TH",
+    "ELEVENTH": "11TH", "TWELFTH": "12TH", "THIRTEENTH": "13TH", "FOURTEENTH": "14TH",
+    "FIFTEENTH": "15TH", "SIXTEENTH": "16TH", "SEVENTEENTH": "17TH", "EIGHTEENTH": "18TH",
+    "NINETEENTH": "19TH", "TWENTIETH": "20TH",
+}
+
+_STATES = {
+    "ALABAMA": "AL", "ALASKA": "AK", "ARIZONA": "AZ", "ARKANSAS": "AR", "CALIFORNIA": "CA",
+    "COLORADO": "CO", "CONNECTICUT": "CT", "DELAWARE": "DE", "DISTRICT OF COLUMBIA": "DC",
+    "FLORIDA": "FL", "GEORGIA": "GA", "HAWAII": "HI", "IDAHO": "ID", "ILLINOIS": "IL", "INDIANA": "IN",
+    "IOWA": "IA", "KANSAS": "KS", "KENTUCKY": "KY", "LOUISIANA": "LA", "MAINE": "ME", "MARYLAND": "MD",
+    "MASSACHUSETTS": "MA", "MICHIGAN": "MI", "MINNESOTA": "MN", "MISSISSIPPI": "MS", "MISSOURI": "MO",
+    "MONTANA": "MT", "NEBRASKA": "NE", "NEVADA": "NV", "NEW HAMPSHIRE": "NH", "NEW JERSEY": "NJ",
+    "NEW MEXICO": "NM", "NEW YORK": "NY", "NORTH CAROLINA": "NC", "NORTH DAKOTA": "ND", "OHIO": "OH",
+    "OKLAHOMA": "OK", "OREGON": "OR", "PENNSYLVANIA": "PA", "PUERTO RICO": "PR", "RHODE ISLAND": "RI",
+    "SOUTH CAROLINA": "SC", "SOUTH DAKOTA": "SD", "TENNESSEE": "TN", "TEXAS": "TX", "UTAH": "UT",
+    "VERMONT": "VT", "VIRGINIA": "VA", "WASHINGTON": "WA", "WEST VIRGINIA": "WV", "WISCONSIN": "WI",
+    "WYOMING": "WY", "GUAM": "GU", "VIRGIN ISLANDS": "VI",
+}
+_STATE_CODES = set(_STATES.values())
+for _code in _STATE_CODES:
+    _STATES[_code] = _code
+
+# Periods and apostrophes vanish ("N.W." -> "NW", "O'Farrell" -> "OFARRELL");
+# other punctuation separates tokens; "#" and "/" are always their own token
+_REPLACEMENTS = ((".", ""), ("'", ""), ("#", " # "), ("/", " / "), (";", " "), (":", " "),
+                 ('"', " "), ("(", " "), (")", " "))
+# Last words of state names longer than one word
+_STATE_LAST_WORDS = {name.split()[-1] for name in _STATES if " " in name}
+_ZIP = re.compile(r"^(\d{5})(?:-?\d{4})?$")
+
+
+def _take_zip_and_state(tokens):
+    """
+    Pop a trailing ZIP code and state from a token list.
+    """
+    zip_code = state = ""
+    if tokens and _ZIP.match(tokens[-1]):
+        zip_code = _ZIP.match(tokens.pop()).group(1)
+    # State names run up to three words ("DISTRICT OF COLUMBIA")
+    if tokens:
+        widths = (3, 2, 1) if tokens[-1] in _STATE_LAST_WORDS else (1,)
+        for width in widths:
+            name = " ".join(tokens[-width:]) if width > 1 else tokens[-1]
+            if len(tokens) >= width and name in _STATES:
+                state = _STATES[name]
+                del tokens[-width:]
+                break
+    if not zip_code and tokens and _ZIP.match(tokens[-1]):
+        zip_code = _ZIP.match(tokens.pop()).group(1)
+    return zip_code, state
+
+
+def _split_unit(tokens):
+    """
+    Split a trailing secondary unit off a street token list.
+    Returns (street tokens, unit type, unit).
+    """
+    for i in range(len(tokens) - 1, 0, -1):
+        token = tokens[i]
+        if token in _UNIT_TYPES and i + 1 < len(tokens):
+            unit_type = _UNIT_TYPES[token]
+            rest = tokens[i + 1:]
+            if rest[0] == "#":
+                rest = rest[1:]
+            # "APT #4" and "# 4" carry one identifier; anything longer is not a
+            # unit, and "LOT RD" or "NO NAME" is part of the street
+            if len(rest) == 1 and rest[0] not in _SUFFIXES and (
+                    token not in ("NO", "NUMBER") or rest[0][:1].isdigit()):
+                if unit_type == "#" and tokens[i - 1] in _UNIT_TYPES and tokens[i - 1] != "#":
+                    return tokens[:i - 1], _UNIT_TYPES[tokens[i - 1]], rest[0]
+                return tokens[:i], unit_type, rest[0]
+        elif token in _UNIT_TYPES_WITHOUT_NUMBER and i == len(tokens) - 1 and i >= 2:
+            return tokens[:i], _UNIT_TYPES_WITHOUT_NUMBER[token], ""
+    return tokens, "", ""
+
+
+def _clean(text):
+    """
+    Uppercase text and separate or drop punctuation.
+    """
+    text = text.upper()
+    for old, new in _REPLACEMENTS:
+        if old in text:
+            text = text.replace(old, new)
+    return text
+
+
+def _split_city(tokens):
+    """
+    Split a comma-free "123 MAIN ST APT 4 SAN FRANCISCO" into street tokens
+    and city, at the last street suffix (and any directional and unit that
+    follow it). Returns (tokens, "") when there is no suffix to split at.
+    """
+    for i in range(len(tokens) - 2, 0, -1):
+        if tokens[i] in _SUFFIXES:
+            end = i + 1
+            if end < len(tokens) and tokens[end] in _DIRECTIONS and end + 1 < len(tokens):
+                end += 1
+            if end + 1 < len(tokens) and tokens[end] in _UNIT_TYPES:
+                end += 2 if tokens[end + 1] != "#" else 3
+            if end < len(tokens):
+                return tokens[:end], " ".join(tokens[end:])
+            return tokens, ""
+    return tokens, ""
+
+
+def _split_street(tokens):
+    """
+    Split street tokens into (number, predirectional, name tokens, suffix,
+    postdirectional).
+    """
+    number = predirectional = suffix = postdirectional = ""
+    start, end = 0, len(tokens)
+    if end and tokens[0][:1].isdigit():
+        number = tokens[0]
+        start = 1
+        # Fractional house numbers: "123 1/2 MAIN ST"
+        if end - start > 2 and tokens[start + 1] == "/" and tokens[start].isdigit():
+            number += " " + "".join(tokens[start:start + 3])
+            start += 3
+    if end - start > 1 and tokens[end - 1] in _DIRECTIONS and (
+            end - start > 2 or tokens[end - 2] not in _DIRECTIONS):
+        postdirectional = _DIRECTIONS[tokens[end - 1]]
+        end -= 1
+    if end - start > 1 and tokens[end - 1] in _SUFFIXES:
+        suffix = _SUFFIXES[tokens[end - 1]]
+        end -= 1
+    if end - start > 1 and tokens[start] in _DIRECTIONS:
+        predirectional = _DIRECTIONS[tokens[start]]
+        start += 1
+    name = [_ORDINALS.get(token, token) for token in tokens[start:end]]
+    if not name and suffix:
+        # "123 PARK" or "1 AVENUE": the lone word is the name
+        name, suffix = [tokens[end]], ""
+    return number, predirectional, name, suffix, postdirectional
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse(address, unit, city, state, zip_code):
+    text = _clean(address)
+    segments = [segment.split() for segment in text.split(",")]
+    segments = [segment for segment in segments if segment]
+
+    parsed_zip = parsed_state = ""
+    if len(segments) > 1 or (segments and _ZIP.match(segments[0][-1])):
+        parsed_zip, parsed_state = _take_zip_and_state(segments[-1])
+        if not segments[-1]:
+            segments.pop()
+    street = segments[0] if segments else []
+
+    # A middle segment holding only a unit: "123 MAIN ST, APT 4, CITY"
+    parsed_city = ""
+    rest = segments[1:]
+    unit_type = parsed_unit = ""
+    if rest and rest[0][0] in _UNIT_TYPES:
+        _, unit_type, parsed_unit = _split_unit(["-"] + rest[0])
+        if parsed_unit or unit_type:
+            rest = rest[1:]
+    if rest:
+        parsed_city = " ".join(rest[-1])
+    elif len(segments) == 1 and (parsed_zip or parsed_state):
+        street, parsed_city = _split_city(street)
+    if not unit_type:
+        street, unit_type, parsed_unit = _split_unit(street)
+
+    number, predirectional, name, suffix, postdirectional = _split_street(street)
+
+    if unit:
+        tokens = _clean(unit).split()
+        if tokens:
+            _, unit_type, parsed_unit = _split_unit(["-"] + tokens) if len(tokens) > 1 else ("", "#", tokens[0])
+            if not parsed_unit and not unit_type:
+                unit_type, parsed_unit = "#", " ".join(tokens)
+    if unit_type == "#" and parsed_unit:
+        # "#4", "NO 4" and a bare unit field are written the USPS way
+        unit_type = "APT"
+    if city:
+        parsed_city = " ".join(_clean(city).split())
+    if state:
+        code = " ".join(_clean(state).split())
+        parsed_state = _STATES.get(code, code)
+    if zip_code:
+        match = _ZIP.match(zip_code.strip())
+        parsed_zip = match.group(1) if match else zip_code.strip()
+
+    return ParsedAddress(number, predirectional, " ".join(name), suffix, postdirectional,
+                         unit_type, parsed_unit.lstrip("#"), parsed_city, parsed_state, parsed_zip)
+
+
+def parse(address, unit=None, city=None, state=None, zip_code=None):
+    """
+    Parse an address into a ParsedAddress of uppercase USPS components.
+    Missing components are empty strings.
+    """
+    return _parse("" if address is None else str(address), "" if unit is None else str(unit),
+                  "" if city is None else str(city), "" if state is None else str(state),
+                  "" if zip_code is None else str(zip_code))
+
+
+def street_line(parsed):
+    """
+    Format the delivery line of a ParsedAddress: "123 N MAIN ST APT 4".
+    """
+    parts = [parsed.number, parsed.predirectional, parsed.name, parsed.suffix, parsed.postdirectional,
+             parsed.unit_type, parsed.unit]
+    return " ".join(part for part in parts if part)
+
+
+def format_address(parsed):
+    """
+    Format a ParsedAddress on one line, USPS style.
+    """
+    last_line = " ".join(part for part in (parsed.state, parsed.zip_code) if part)
+    return ", ".join(part for part in (street_line(parsed), parsed.city, last_line) if part)
+
+
+def canonical(address, unit=None, city=None, state=None, zip_code=None):
+    """
+    Return the canonical one-line form of an address.
+    """
+    return format_address(parse(address, unit, city, state, zip_code))
+
+
+def identity(parsed):
+    """
+    Return the text a key is derived from: the delivery line without the
+    unit designator (APT 4 and UNIT 4 are the same door), and the ZIP code,
+    or the city and state when the ZIP is unknown. Empty when the address
+    has no street.
+    """
+    if not parsed.name:
+        return ""
+    place = parsed.zip_code or f"{parsed.city} {parsed.state}"
+    return "|".join((parsed.number, parsed.predirectional, parsed.name, parsed.suffix,
+                     parsed.postdirectional, parsed.unit, place))
+
+
+def key(address, unit=None, city=None, state=None, zip_code=None):
+    """
+    Return a stable hex key for an address, or None when it has no street.
+    """
+    text = identity(parse(address, unit, city, state, zip_code))
+    if not text:
+        return None
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _property_fields(property_details):
+    return (property_details.get("address"), property_details.get("unit"), property_details.get("city"),
+            property_details.get("state"), property_details.get("zipCode") or property_details.get("zip_code"))
+
+
+def property_address(property_details):
+    """
+    Canonical one-line address of an input property, combining its address,
+    unit, city, state and ZIP code fields.
+    """
+    return canonical(*_property_fields(property_details))
+
+
+def property_key(property_details):
+    """
+    Stable key for an input property's address, or None without a street.
+    """
+    return key(*_property_fields(property_details))
+
+
+def _sample_addresses(count, seed=7):
+    """
+    Generate count synthetic addresses in assorted spellings.
+    """
+    rng = random.Random(seed)
+    names = ["Main", "Oak", "Market", "Mission", "Valencia", "First", "Martin Luther King Jr", "Elm", "Lake Shore"]
+    suffixes = ["Street", "St.", "Ave", "Avenue", "Blvd", "Road", "Dr", "Ln", "Terrace", "Way"]
+    directions = ["", "", "N ", "South ", "NW "]
+    units = ["", "", "", " Apt 4", " #12B", ", Unit 7", " Suite 300", " apt. 2F"]
+    cities = [("San Francisco", "CA", "94105"), ("Austin", "Texas", "78701"), ("New York", "NY", "10001-1234")]
+    addresses = []
+    for _ in range(count):
+        city, state, zip_code = rng.choice(cities)
+        street = f"{rng.randint(1, 9999)} {rng.choice(directions)}{rng.choice(names)} {rng.choice(suffixes)}"
+        street += rng.choice(units)
+        if rng.random() < 0.5:
+            street = street.upper()
+        addresses.append(f"{street}, {city}, {state} {zip_code}")
+    return addresses
+
+
+def benchmark(count=1000000):
+    """
+    Measure key() throughput on count synthetic addresses: first all of
+    them (mostly distinct, so parsed cold), then count lookups cycling
+    through a working set that fits the memo cache.
+    """
+    addresses = _sample_addresses(count)
+    _parse.cache_clear()
+    started = time.perf_counter()
+    for address in addresses:
+        key(address)
+    cold = time.perf_counter() - started
+    hot = addresses[:CACHE_SIZE // 2]
+    for address in hot:
+        key(address)
+    started = time.perf_counter()
+    for i in range(count):
+        key(hot[i % len(hot)])
+    warm = time.perf_counter() - started
+    return {
+        "addresses": count,
+        "distinct": len(set(addresses)),
+        "coldPerSecond": round(count / cold),
+        "memoizedPerSecond": round(count / warm),
+        "cacheSize": CACHE_SIZE,
+    }
+
+
+def main():
+    """
+    Address canonicalization CLI.
+    """
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "parse" and len(sys.argv) > 2:
+        parsed = parse(sys.argv[2])
+        print(json.dumps({"canonical": format_address(parsed), "key": key(sys.argv[2]), **parsed._asdict()}, indent=2))
+    elif command == "bench":
+        count = int(sys.argv[2]) if len(sys.argv) > 2 else 1000000
+        print(json.dumps(benchmark(count), indent=2))
+    else:
+        print("Usage: address_key.py parse <address> | bench [count]", file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
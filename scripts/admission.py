@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Admission control for single-property analyses.
+
+The web app spawns one rentcast_agent.py process per request, so a burst of
+requests becomes a burst of processes, each with its own sockets and log
+handles. Before analyzing, a process must be admitted:
+
+    slots        at most ADMISSION_MAX_CONCURRENT processes analyze at once;
+                 a slot is an exclusive flock on one of a fixed set of lock
+                 files, so a crashed process frees its slot with its file
+                 descriptors
+    queue        at most ADMISSION_MAX_QUEUE processes wait for a slot, each
+                 holding a queue lock file the same way; when the queue is
+                 full the request is shed at once
+    queue time   the expected wait (requests ahead / slots * mean analysis
+                 time, tracked as a moving average) is checked against the
+                 request's deadline up front, and a request that has waited
+                 its deadline out is shed rather than started late
+
+A shed request raises Overloaded, and rentcast_agent.py answers it in
+degraded mode (an older cached analysis or a quick analysis) instead of
+timing out. Quick analyses still search for comparables, so they hold one of
+their own ADMISSION_QUICK_SLOTS slots, taken without waiting; when those are
+busy too the request fails with Overloaded. Where fcntl is unavailable every
+request is admitted.
+
+Environment:
+    ADMISSION_ENABLED              "0" admits every request
+    ADMISSION_MAX_CONCURRENT       analysis slots (default 2 per core, at least 4)
+    ADMISSION_MAX_QUEUE            waiting requests (default 4 per slot)
+    ADMISSION_MAX_QUEUE_SECONDS    default deadline for getting a slot (default 20)
+    ADMISSION_QUICK_SLOTS          degraded quick-analysis slots (default a quarter
+                                   of the analysis slots, at least 1)
+    ADMISSION_PATH                 lock directory (default <cache dir>/admission)
+
+Usage:
+    python scripts/admission.py stats
+"""
+import os
+import sys
+import json
+import math
+import time
+import logging
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from engine_settings import cache_dir, env_flag, env_float, env_int
+
+logger = logging.getLogger('rentcast_agent.admission')
+
+# Analysis time assumed before any has been measured
+DEFAULT_SERVICE_SECONDS = 3.0
+# Weight of the newest measurement in the moving average
+_SERVICE_ALPHA = 0.2
+_POLL_SECONDS = 0.05
+
+
+class Overloaded(Exception):
+    """
+    Raised when a request is not admitted.
+    """
+    def __init__(self, reason, retry_after):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def is_enabled():
+    """
+    Return True when admission control applies on this platform.
+    """
+    return fcntl is not None and env_flag("ADMISSION_ENABLED", True)
+
+
+def max_concurrent():
+    """
+    Return the number of analysis slots.
+    """
+    default = max((os.cpu_count() or 1) * 2, 4)
+    return max(env_int("ADMISSION_MAX_CONCURRENT", default), 1)
+
+
+def max_queue():
+    """
+    Return how many requests may wait for a slot.
+    """
+    return max(env_int("ADMISSION_MAX_QUEUE", 4 * max_concurrent()), 0)
+
+
+def quick_slots():
+    """
+    Return the number of slots for degraded quick analyses.
+    """
+    return max(env_int("ADMISSION_QUICK_SLOTS", max(max_concurrent() // 4, 1)), 0)
+
+
+def admission_dir():
+    """
+    Return the directory holding the lock files, creating it if needed.
+    """
+    path = os.environ.get("ADMISSION_PATH") or os.path.join(cache_dir(), 'admission')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _try_lock(path):
+    """
+    Take an exclusive lock on path without blocking. Returns the open file
+    descriptor, or None when another process holds it.
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _unlock(fd):
+    try:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    finally:
+        os.close(fd)
+
+
+def _lock_any(prefix, count):
+    """
+    Lock the first free file of a set. Returns the descriptor or None.
+    """
+    directory = admission_dir()
+    for i in range(count):
+        fd = _try_lock(os.path.join(directory, f"{prefix}-{i}.lock"))
+        if fd is not None:
+            return fd
+    return None
+
+
+def _held(prefix, count):
+    """
+    Count the files of a set that are locked by other processes.
+    """
+    directory = admission_dir()
+    held = 0
+    for i in range(count):
+        path = os.path.join(directory, f"{prefix}-{i}.lock")
+        if not os.path.exists(path):
+            continue
+        fd = _try_lock(path)
+        if fd is None:
+            held += 1
+        else:
+            _unlock(fd)
+    return held
+
+
+def _service_path():
+    return os.path.join(admission_dir(), 'service_seconds')
+
+
+def service_seconds():
+    """
+    Return the moving average of admitted analysis durations.
+    """
+    try:
+        with open(_service_path()) as f:
+            return max(float(f.read()), 0.01)
+    except (OSError, ValueError):
+        return DEFAULT_SERVICE_SECONDS
+
+
+def _record_service(seconds):
+    """
+    Fold one analysis duration into the moving average. Concurrent writers
+    may overwrite each other's update, which only slows the average down.
+    """
+    average = (1 - _SERVICE_ALPHA) * service_seconds() + _SERVICE_ALPHA * seconds
+    path = _service_path()
+    temp = f"{path}.{os.getpid()}"
+    try:
+        with open(temp, "w") as f:
+            f.write(f"{average:.3f}")
+        os.replace(temp, path)
+    except OSError as e:
+        logger.warning(f"Could not record analysis time: {str(e)}")
+
+
+def deadline_seconds(value):
+    """
+    Return a request's deadlineSeconds as a float, or None when unset.
+    Raises ValueError for anything but a non-negative number (numeric strings
+    are accepted).
+    """
+    if value is None:
+        return None
+    seconds = math.nan
+    if not isinstance(value, bool):
+        try:
+            seconds = float(value)
+        except (TypeError, ValueError):
+            pass
+    if not seconds >= 0:
+        raise ValueError(f"deadlineSeconds must be a non-negative number, not {value!r}")
+    return seconds
+
+
+def expected_wait(ahead, slots=None):
+    """
+    Estimate the seconds until a slot frees up with `ahead` requests queued
+    in front.
+    """
+    slots = slots or max_concurrent()
+    return (ahead // slots + 1) * service_seconds()
+
+
+@contextmanager
+def admitted(deadline=None):
+    """
+    Hold an analysis slot for the duration of the block.
+    `deadline` is the most seconds the caller will wait for one (default
+    ADMISSION_MAX_QUEUE_SECONDS). Raises Overloaded when the request is shed.
+    """
+    if not is_enabled():
+        yield
+        return
+    if deadline is None:
+        deadline = env_float("ADMISSION_MAX_QUEUE_SECONDS", 20.0)
+    slots, queue_slots = max_concurrent(), max_queue()
+    started = time.monotonic()
+
+    # Requests already queued go first
+    ahead = _held("queue", queue_slots)
+    slot = None if ahead else _lock_any("slot", slots)
+    if slot is None:
+        wait = expected_wait(ahead, slots)
+        if ahead >= queue_slots:
+            raise Overloaded(f"{slots} analyses running and {ahead} queued", wait)
+        if wait > deadline:
+            raise Overloaded(f"expected wait {wait:.1f}s exceeds deadline {deadline:.1f}s", wait)
+        queued = _lock_any("queue", queue_slots)
+        if queued is None:
+            raise Overloaded(f"{slots} analyses running and the queue is full", wait)
+        try:
+            while slot is None:
+                if time.monotonic() - started >= deadline:
+                    raise Overloaded(f"no slot within {deadline:.1f}s", expected_wait(_held("queue", queue_slots), slots))
+                time.sleep(_POLL_SECONDS)
+                slot = _lock_any("slot", slots)
+        finally:
+            _unlock(queued)
+        logger.info(f"Admitted after {time.monotonic() - started:.2f}s in the queue")
+
+    admitted_at = time.monotonic()
+    try:
+        yield
+        _record_service(time.monotonic() - admitted_at)
+    finally:
+        _unlock(slot)
+
+
+@contextmanager
+def quick_admitted(overload):
+    """
+    Hold a degraded quick-analysis slot for the duration of the block.
+    There is no queue: when every quick slot is busy the Overloaded error
+    that shed the request is raised again.
+    """
+    if not is_enabled():
+        yield
+        return
+    slot = _lock_any("quick", quick_slots())
+    if slot is None:
+        raise overload
+    try:
+        yield
+    finally:
+        _unlock(slot)
+
+
+def stats():
+    """
+    Return slot and queue occupancy.
+    """
+    slots, queue_slots = max_concurrent(), max_queue()
+    return {
+        "enabled": is_enabled(),
+        "path": admission_dir(),
+        "slots": slots,
+        "running": _held("slot", slots) if fcntl else None,
+        "maxQueue": queue_slots,
+        "queued": _held("queue", queue_slots) if fcntl else None,
+        "quickSlots": quick_slots(),
+        "quickRunning": _held("quick", quick_slots()) if fcntl else None,
+        "meanAnalysisSeconds": round(service_seconds(), 2),
+    }
+
+
+def main():
+    """
+    Admission inspection CLI.
+    """
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "stats":
+        print(json.dumps(stats(), indent=2))
+    else:
+        print(f"Unknown command: {command}", file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+"""
+Whole-analysis result cache for rentcast_agent.py.
+
+Completed analyses are stored in a local SQLite file keyed by a canonical
+fingerprint of the input property (address, beds, baths, square footage,
+property type and amenities) and of the credentials it is analyzed with, so
+re-opening, re-printing or re-sharing the same report does not repeat every
+provider call, and a request whose RentCast keys (its own or its tenant's)
+are not the shared pool's never shares an entry with another. The HTTP and
+shared caches below it are scoped the same way.
+
+Entries expire after a configurable TTL and the table is kept to a bounded
+size with least-recently-used eviction.
+
+Environment:
+    ANALYSIS_CACHE_ENABLED      "0" disables the cache (default enabled)
+    ANALYSIS_CACHE_TTL          entry lifetime in seconds (default 21600)
+    ANALYSIS_CACHE_MAX_ENTRIES  LRU bound on stored analyses (default 5000)
+    ANALYSIS_CACHE_PATH         SQLite file (default <cache dir>/analysis_cache.sqlite)
+
+Usage:
+    python scripts/analysis_cache.py stats
+    python scripts/analysis_cache.py clear
+    python scripts/analysis_cache.py prune
+    python scripts/analysis_cache.py invalidate '<property json>'
+"""
+import os
+import sys
+import json
+import math
+import time
+import hashlib
+import sqlite3
+import logging
+
+import address_key
+import credential_pool
+import json_backend
+from engine_settings import cache_dir, env_int, env_flag
+
+logger = logging.getLogger('rentcast_agent.analysis_cache')
+
+DEFAULT_TTL_SECONDS = 6 * 60 * 60
+DEFAULT_MAX_ENTRIES = 5000
+
+
+def is_enabled():
+    """
+    Return True unless the cache has been switched off in the environment.
+    """
+    return env_flag("ANALYSIS_CACHE_ENABLED", True)
+
+
+def ttl_seconds():
+    """
+    Return the configured entry lifetime in seconds.
+    """
+    return env_int("ANALYSIS_CACHE_TTL", DEFAULT_TTL_SECONDS)
+
+
+def max_entries():
+    """
+    Return the configured maximum number of cached analyses.
+    """
+    return env_int("ANALYSIS_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)
+
+
+def cache_path():
+    """
+    Return the path of the SQLite file backing the cache.
+    """
+    return os.environ.get("ANALYSIS_CACHE_PATH") or os.path.join(cache_dir(), 'analysis_cache.sqlite')
+
+
+def _normalize_text(value):
+    """
+    Lowercase a free-text field and collapse punctuation and whitespace runs.
+    """
+    text = str(value or "").lower().replace(",", " ").replace(".", " ")
+    return " ".join(text.split())
+
+
+def _normalize_number(value):
+    """
+    Turn 2, 2.0 and "2" into the same canonical string.
+    """
+    if value is None or value == "":
+        return ""
+    try:
+        number = float(str(value).replace(",", "").strip())
+    except ValueError:
+        return _normalize_text(value)
+    return f"{number:g}"
+
+
+def canonical_property(property_details):
+    """
+    Build the canonical form of the inputs that determine an analysis.
+    The address is the canonical one-line form, including unit, city, state
+    and ZIP, so that spelling variants share an entry and the same street
+    address in two cities does not collide; yearBuilt is included because it
+    changes the recommendations in the report. credentialScope keeps
+    analyses made with the keys a request resolves to apart from the shared
+    pool's.
+    """
+    amenities = property_details.get("amenities") or []
+    if isinstance(amenities, str):
+        amenities = [amenities]
+
+    return {
+        "address": address_key.property_address(property_details),
+        "city": _normalize_text(property_details.get("city")),
+        "state": _normalize_text(property_details.get("state")),
+        "zipCode": str(property_details.get("zipCode") or property_details.get("zip_code") or "").strip()[:5],
+        "beds": _normalize_number(property_details.get("beds")),
+        "baths": _normalize_number(property_details.get("baths")),
+        "squareFeet": _normalize_number(property_details.get("squareFeet")),
+        "propertyType": _normalize_text(property_details.get("propertyType")),
+        "yearBuilt": _normalize_number(property_details.get("yearBuilt")),
+        "amenities": sorted(set(_normalize_text(a) for a in amenities if a)),
+        "credentialScope": credential_pool.credential_scope(property_details)
+    }
+
+
+def property_fingerprint(property_details):
+    """
+    Return a stable SHA-256 fingerprint of the canonical property inputs.
+    """
+    canonical = json.dumps(canonical_property(property_details), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _connect():
+    """
+    Open the cache database, creating the table on first use.
+    """
+    conn = sqlite3.connect(cache_path(), timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # Reads go through a shared memory map so pool workers share one page cache
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS analysis_cache ("
+        " fingerprint TEXT PRIMARY KEY,"
+        " created_at REAL NOT NULL,"
+        " accessed_at REAL NOT NULL,"
+        " payload TEXT NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS analysis_cache_accessed ON analysis_cache (accessed_at)")
+    return conn
+
+
+def max_age_seconds(value):
+    """
+    Return a request's maxCacheAgeSeconds as a float, or None when unset.
+    Raises ValueError for anything but a non-negative number (numeric strings
+    are accepted).
+    """
+    if value is None:
+        return None
+    seconds = math.nan
+    if not isinstance(value, bool):
+        try:
+            seconds = float(value)
+        except (TypeError, ValueError):
+            pass
+    if not seconds >= 0:
+        raise ValueError(f"maxCacheAgeSeconds must be a non-negative number, not {value!r}")
+    return seconds
+
+
+def get(fingerprint, max_age=None):
+    """
+    Look up a cached analysis.
+    Returns (analysis, age_in_seconds) or None when missing or expired.
+    """
+    max_age = ttl_seconds() if max_age is None else max_age
+    now = time.time()
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                row = conn.execute(
+                    "SELECT created_at, payload FROM analysis_cache WHERE fingerprint = ?",
+                    (fingerprint,)
+                ).fetchone()
+                if not row:
+                    return None
+
+                created_at, payload = row
+                age = now - created_at
+                if age > max_age:
+                    # Only drop entries past the global TTL; a caller asking
+                    # for a fresher copy should not evict it for everyone.
+                    if age > ttl_seconds():
+                        conn.execute("DELETE FROM analysis_cache WHERE fingerprint = ?", (fingerprint,))
+                    return None
+
+                conn.execute(
+                    "UPDATE analysis_cache SET accessed_at = ? WHERE fingerprint = ?",
+                    (now, fingerprint)
+                )
+            return json_backend.loads(payload), age
+        finally:
+            conn.close()
+    except (sqlite3.Error, ValueError) as e:
+        logger.warning(f"Analysis cache read failed: {str(e)}")
+        return None
+
+
+def put(fingerprint, analysis):
+    """
+    Store an analysis and evict the least recently used entries
+    beyond the configured size bound.
+    """
+    now = time.time()
+    try:
+        payload = json_backend.dumps(analysis)
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO analysis_cache (fingerprint, created_at, accessed_at, payload) "
+                    "VALUES (?, ?, ?, ?)",
+                    (fingerprint, now, now, payload)
+                )
+                count = conn.execute("SELECT COUNT(*) FROM analysis_cache").fetchone()[0]
+                overflow = count - max(max_entries(), 1)
+                if overflow > 0:
+                    conn.execute(
+                        "DELETE FROM analysis_cache WHERE fingerprint IN ("
+                        " SELECT fingerprint FROM analysis_cache ORDER BY accessed_at ASC LIMIT ?)",
+                        (overflow,)
+                    )
+                    logger.info(f"Evicted {overflow} analyses from the result cache")
+        finally:
+            conn.close()
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        logger.warning(f"Analysis cache write failed: {str(e)}")
+
+
+def invalidate(fingerprint):
+    """
+    Remove a single cached analysis. Returns True if an entry was removed.
+    """
+    conn = _connect()
+    try:
+        with conn:
+            cursor = conn.execute("DELETE FROM analysis_cache WHERE fingerprint = ?", (fingerprint,))
+        return cursor.rowcount > 0
+    finally:
+        conn.close()
+
+
+def invalidate_property(property_details):
+    """
+    Remove the cached analysis for the given property input, if any.
+    """
+    return invalidate(property_fingerprint(property_details))
+
+
+def prune():
+    """
+    Delete every entry older than the TTL. Returns the number removed.
+    """
+    conn = _connect()
+    try:
+        with conn:
+            cursor = conn.execute(
+                "DELETE FROM analysis_cache WHERE created_at < ?",
+                (time.time() - ttl_seconds(),)
+            )
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+
+def clear():
+    """
+    Delete every cached analysis. Returns the number removed.
+    """
+    conn = _connect()
+    try:
+        with conn:
+            cursor = conn.execute("DELETE FROM analysis_cache")
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+
+def stats():
+    """
+    Return basic information about the cache contents.
+    """
+    conn = _connect()
+    try:
+        count, oldest, newest = conn.execute(
+            "SELECT COUNT(*), MIN(created_at), MAX(created_at) FROM analysis_cache"
+        ).fetchone()
+    finally:
+        conn.close()
+
+    now = time.time()
+    return {
+        "path": cache_path(),
+        "entries": count,
+        "maxEntries": max_entries(),
+        "ttlSeconds": ttl_seconds(),
+        "oldestAgeSeconds": round(now - oldest, 1) if oldest else None,
+        "newestAgeSeconds": round(now - newest, 1) if newest else None
+    }
+
+
+def main():
+    """
+    Small maintenance CLI for the cache.
+    """
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+
+    if command == "stats":
+        result = stats()
+    elif command == "clear":
+        result = {"removed": clear()}
+    elif command == "prune":
+        result = {"removed": prune()}
+    elif command == "invalidate":
+        raw = sys.argv[2] if len(sys.argv) > 2 else sys.stdin.read()
+        property_details = json.loads(raw)
+        fingerprint = property_fingerprint(property_details)
+        result = {"fingerprint": fingerprint, "removed": invalidate(fingerprint)}
+    else:
+        print(f"Unknown command: {command}", file=sys.stderr)
+        sys.exit(2)
+
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
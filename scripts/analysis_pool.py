@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Multi-process pool for running many analyses on one host.
+
+A single rentcast_agent.py process analyzes one property at a time, so a
+many-core host runs portfolio jobs serially. This pool starts one worker
+process per core (by default); each worker keeps its own pooled HTTP
+session and database connection, and all of them share the local cache
+tier on disk (the analysis result cache, market summary table, provider
+archive and memory-mapped hedonic model), so work done by one worker is
+reused by the others.
+
+Dispatch is pull-based: idle workers take the next property from a shared
+task queue, so one slow address never holds up work queued behind it.
+Submission is bounded by max_in_flight, which applies backpressure to the
+producer when workers fall behind instead of queueing the whole input.
+
+Every submitted property yields a result. A failure inside the analysis, or
+a result that cannot be sent back, is reported as an error result. A task
+whose worker dies (e.g. killed for running out of memory) never completes,
+so a property submitted more than POOL_TASK_TIMEOUT seconds ago (default
+600) without a result is reported as lost and its slot is freed.
+
+Usage:
+    python scripts/analysis_pool.py [--workers N] [--max-in-flight M] [--jsonl] < portfolio.json
+
+Input is a JSON array or JSON lines of property objects. Output is a JSON
+array in input order, or with --jsonl one {"index", "analysis"} line per
+property as soon as it completes. A result sent with persist that could not
+be written to its report carries persistError; with --jsonl it is reported
+at the end as an {"index", "reportId", "persistError"} line.
+"""
+import os
+import sys
+import time
+import queue
+import logging
+import functools
+import threading
+import multiprocessing
+
+import json_backend
+from engine_settings import env_float
+
+logger = logging.getLogger('rentcast_agent.analysis_pool')
+
+# How often the producer and consumer check for lost tasks
+_POLL_SECONDS = 1.0
+
+
+def _init_worker():
+    """
+    Give each worker its own HTTP session, database pool and write-behind
+    queue instead of the copies inherited from the parent process, and put
+    it in the bulk lane.
+    """
+    import engine_db
+    import lane_scheduler
+    import provider_client
+    import shared_cache
+
+    # Portfolio work never competes with interactive analyses
+    lane_scheduler.set_lane(lane_scheduler.BULK)
+    lane_scheduler.apply_cpu_priority()
+    provider_client.reset_session()
+    engine_db.reset_database(close=False)
+    shared_cache.reset_after_fork()
+
+
+def _analyze(index, property_details):
+    """
+    Run one analysis inside a worker. Errors are returned, not raised, so a
+    bad property does not take the worker down.
+    """
+    try:
+        import rentcast_agent
+
+        return index, rentcast_agent.get_analysis(property_details)
+    except Exception as e:
+        logger.exception(f"Analysis failed for {property_details.get('address')}: {str(e)}")
+        return index, {"error": str(e), "status": "error"}
+
+
+def run_pool(properties, workers=None, max_in_flight=None, task_timeout=None):
+    """
+    Analyze an iterable of properties across worker processes.
+    Yields (index, analysis) pairs in completion order, one per property.
+    At most max_in_flight properties are submitted but not yet returned;
+    one without a result task_timeout seconds after submission is yielded
+    as an error.
+    """
+    workers = workers or os.cpu_count() or 1
+    max_in_flight = max_in_flight or workers * 2
+    task_timeout = task_timeout or env_float("POOL_TASK_TIMEOUT", 600.0)
+    slots = threading.BoundedSemaphore(max_in_flight)
+    completed = queue.Queue()
+    # Index -> submission time of every task without a result yet
+    outstanding = {}
+    lock = threading.Lock()
+
+    def finish(index, analysis):
+        # A result arriving after its task was reported lost is dropped
+        with lock:
+            if outstanding.pop(index, None) is None:
+                return
+        completed.put((index, analysis))
+        slots.release()
+
+    def on_done(result):
+        finish(*result)
+
+    def on_error(index, error):
+        logger.error(f"Analysis {index} failed in the pool: {str(error)}")
+        finish(index, {"error": str(error), "status": "error"})
+
+    def expire():
+        now = time.monotonic()
+        with lock:
+            lost = [index for index, submitted_at in outstanding.items() if now - submitted_at > task_timeout]
+        for index in lost:
+            logger.error(f"Analysis {index} returned no result within {task_timeout:.0f}s; its worker may have died")
+            finish(index, {"error": f"Analysis lost: no result within {task_timeout:.0f}s", "status": "error"})
+
+    with multiprocessing.Pool(workers, initializer=_init_worker) as pool:
+        submitted = 0
+        returned = 0
+        for index, property_details in enumerate(properties):
+            while not slots.acquire(timeout=_POLL_SECONDS):
+                expire()
+            with lock:
+                outstanding[index] = time.monotonic()
+            pool.apply_async(
+                _analyze, (index, property_details),
+                callback=on_done, error_callback=functools.partial(on_error, index)
+            )
+            submitted += 1
+            while True:
+                try:
+                    item = completed.get_nowait()
+                except queue.Empty:
+                    break
+                returned += 1
+                yield item
+        while returned < submitted:
+            try:
+                item = completed.get(timeout=_POLL_SECONDS)
+            except queue.Empty:
+                expire()
+                continue
+            yield item
+            returned += 1
+
+
+def read_properties(stream):
+    """
+    Read a JSON array or JSON lines of properties from a stream.
+    JSON lines are parsed lazily so large portfolios stream through.
+    """
+    first = stream.read(1)
+    while first and first.isspace():
+        first = stream.read(1)
+    if first == "[":
+        for property_details in json_backend.loads(first + stream.read()):
+            yield property_details
+        return
+    pending = first
+    for line in stream:
+        line = pending + line
+        pending = ""
+        if line.strip():
+            yield json_backend.loads(line)
+    if pending.strip():
+        yield json_backend.loads(pending)
+
+
+def main():
+    """
+    Run a portfolio through the pool and persist results that ask for it.
+    """
+    # rentcast_agent loads .env and configures logging before workers start
+    import analysis_store
+    import projection
+    import rentcast_agent  # noqa: F401
+
+    args = sys.argv[1:]
+    workers = int(args[args.index("--workers") + 1]) if "--workers" in args else None
+    max_in_flight = int(args[args.index("--max-in-flight") + 1]) if "--max-in-flight" in args else None
+    stream_output = "--jsonl" in args
+
+    report_ids = {}
+    shaping = {}
+    writer = analysis_store.AnalysisWriter()
+    ordered = {}
+
+    def tracked(source):
+        # Remember which inputs want their result persisted or shaped
+        for index, property_details in enumerate(source):
+            if property_details.get("persist") and property_details.get("reportId"):
+                report_ids[index] = property_details["reportId"]
+            if "fields" in property_details or "compact" in property_details:
+                shaping[index] = {key: property_details[key] for key in ("fields", "compact") if key in property_details}
+            yield property_details
+
+    persisted = {}
+    for index, analysis in run_pool(tracked(read_properties(sys.stdin)), workers, max_in_flight):
+        report_id = report_ids.pop(index, None)
+        if report_id and analysis.get("status") != "error":
+            writer.add(report_id, analysis)
+            persisted[index] = report_id
+        analysis = projection.shape_batch([analysis], [shaping.pop(index, {})])[0]
+        if stream_output:
+            json_backend.write({"index": index, "analysis": analysis}, sys.stdout.buffer)
+        else:
+            ordered[index] = analysis
+
+    writer.flush()
+    # Report the results that could not be written back to their report
+    for index, report_id in sorted(persisted.items()):
+        if report_id not in writer.failed:
+            continue
+        if stream_output:
+            json_backend.write(
+                {"index": index, "reportId": report_id, "persistError": writer.failed[report_id]}, sys.stdout.buffer
+            )
+        else:
+            writer.annotate(report_id, ordered[index])
+    if not stream_output:
+        json_backend.write([ordered[i] for i in sorted(ordered)], sys.stdout.buffer)
+
+
+if __name__ == "__main__":
+    main()
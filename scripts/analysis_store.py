@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Bulk persistence of analysis results.
+
+When the caller passes a reportId with persist=true, the engine writes its
+own output back to the report instead of leaving the Node side to insert it
+row by row:
+
+    ComparableProperty   the report's comps, replaced on every run
+    PropertyReport       marketRent (rentRange.median) and marketAnalysis
+                         (rent range, estimate details, market summary and
+                         statistics, insights)
+
+Results are buffered and written in one transaction per batch, grouped
+across many analyses: old comps are deleted and report rows updated with
+batched statements, and new comps are loaded with COPY on Postgres. A
+thousand-property portfolio run is a few round-trips per batch rather than
+one per row. Analyses whose report does not exist are skipped, so one
+deleted report does not roll back its batch, and every analysis that could
+not be written is listed in AnalysisWriter.failed for the caller to report.
+Degraded answers to shed requests (a stale cached or a quick analysis) are
+never written, so they do not replace a report's full analysis.
+
+Environment:
+    ANALYSIS_STORE_BATCH_SIZE   analyses buffered before a flush (default 500)
+"""
+import uuid
+import json
+import logging
+from datetime import datetime, timezone
+
+import address_key
+import engine_db
+from engine_settings import env_int
+from rent_estimator import first_number
+
+logger = logging.getLogger('rentcast_agent.analysis_store')
+
+COMPARABLE_COLUMNS = (
+    "id", "address", "price", "beds", "baths", "sqft",
+    "yearBuilt", "distance", "lastSold", "propertyType", "reportId"
+)
+
+_DELETE_COMPARABLES = 'DELETE FROM "ComparableProperty" WHERE "reportId" = %s'
+
+_EXISTING_REPORTS = 'SELECT "id" FROM "PropertyReport" WHERE "id" IN ({})'
+
+_UPDATE_REPORT = (
+    'UPDATE "PropertyReport" SET "marketRent" = %s, "marketAnalysis" = %s, "updatedAt" = %s '
+    'WHERE "id" = %s'
+)
+
+# Sections of the analysis stored in PropertyReport.marketAnalysis
+MARKET_ANALYSIS_KEYS = (
+    "rentRange", "rentEstimate", "marketComparison", "marketInsights",
+    "dataSource", "marketSummary", "detailedMarketStats"
+)
+
+
+# PropertyReport columns read by report_property(), in order
+REPORT_INPUT_COLUMNS = '"address", "propertyType", "beds", "baths", "propertyDetails", "amenities", "location"'
+
+
+def _json(value):
+    if isinstance(value, (dict, list)):
+        return value
+    try:
+        return json.loads(value or "{}")
+    except (TypeError, ValueError):
+        return {}
+
+
+def report_property(row):
+    """
+    Build the engine input for a PropertyReport row of REPORT_INPUT_COLUMNS.
+    """
+    address, property_type, beds, baths, details, amenities, location = row
+    details, amenities, location = _json(details), _json(amenities), _json(location)
+    unit = str(details.get("unit") or "").strip()
+    if unit and not address_key.parse(address).unit:
+        address = f"{address}, Unit {unit}"
+    property_details = {
+        "address": address,
+        "beds": beds,
+        "baths": baths,
+        "squareFeet": details.get("sqft"),
+        "propertyType": property_type,
+        "yearBuilt": details.get("yearBuilt"),
+        "amenities": (amenities.get("features") or []) if isinstance(amenities, dict) else amenities,
+    }
+    zip_code = location.get("zipCode") or address_key.parse(address).zip_code
+    if zip_code:
+        property_details["zipCode"] = str(zip_code)[:5]
+    return {key: value for key, value in property_details.items() if value not in (None, "")}
+
+
+def _int_or_none(value):
+    number = first_number({"v": value}, "v")
+    return int(number) if number is not None else None
+
+
+def comparable_rows(report_id, analysis):
+    """
+    Convert the analysis comps into ComparableProperty rows.
+    Comps without an address or rent are skipped.
+    """
+    rows = []
+    for comp in analysis.get("comparableProperties") or []:
+        price = first_number(comp, "rent", "price")
+        address = comp.get("address")
+        if not address or not price:
+            continue
+        rows.append((
+            "c" + uuid.uuid4().hex[:24],
+            str(address),
+            float(price),
+            int(first_number(comp, "bedrooms", "beds") or 0),
+            float(first_number(comp, "bathrooms", "baths") or 0),
+            int(first_number(comp, "squareFootage", "sqft") or 0),
+            _int_or_none(comp.get("yearBuilt")),
+            float(first_number(comp, "distance") or 0),
+            None,
+            str(comp.get("propertyType") or ""),
+            report_id
+        ))
+    return rows
+
+
+def report_row(report_id, analysis, updated_at):
+    """
+    Build the PropertyReport update parameters for an analysis.
+    """
+    market_analysis = {key: analysis[key] for key in MARKET_ANALYSIS_KEYS if key in analysis}
+    market_rent = (analysis.get("rentRange") or {}).get("median")
+    return (market_rent, json.dumps(market_analysis), updated_at, report_id)
+
+
+class AnalysisWriter:
+    """
+    Buffers analyses and writes them in grouped transactions.
+    """
+
+    def __init__(self, batch_size=None):
+        self.batch_size = batch_size or env_int("ANALYSIS_STORE_BATCH_SIZE", 500)
+        self._batch = []
+        self.written = 0
+        # Report id -> why its analysis was not persisted
+        self.failed = {}
+
+    def add(self, report_id, analysis):
+        """
+        Queue an analysis for its report, flushing when the batch is full.
+        A degraded analysis is recorded as failed instead.
+        """
+        if analysis.get("degraded"):
+            logger.warning(f"Not persisting the degraded analysis of report {report_id}")
+            self._fail([report_id], "degraded result not persisted")
+            return
+        self._batch.append((report_id, analysis))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+
+    def _fail(self, report_ids, reason):
+        for report_id in report_ids:
+            self.failed[report_id] = reason
+
+    def flush(self):
+        """
+        Write every queued analysis in one transaction, skipping reports that
+        do not exist. Returns the number of analyses written; the rest are
+        recorded in self.failed.
+        """
+        batch, self._batch = self._batch, []
+        if not batch:
+            return 0
+
+        # A report analyzed twice in one batch keeps its latest result
+        latest = {}
+        for report_id, analysis in batch:
+            latest[report_id] = analysis
+
+        db = engine_db.get_database()
+        if db is None:
+            logger.warning(f"No database configured; {len(latest)} analyses were not persisted")
+            self._fail(latest, "no database configured")
+            return 0
+
+        updated_at = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        try:
+            with db.connection() as conn:
+                # A missing report would fail the comps' foreign key and roll back the batch
+                cursor = conn.cursor()
+                existing = set()
+                ids = list(latest)
+                for start in range(0, len(ids), 1000):
+                    chunk = ids[start:start + 1000]
+                    cursor.execute(db.sql(_EXISTING_REPORTS.format(", ".join(["%s"] * len(chunk)))), chunk)
+                    existing.update(row[0] for row in cursor.fetchall())
+                missing = [report_id for report_id in latest if report_id not in existing]
+                if missing:
+                    logger.warning(f"Skipping {len(missing)} analyses of missing reports: {', '.join(map(str, missing[:10]))}")
+                    self._fail(missing, "report not found")
+                    latest = {report_id: analysis for report_id, analysis in latest.items() if report_id in existing}
+
+                comps = [row for report_id, analysis in latest.items() for row in comparable_rows(report_id, analysis)]
+                db.execute_batch(conn, _DELETE_COMPARABLES, [(report_id,) for report_id in latest])
+                db.copy_rows(conn, "ComparableProperty", COMPARABLE_COLUMNS, comps)
+                db.execute_batch(conn, _UPDATE_REPORT, [
+                    report_row(report_id, analysis, updated_at) for report_id, analysis in latest.items()
+                ])
+        except Exception as e:
+            logger.error(f"Failed to persist {len(latest)} analyses: {str(e)}")
+            self._fail(latest, f"database error: {str(e)}")
+            return 0
+
+        logger.info(f"Persisted {len(latest)} analyses with {len(comps)} comparables")
+        for report_id in latest:
+            self.failed.pop(report_id, None)
+        self.written += len(latest)
+        return len(latest)
+
+    def annotate(self, report_id, analysis):
+        """
+        Mark an analysis whose report could not be written with persistError.
+        Returns the analysis.
+        """
+        if report_id in self.failed and isinstance(analysis, dict):
+            analysis["persistError"] = self.failed[report_id]
+        return analysis
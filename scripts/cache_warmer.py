@@ -0,0 +1,242 @@
+#!/usr/bin/env python3
+"""
+Predictive cache warmer.
+
+Most analyses are of properties in ZIP codes users have worked with before:
+their saved properties and property reports. This job ranks those by recent
+activity (each save or report update counts 1, halving every
+WARMER_HALF_LIFE_DAYS) and, during an off-peak window, refreshes what the
+next day's analyses will read:
+
+    1. hot ZIPs        market summary rows that are missing or stale
+    2. saved addresses geocodes (kept in the HTTP cache)
+    3. report addresses full analyses, which fill the analysis cache and,
+                       through it, the comparables, listings and market
+                       responses in the shared and HTTP caches
+
+Work stops when the next task could overrun the provider call budget
+(WARMER_MAX_CALLS, counting only requests that reach the network, so warm
+entries cost nothing) or when the window closes. The job runs in the bulk
+lane, so interactive analyses keep priority for quota and CPU.
+
+Run it from cron inside the window, e.g.
+
+    30 2 * * * cd /path/to/fairrent && venv/bin/python scripts/cache_warmer.py run
+
+Environment:
+    WARMER_WINDOW          off-peak hours, local time (default "02:00-06:00")
+    WARMER_MAX_CALLS       provider calls per run (default 300)
+    WARMER_LOOKBACK_DAYS   activity considered (default 30)
+    WARMER_HALF_LIFE_DAYS  decay of an activity's weight (default 7)
+    WARMER_MAX_TARGETS     most ZIPs, addresses and reports taken (default 200 each)
+
+Usage:
+    python scripts/cache_warmer.py run [--budget 300] [--force]
+    python scripts/cache_warmer.py plan
+"""
+import os
+import sys
+import json
+import time
+import logging
+from datetime import datetime, timedelta, timezone
+
+import address_key
+import analysis_store
+import engine_db
+import lane_scheduler
+import market_summary
+import provider_client
+import rentcast_agent
+from engine_settings import env_float, env_int
+
+logger = logging.getLogger('rentcast_agent.cache_warmer')
+
+DEFAULT_WINDOW = "02:00-06:00"
+
+# Provider calls one task may make, checked against what is left of the budget;
+# an analysis costs rentcast_agent.max_provider_calls() of its property
+GEOCODE_CALLS = 1
+MARKET_CALLS = 1
+
+_REPORTS_QUERY = (
+    f'SELECT {analysis_store.REPORT_INPUT_COLUMNS}, "updatedAt" '
+    'FROM "PropertyReport" WHERE "isArchived" = %s AND "updatedAt" >= %s ORDER BY "updatedAt" DESC LIMIT %s'
+)
+_SAVED_QUERY = (
+    'SELECT "address", "savedAt" FROM "SavedProperty" WHERE "savedAt" >= %s ORDER BY "savedAt" DESC LIMIT %s'
+)
+
+
+def _minutes(text):
+    hours, _, minutes = text.strip().partition(":")
+    return int(hours) * 60 + int(minutes or 0)
+
+
+def in_window(now=None):
+    """
+    Return True when the local time is inside WARMER_WINDOW. A window may
+    wrap past midnight ("22:00-05:00").
+    """
+    window = os.environ.get("WARMER_WINDOW") or DEFAULT_WINDOW
+    try:
+        start, end = (_minutes(part) for part in window.split("-", 1))
+    except ValueError:
+        logger.warning(f"Invalid WARMER_WINDOW '{window}', using {DEFAULT_WINDOW}")
+        start, end = (_minutes(part) for part in DEFAULT_WINDOW.split("-", 1))
+    now = now or datetime.now()
+    minute = now.hour * 60 + now.minute
+    return start <= minute < end if start <= end else minute >= start or minute < end
+
+
+def _timestamp(value):
+    """
+    Seconds since the epoch of a Postgres timestamp or SQLite text column.
+    """
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _weight(timestamp, now, half_life):
+    if timestamp is None:
+        return 0.0
+    return 0.5 ** (max(now - timestamp, 0) / (half_life * 86400))
+
+
+def hot_targets(db=None):
+    """
+    Rank recent activity. Returns {"zipCodes": [...], "addresses": [...],
+    "reports": [...]}, each highest score first: ZIP codes, saved addresses
+    and report inputs for the engine.
+    """
+    db = db or engine_db.get_database()
+    if db is None:
+        logger.warning("No database configured; nothing to warm")
+        return {"zipCodes": [], "addresses": [], "reports": []}
+
+    now = time.time()
+    half_life = max(env_float("WARMER_HALF_LIFE_DAYS", 7.0), 0.1)
+    limit = max(env_int("WARMER_MAX_TARGETS", 200), 1)
+    cutoff = datetime.now(timezone.utc) - timedelta(days=env_int("WARMER_LOOKBACK_DAYS", 30))
+    cutoff = cutoff.strftime("%Y-%m-%d %H:%M:%S")
+
+    zip_scores, address_scores, report_scores = {}, {}, {}
+    addresses, reports = {}, {}
+    for row in db.query(_REPORTS_QUERY, (False, cutoff, limit * 5)):
+        weight = _weight(_timestamp(row[-1]), now, half_life)
+        property_details = analysis_store.report_property(row[:-1])
+        key = address_key.key(property_details["address"])
+        if key is None:
+            continue
+        report_scores[key] = report_scores.get(key, 0.0) + weight
+        reports.setdefault(key, property_details)
+        if property_details.get("zipCode"):
+            zip_scores[property_details["zipCode"]] = zip_scores.get(property_details["zipCode"], 0.0) + weight
+
+    try:
+        saved = db.query(_SAVED_QUERY, (cutoff, limit * 5))
+    except Exception as e:
+        logger.warning(f"Could not read saved properties: {str(e)}")
+        saved = []
+    for address, saved_at in saved:
+        key = address_key.key(address)
+        if key is None:
+            continue
+        weight = _weight(_timestamp(saved_at), now, half_life)
+        address_scores[key] = address_scores.get(key, 0.0) + weight
+        addresses.setdefault(key, address)
+        zip_code = address_key.parse(address).zip_code
+        if zip_code:
+            zip_scores[zip_code] = zip_scores.get(zip_code, 0.0) + weight
+
+    def ranked(scores):
+        return sorted(scores, key=lambda key: -scores[key])[:limit]
+
+    return {
+        "zipCodes": ranked(zip_scores),
+        "addresses": [addresses[key] for key in ranked(address_scores)],
+        "reports": [reports[key] for key in ranked(report_scores)],
+    }
+
+
+def _warm_zip(zip_code):
+    if market_summary.lookup(zip_code):
+        return False
+    return bool(market_summary.refresh([zip_code]).get(zip_code))
+
+
+def _warm_address(address):
+    return rentcast_agent.resolve_location({"address": address}).get("locationSource") == "google"
+
+
+def _warm_report(property_details):
+    return not rentcast_agent.get_analysis(dict(property_details))["cache"]["hit"]
+
+
+def warm(budget=None, force=False):
+    """
+    Warm the caches for the hottest targets within the call budget and the
+    off-peak window (unless forced). Returns a summary of the run.
+    """
+    budget = env_int("WARMER_MAX_CALLS", 300) if budget is None else budget
+    summary = {"budget": budget, "providerCalls": 0, "zipCodes": 0, "addresses": 0, "reports": 0,
+               "failed": 0, "stoppedBy": None}
+    if not force and not in_window():
+        summary["stoppedBy"] = "outside window"
+        return summary
+
+    targets = hot_targets()
+    tasks = (
+        [("zipCodes", _warm_zip, zip_code, MARKET_CALLS) for zip_code in targets["zipCodes"]]
+        + [("addresses", _warm_address, address, GEOCODE_CALLS) for address in targets["addresses"]]
+        + [("reports", _warm_report, property_details, rentcast_agent.max_provider_calls(property_details))
+           for property_details in targets["reports"]]
+    )
+    started = provider_client.network_calls()
+    for kind, task, target, cost in tasks:
+        spent = provider_client.network_calls() - started
+        if spent + cost > budget:
+            summary["stoppedBy"] = "budget"
+            break
+        if not force and not in_window():
+            summary["stoppedBy"] = "window closed"
+            break
+        try:
+            if task(target):
+                summary[kind] += 1
+        except Exception as e:
+            logger.warning(f"Could not warm {kind} target: {str(e)}")
+            summary["failed"] += 1
+    summary["providerCalls"] = provider_client.network_calls() - started
+    logger.info(f"Cache warmer finished: {json.dumps(summary)}")
+    return summary
+
+
+def main():
+    """
+    Warmer CLI.
+    """
+    args = sys.argv[1:]
+    command = args[0] if args else "run"
+    if command == "run":
+        budget = int(args[args.index("--budget") + 1]) if "--budget" in args else None
+        lane_scheduler.set_lane(lane_scheduler.BULK)
+        lane_scheduler.apply_cpu_priority()
+        print(json.dumps(warm(budget, force="--force" in args), indent=2))
+    elif command == "plan":
+        print(json.dumps(hot_targets(), indent=2, default=str))
+    else:
+        print(f"Unknown command: {command}", file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
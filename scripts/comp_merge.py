@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Cross-source deduplication of comparables.
+
+RentCast and Zillow often return the same unit, with differently spelled
+addresses and different fields filled in. Two comps describe the same unit
+when either
+    their canonical addresses (address_key.identity: street line, unit and
+    ZIP) are equal, or
+    they lie within MATCH_MILES of each other and nothing contradicts it:
+    no differing house number, unit, bedroom count or size (beyond
+    SQFT_TOLERANCE).
+Addresses are hashed into a dict and coordinates into a grid of cells at
+least MATCH_MILES wide, so each comp is only compared with the comps in its
+own and the 8 surrounding cells and merging stays linear in the number of
+candidates. Each group of duplicates is collapsed into its richest record
+(the one with the most populated fields), with fields it lacks filled in
+from the others and every contributing source listed in "sources".
+"""
+import math
+import logging
+
+import address_key
+
+logger = logging.getLogger('rentcast_agent.comp_merge')
+
+# Comps closer than this (about 50 ft) may be the same unit
+MATCH_MILES = 0.01
+# Largest relative size difference between two records of the same unit
+SQFT_TOLERANCE = 0.1
+
+_MILES_PER_DEGREE = 69.05
+
+# Field names the providers use for the same attribute
+_ALIASES = {
+    "beds": "bedrooms", "bedrooms": "beds",
+    "baths": "bathrooms", "bathrooms": "baths",
+    "sqft": "squareFootage", "squareFootage": "sqft",
+}
+
+
+def _empty(value):
+    return value is None or value == "" or value == 0 or value == [] or value == "Unknown"
+
+
+def _parse_address(address):
+    """
+    Parse a comp address, or None when it has none.
+    """
+    if _empty(address):
+        return None
+    parsed = address_key.parse(address)
+    return parsed if parsed.name else None
+
+
+def richness(comp):
+    """
+    Number of populated fields in a comp record.
+    """
+    return sum(1 for value in comp.values() if not _empty(value))
+
+
+def _number(comp, key):
+    for name in (key, _ALIASES.get(key)):
+        value = comp.get(name) if name else None
+        try:
+            value = float(value)
+        except (TypeError, ValueError):
+            continue
+        if value > 0:
+            return value
+    return None
+
+
+def _compatible(a, b, parsed_a, parsed_b):
+    """
+    True when nothing in two nearby comps says they are different units.
+    """
+    if parsed_a and parsed_b:
+        if parsed_a.number and parsed_b.number and parsed_a.number != parsed_b.number:
+            return False
+        if parsed_a.unit and parsed_b.unit and parsed_a.unit != parsed_b.unit:
+            return False
+    beds_a, beds_b = _number(a, "bedrooms"), _number(b, "bedrooms")
+    if beds_a is not None and beds_b is not None and beds_a != beds_b:
+        return False
+    sqft_a, sqft_b = _number(a, "squareFootage"), _number(b, "squareFootage")
+    if sqft_a and sqft_b and abs(sqft_a - sqft_b) > SQFT_TOLERANCE * max(sqft_a, sqft_b):
+        return False
+    return True
+
+
+def _coordinates(comp):
+    try:
+        lat, lon = float(comp.get("latitude")), float(comp.get("longitude"))
+    except (TypeError, ValueError):
+        return None
+    if not lat and not lon:
+        return None
+    return lat, lon
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _union(parent, i, j):
+    i, j = _find(parent, i), _find(parent, j)
+    if i != j:
+        # The earlier comp stays the root, so groups keep their first position
+        parent[max(i, j)] = min(i, j)
+
+
+def _merged(records):
+    """
+    Collapse a group of duplicate records into the richest one, in place.
+    Earlier records win ties.
+    """
+    base = max(records, key=richness)
+    for other in records:
+        if other is base:
+            continue
+        for key, value in other.items():
+            if _empty(value) or not _empty(base.get(key)):
+                continue
+            alias = _ALIASES.get(key)
+            if alias and not _empty(base.get(alias)):
+                continue
+            base[key] = value
+    sources = []
+    for record in records:
+        for source in record.get("sources") or [record.get("source")]:
+            if source and source not in sources:
+                sources.append(source)
+    if len(sources) > 1:
+        base["sources"] = sources
+    return base
+
+
+def merge(comps):
+    """
+    Collapse duplicate comparables. Returns a new list with one record per
+    unit, in order of each unit's first appearance; kept records are
+    updated in place with fields from their duplicates.
+    """
+    count = len(comps)
+    parent = list(range(count))
+    parsed = [_parse_address(comp.get("address")) for comp in comps]
+
+    by_address = {}
+    for i, address in enumerate(parsed):
+        if address:
+            key = address_key.identity(address)
+            if key in by_address:
+                _union(parent, by_address[key], i)
+            else:
+                by_address[key] = i
+
+    points = [(i, _coordinates(comp)) for i, comp in enumerate(comps)]
+    points = [(i, point) for i, point in points if point]
+    if points:
+        # Cells at least MATCH_MILES wide in both directions at every latitude present
+        widest = max(abs(point[0]) for _, point in points)
+        lat_step = MATCH_MILES / _MILES_PER_DEGREE
+        lon_step = lat_step / max(math.cos(math.radians(min(widest, 89.0))), 0.01)
+        grid = {}
+        for i, (lat, lon) in points:
+            row, col = math.floor(lat / lat_step), math.floor(lon / lon_step)
+            for r in (row - 1, row, row + 1):
+                for c in (col - 1, col, col + 1):
+                    for j, other_lat, other_lon in grid.get((r, c), ()):
+                        if (abs(lat - other_lat) * _MILES_PER_DEGREE <= MATCH_MILES
+                                and abs(lon - other_lon) * _MILES_PER_DEGREE * math.cos(math.radians(lat)) <= MATCH_MILES
+                                and _compatible(comps[i], comps[j], parsed[i], parsed[j])):
+                            _union(parent, i, j)
+            grid.setdefault((row, col), []).append((i, lat, lon))
+
+    groups = {}
+    for i in range(count):
+        groups.setdefault(_find(parent, i), []).append(comps[i])
+    if len(groups) < count:
+        logger.info(f"Merged {count} comparables into {len(groups)} distinct units")
+    return [records[0] if len(records) == 1 else _merged(records) for records in groups.values()]
@@ -0,0 +1,336 @@
+#!/usr/bin/env python3
+"""
+RentCast credential pool.
+
+RentCast quotas and rate limits are per API key, so the engine can spread
+its calls over several keys. Every RentCast call names the keys it may use
+(keys_for()) and provider_client.py picks one at send time:
+
+    least loaded    the usable key with the fewest calls in flight in this
+                    process, then the fewest calls this month across every
+                    engine process (counted in a small shared SQLite file),
+                    so quota is used evenly
+    quota           with RENTCAST_KEY_MONTHLY_QUOTA set, a key that has made
+                    that many calls this month is skipped until next month
+    ejection        a 401 or 403 takes the key out of rotation for
+                    RENTCAST_KEY_REVOKED_SECONDS, a 429 for its Retry-After
+                    (or RENTCAST_KEY_COOLDOWN_SECONDS); the call is retried
+                    on another key
+
+A request may bring its own keys: "rentcastApiKey" (one key or a list) and
+"tenantId", which selects that tenant's keys from RENTCAST_TENANT_KEYS. Such
+requests use only their own keys; all others use the shared pool. Keys are
+stored by hash and in masked form, never in the clear.
+
+Environment:
+    RENTCAST_API_KEYS               comma-separated shared keys
+    RENTCAST_API_KEY                one more shared key
+    RENTCAST_TENANT_KEYS            JSON object of tenant id to key list
+    RENTCAST_KEY_MONTHLY_QUOTA      calls per key per month (default 0, unlimited)
+    RENTCAST_KEY_COOLDOWN_SECONDS   ejection after a 429 without Retry-After (default 60)
+    RENTCAST_KEY_REVOKED_SECONDS    ejection after a 401/403 (default 86400)
+    CREDENTIAL_POOL_PATH            SQLite file (default <cache dir>/credential_pool.sqlite)
+
+Usage:
+    python scripts/credential_pool.py stats
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+
+from engine_settings import cache_dir, env_int
+
+logger = logging.getLogger('rentcast_agent.credential_pool')
+
+HOST = "api.rentcast.io"
+HEADER = "X-API-KEY"
+
+# Responses that take a key out of rotation
+REVOKED_STATUSES = (401, 403)
+RATE_LIMITED_STATUS = 429
+
+# Seconds a key count is reused by key_count()
+_COUNT_SECONDS = 5.0
+
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+_count_cache = {}
+
+
+def _split(value):
+    if isinstance(value, str):
+        value = value.split(",")
+    return [key.strip() for key in value or () if isinstance(key, str) and key.strip()]
+
+
+def _unique(keys):
+    return tuple(dict.fromkeys(keys))
+
+
+def shared_keys():
+    """
+    Return the shared pool's keys.
+    """
+    return _unique(_split(os.environ.get("RENTCAST_API_KEYS")) + _split(os.environ.get("RENTCAST_API_KEY")))
+
+
+def tenant_keys(tenant_id):
+    """
+    Return the keys configured for a tenant.
+    """
+    if not tenant_id:
+        return ()
+    try:
+        tenants = json.loads(os.environ.get("RENTCAST_TENANT_KEYS") or "{}")
+    except ValueError:
+        logger.warning("RENTCAST_TENANT_KEYS is not valid JSON")
+        return ()
+    return _unique(_split(tenants.get(str(tenant_id)) if isinstance(tenants, dict) else None))
+
+
+def keys_for(property_details):
+    """
+    Return the keys a request may use: its own and its tenant's when it
+    has any, otherwise the shared pool.
+    """
+    own = _split(property_details.get("rentcastApiKey")) + list(tenant_keys(property_details.get("tenantId")))
+    return _unique(own) or shared_keys()
+
+
+def scope_of(keys):
+    """
+    Return which credentials a list of keys stands for: "shared" for the
+    shared pool (or no keys), otherwise a digest of the keys, so responses
+    fetched with one customer's keys are not served to another.
+    """
+    keys = sorted(set(keys or ()))
+    if not keys or keys == sorted(set(shared_keys())):
+        return "shared"
+    return f"keys:{key_id(','.join(keys))}"
+
+
+def credential_scope(property_details):
+    """
+    Return the scope of the keys a request actually resolves to; a tenant
+    without configured keys falls back to the shared pool and its scope.
+    """
+    return scope_of(keys_for(property_details))
+
+
+def key_id(key):
+    """
+    Return the stable identifier a key is stored under.
+    """
+    return hashlib.blake2b(key.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _mask(key):
+    return f"{key[:5]}...{key[-5:]}" if len(key) > 12 else "..."
+
+
+def pool_path():
+    """
+    Return the path of the shared usage file.
+    """
+    return os.environ.get("CREDENTIAL_POOL_PATH") or os.path.join(cache_dir(), 'credential_pool.sqlite')
+
+
+def _month():
+    return datetime.now(timezone.utc).strftime("%Y-%m")
+
+
+def _connect():
+    conn = sqlite3.connect(pool_path(), timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS credential_usage ("
+        " key_id TEXT PRIMARY KEY,"
+        " masked TEXT NOT NULL,"
+        " month TEXT NOT NULL,"
+        " calls INTEGER NOT NULL,"
+        " ejected_until REAL NOT NULL,"
+        " reason TEXT)"
+    )
+    return conn
+
+
+def _usage(keys):
+    """
+    Return {key_id: (calls this month, ejected_until)} for the given keys.
+    """
+    ids = [key_id(key) for key in keys]
+    month = _month()
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            f"SELECT key_id, month, calls, ejected_until FROM credential_usage "
+            f"WHERE key_id IN ({','.join('?' * len(ids))})",
+            ids
+        ).fetchall()
+    finally:
+        conn.close()
+    return {row[0]: (row[2] if row[1] == month else 0, row[3]) for row in rows}
+
+
+def checkout(keys):
+    """
+    Pick the least loaded usable key and count it as in flight.
+    Returns None when every key is ejected or out of quota.
+    """
+    if not keys:
+        return None
+    try:
+        usage = _usage(keys)
+    except sqlite3.Error as e:
+        logger.warning(f"Credential pool unavailable: {str(e)}")
+        usage = {}
+    now = time.time()
+    quota = env_int("RENTCAST_KEY_MONTHLY_QUOTA", 0)
+
+    with _in_flight_lock:
+        candidates = []
+        for position, key in enumerate(keys):
+            calls, ejected_until = usage.get(key_id(key), (0, 0.0))
+            if ejected_until > now or (quota > 0 and calls >= quota):
+                continue
+            candidates.append((_in_flight.get(key, 0), calls, position, key))
+        if not candidates:
+            return None
+        key = min(candidates)[3]
+        _in_flight[key] = _in_flight.get(key, 0) + 1
+    return key
+
+
+def _ejection(status, headers):
+    """
+    Return (seconds, reason) for a response that takes a key out of
+    rotation, or None.
+    """
+    if status in REVOKED_STATUSES:
+        return env_int("RENTCAST_KEY_REVOKED_SECONDS", 24 * 60 * 60), f"rejected ({status})"
+    if status == RATE_LIMITED_STATUS:
+        seconds = env_int("RENTCAST_KEY_COOLDOWN_SECONDS", 60)
+        try:
+            seconds = int((headers or {}).get("Retry-After") or seconds)
+        except ValueError:
+            pass
+        return seconds, "rate limited (429)"
+    return None
+
+
+def release(key):
+    """
+    Stop counting a key from checkout() as in flight.
+    """
+    with _in_flight_lock:
+        _in_flight[key] = max(_in_flight.get(key, 1) - 1, 0)
+
+
+def record(key, status, headers=None):
+    """
+    Count a call answered with `status` against a key. Returns False when
+    the response took the key out of rotation and the call should be
+    retried on another.
+    """
+    ejection = _ejection(status, headers)
+    month = _month()
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO credential_usage (key_id, masked, month, calls, ejected_until, reason) "
+                    "VALUES (?, ?, ?, 1, 0, NULL) "
+                    "ON CONFLICT (key_id) DO UPDATE SET "
+                    " calls = CASE WHEN month = excluded.month THEN calls + 1 ELSE 1 END,"
+                    " month = excluded.month",
+                    (key_id(key), _mask(key), month)
+                )
+                if ejection:
+                    seconds, reason = ejection
+                    conn.execute(
+                        "UPDATE credential_usage SET ejected_until = ?, reason = ? WHERE key_id = ?",
+                        (time.time() + seconds, reason, key_id(key))
+                    )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"Could not record RentCast key usage: {str(e)}")
+    if ejection:
+        logger.warning(f"RentCast key {_mask(key)} {ejection[1]}; out of rotation for {ejection[0]}s")
+        return False
+    return True
+
+
+def key_count(keys=None):
+    """
+    Return how many of `keys` (default the shared pool's) are in rotation,
+    at least 1, refreshed every few seconds. The lane scheduler scales
+    RentCast's rate limit by the keys a call may use.
+    """
+    keys = shared_keys() if keys is None else _unique(keys)
+    checked_at, count = _count_cache.get(keys, (0.0, 0))
+    if time.monotonic() - checked_at < _COUNT_SECONDS:
+        return count
+    try:
+        usage = _usage(keys) if keys else {}
+    except sqlite3.Error:
+        usage = {}
+    now = time.time()
+    count = max(sum(1 for key in keys if usage.get(key_id(key), (0, 0.0))[1] <= now), 1)
+    _count_cache[keys] = (time.monotonic(), count)
+    return count
+
+
+def stats():
+    """
+    Return this month's usage and rotation state of every key seen.
+    """
+    now = time.time()
+    month = _month()
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT key_id, masked, month, calls, ejected_until, reason FROM credential_usage ORDER BY masked"
+        ).fetchall()
+    finally:
+        conn.close()
+    shared = set(key_id(key) for key in shared_keys())
+    return {
+        "path": pool_path(),
+        "sharedKeys": len(shared),
+        "monthlyQuota": env_int("RENTCAST_KEY_MONTHLY_QUOTA", 0) or None,
+        "keys": [
+            {
+                "key": masked,
+                "shared": identifier in shared,
+                "callsThisMonth": calls if row_month == month else 0,
+                "inRotation": ejected_until <= now,
+                "ejectedForSeconds": round(ejected_until - now) if ejected_until > now else None,
+                "reason": reason if ejected_until > now else None,
+            }
+            for identifier, masked, row_month, calls, ejected_until, reason in rows
+        ]
+    }
+
+
+def main():
+    """
+    Credential pool inspection CLI.
+    """
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "stats":
+        print(json.dumps(stats(), indent=2))
+    else:
+        print(f"Unknown command: {command}", file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
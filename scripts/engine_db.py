@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Database access for the Python analysis engine.
+
+Connects to the same Postgres database the Next.js app uses through Prisma
+(DATABASE_URL), with a small thread-safe connection pool. psycopg2 is an
+optional dependency (pip install psycopg2-binary); without it, or without
+DATABASE_URL, the database-backed features of the engine stay disabled.
+
+For tests and local experiments DATABASE_URL may instead be
+"sqlite:///path/to/file.db"; the Prisma tables the engine touches are then
+created in that file with equivalent columns.
+
+SQL is written once with %s placeholders (translated to ? for SQLite) and
+Postgres-style quoted identifiers, which SQLite accepts as-is.
+"""
+import io
+import os
+import csv
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from engine_settings import env_int
+
+try:
+    import psycopg2
+    from psycopg2 import pool as pg_pool
+    from psycopg2 import extras as pg_extras
+except ImportError:
+    psycopg2 = None
+    pg_pool = None
+    pg_extras = None
+
+logger = logging.getLogger('rentcast_agent.engine_db')
+
+# Query parameters Prisma understands but libpq rejects
+_PRISMA_ONLY_PARAMS = {"schema", "connection_limit", "pool_timeout", "pgbouncer", "socket_timeout"}
+
+# Prisma tables used by the engine, recreated for the SQLite stand-in
+_SQLITE_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS "NeighborhoodHistory" ('
+    ' "id" TEXT PRIMARY KEY,'
+    ' "zipCode" TEXT NOT NULL,'
+    ' "analysisDate" TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,'
+    ' "finalScore" REAL NOT NULL,'
+    ' "breakdown" TEXT NOT NULL DEFAULT \'{}\','
+    ' "rawData" TEXT DEFAULT \'{}\')',
+    'CREATE INDEX IF NOT EXISTS "NeighborhoodHistory_zipCode_idx" ON "NeighborhoodHistory" ("zipCode")',
+    'CREATE INDEX IF NOT EXISTS "NeighborhoodHistory_analysisDate_idx" ON "NeighborhoodHistory" ("analysisDate")',
+    'CREATE TABLE IF NOT EXISTS "PropertyReport" ('
+    ' "id" TEXT PRIMARY KEY,'
+    ' "createdAt" TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,'
+    ' "updatedAt" TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,'
+    ' "address" TEXT NOT NULL,'
+    ' "propertyType" TEXT NOT NULL,'
+    ' "beds" INTEGER NOT NULL,'
+    ' "baths" REAL NOT NULL,'
+    ' "requestedRent" REAL NOT NULL,'
+    ' "marketRent" REAL,'
+    ' "status" TEXT NOT NULL DEFAULT \'draft\','
+    ' "version" INTEGER NOT NULL DEFAULT 1,'
+    ' "isArchived" INTEGER NOT NULL DEFAULT 0,'
+    ' "propertyDetails" TEXT NOT NULL DEFAULT \'{}\','
+    ' "amenities" TEXT NOT NULL DEFAULT \'[]\','
+    ' "location" TEXT NOT NULL DEFAULT \'{}\','
+    ' "marketAnalysis" TEXT,'
+    ' "financialAnalysis" TEXT,'
+    ' "recommendations" TEXT,'
+    ' "userId" TEXT NOT NULL,'
+    ' "teamId" TEXT)',
+    'CREATE TABLE IF NOT EXISTS "ComparableProperty" ('
+    ' "id" TEXT PRIMARY KEY,'
+    ' "address" TEXT NOT NULL,'
+    ' "price" REAL NOT NULL,'
+    ' "beds" INTEGER NOT NULL,'
+    ' "baths" REAL NOT NULL,'
+    ' "sqft" INTEGER NOT NULL,'
+    ' "yearBuilt" INTEGER,'
+    ' "distance" REAL NOT NULL,'
+    ' "lastSold" TEXT,'
+    ' "propertyType" TEXT NOT NULL,'
+    ' "reportId" TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS "ComparableProperty_reportId_idx" ON "ComparableProperty" ("reportId")',
+    'CREATE TABLE IF NOT EXISTS "SavedProperty" ('
+    ' "id" TEXT PRIMARY KEY,'
+    ' "address" TEXT NOT NULL,'
+    ' "notes" TEXT,'
+    ' "savedAt" TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,'
+    ' "userId" TEXT NOT NULL)',
+)
+
+_database = None
+_database_lock = threading.Lock()
+
+
+def database_url():
+    """
+    Return DATABASE_URL with Prisma-only query parameters removed.
+    """
+    url = os.environ.get("DATABASE_URL", "").strip()
+    if not url or url.startswith("sqlite:"):
+        return url
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query) if k not in _PRISMA_ONLY_PARAMS]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+class Database:
+    """
+    Pooled connections to Postgres, or per-use connections to a SQLite
+    stand-in, behind one interface.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        if url.startswith("sqlite:"):
+            self.dialect = "sqlite"
+            self.path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else url[len("sqlite:"):]
+            self._pool = None
+            with self.connection() as conn:
+                for statement in _SQLITE_SCHEMA:
+                    conn.execute(statement)
+        else:
+            self.dialect = "postgres"
+            self._pool = pg_pool.ThreadedConnectionPool(
+                minconn=1,
+                maxconn=max(env_int("ENGINE_DB_POOL_SIZE", 4), 1),
+                dsn=url
+            )
+
+    def sql(self, statement):
+        """
+        Translate %s placeholders for the active dialect.
+        """
+        return statement.replace("%s", "?") if self.dialect == "sqlite" else statement
+
+    @contextmanager
+    def connection(self):
+        """
+        Borrow a connection for one transaction; commits on success and
+        rolls back on error.
+        """
+        if self.dialect == "sqlite":
+            conn = sqlite3.connect(self.path, timeout=30)
+            try:
+                yield conn
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            finally:
+                conn.close()
+            return
+
+        conn = self._pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._pool.putconn(conn)
+
+    def query(self, statement, params=()):
+        """
+        Run a SELECT and return all rows.
+        """
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self.sql(statement), params)
+            return cursor.fetchall()
+
+    def executemany(self, statement, rows, conn=None):
+        """
+        Run one statement for many parameter rows in a single transaction,
+        or inside the caller's transaction when a connection is given.
+        """
+        if not rows:
+            return 0
+        if conn is not None:
+            conn.cursor().executemany(self.sql(statement), rows)
+            return len(rows)
+        with self.connection() as owned:
+            owned.cursor().executemany(self.sql(statement), rows)
+        return len(rows)
+
+    def execute_batch(self, conn, statement, rows, page_size=1000):
+        """
+        Run one statement for many rows inside the caller's transaction.
+        On Postgres rows are sent in pages of page_size statements per
+        round-trip rather than one round-trip per row.
+        """
+        if not rows:
+            return 0
+        cursor = conn.cursor()
+        if self.dialect == "postgres":
+            pg_extras.execute_batch(cursor, statement, rows, page_size=page_size)
+        else:
+            cursor.executemany(self.sql(statement), rows)
+        return len(rows)
+
+    def copy_rows(self, conn, table, columns, rows):
+        """
+        Bulk insert rows inside the caller's transaction: COPY ... FROM STDIN
+        on Postgres, executemany on SQLite. None is written as NULL.
+        """
+        if not rows:
+            return 0
+        quoted = ", ".join(f'"{c}"' for c in columns)
+        cursor = conn.cursor()
+        if self.dialect == "postgres":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in rows:
+                writer.writerow(["\\N" if v is None else v for v in row])
+            buffer.seek(0)
+            cursor.copy_expert(
+                f'COPY "{table}" ({quoted}) FROM STDIN WITH (FORMAT csv, NULL \'\\N\')',
+                buffer
+            )
+        else:
+            placeholders = ", ".join("?" for _ in columns)
+            cursor.executemany(f'INSERT INTO "{table}" ({quoted}) VALUES ({placeholders})', rows)
+        return len(rows)
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.closeall()
+
+
+def get_database():
+    """
+    Return the shared Database, or None when no usable database is configured.
+    """
+    global _database
+    if _database is not None:
+        return _database or None
+
+    with _database_lock:
+        if _database is None:
+            url = database_url()
+            if not url:
+                _database = False
+            elif not url.startswith("sqlite:") and psycopg2 is None:
+                logger.warning("DATABASE_URL is set but psycopg2 is not installed; database features disabled")
+                _database = False
+            else:
+                try:
+                    _database = Database(url)
+                except Exception as e:
+                    logger.error(f"Could not connect to the database: {str(e)}")
+                    _database = False
+    return _database or None
+
+
+def reset_database(close=True):
+    """
+    Forget the shared Database. A freshly forked worker should pass
+    close=False so it does not close sockets still used by its parent.
+    """
+    global _database
+    with _database_lock:
+        if _database and close:
+            _database.close()
+        _database = None
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Shared paths and environment helpers for the Python analysis engine.
+
+Settings are read from the environment at call time rather than import time
+so that values loaded from .env / .env.local by rentcast_agent.py are seen.
+"""
+import os
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(SCRIPTS_DIR)
+LOG_DIR = os.path.join(REPO_ROOT, 'logs')
+
+
+def cache_dir():
+    """
+    Return the directory used for local engine caches, creating it if needed.
+    Defaults to <repo>/cache and can be moved with FAIRRENT_CACHE_DIR.
+    """
+    path = os.environ.get("FAIRRENT_CACHE_DIR") or os.path.join(REPO_ROOT, 'cache')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def env_int(name, default):
+    """
+    Read an integer from the environment, falling back to the default
+    when the variable is unset or not a valid integer.
+    """
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        return default
+
+
+def env_float(name, default):
+    """
+    Read a float from the environment, falling back to the default
+    when the variable is unset or not a valid number.
+    """
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    try:
+        return float(value)
+    except ValueError:
+        return default
+
+
+def env_flag(name, default=False):
+    """
+    Read a boolean switch from the environment ("1", "true", "yes", "on").
+    """
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+"""
+Per-market hedonic rent model.
+
+Rent is modelled as a linear function of square footage, bedrooms and
+bathrooms. Coefficients are fitted offline, per ZIP code, from listings the
+engine has already fetched (the analysis result cache or an exported
+listings file) and written to one compact binary file. At analysis time the
+file is memory-mapped and the subject's market record is found by binary
+search, so producing adjustedRent for every comp and a model-based estimate
+costs one dot product per record.
+
+Markets without enough listings fall back to a model fitted on all listings,
+and if no model file exists the original fixed coefficients
+($2.50/sqft, $200/bedroom, $150/bathroom) are used.
+
+Environment:
+    HEDONIC_MODEL_PATH   model file (default <cache dir>/hedonic_models.bin)
+
+Usage:
+    python scripts/hedonic_model.py fit [--listings listings.jsonl] [--no-cache]
+    python scripts/hedonic_model.py show 94107
+"""
+import os
+import re
+import sys
+import json
+import mmap
+import math
+import struct
+import sqlite3
+import logging
+from collections import namedtuple, defaultdict
+
+import analysis_cache
+from engine_settings import cache_dir
+from rent_estimator import first_number
+
+logger = logging.getLogger('rentcast_agent.hedonic_model')
+
+FEATURES = ("intercept", "squareFeet", "bedrooms", "bathrooms")
+DEFAULT_COEFFICIENTS = (0.0, 2.5, 200.0, 150.0)
+
+# Key under which the model fitted on every listing is stored
+ALL_MARKETS = "ALL"
+# Minimum listings before a ZIP gets its own model
+MIN_SAMPLES = 8
+# Ridge prior strength, in pseudo-listings, pulling sparse markets
+# towards the default coefficients
+RIDGE_PRIOR_SAMPLES = 5
+
+_MAGIC = b"FRHM"
+_VERSION = 1
+_HEADER = struct.Struct("<4sHHI")
+_RECORD = struct.Struct("<5s3xI4xd" + "d" * len(FEATURES))
+
+Model = namedtuple("Model", ["market", "coefficients", "samples", "rmse"])
+
+DEFAULT_MODEL = Model("default", DEFAULT_COEFFICIENTS, 0, None)
+
+_ZIP_PATTERN = re.compile(r"\b(\d{5})(?:-\d{4})?\s*$")
+
+# (path, mtime) -> (file, mmap) for the currently mapped model file
+_mapped = {}
+
+
+def model_path():
+    """
+    Return the path of the serialized model file.
+    """
+    return os.environ.get("HEDONIC_MODEL_PATH") or os.path.join(cache_dir(), 'hedonic_models.bin')
+
+
+def feature_vector(record):
+    """
+    Return the feature values of a subject or comp, with None for
+    missing features. Accepts both input-style and RentCast-style keys.
+    """
+    return [
+        1.0,
+        first_number(record, "squareFeet", "squareFootage", "sqft"),
+        first_number(record, "beds", "bedrooms"),
+        first_number(record, "baths", "bathrooms")
+    ]
+
+
+def predict(model, record):
+    """
+    Model rent for a record; missing features contribute nothing.
+    """
+    return sum(c * x for c, x in zip(model.coefficients, feature_vector(record)) if x is not None)
+
+
+def adjust_comparables(subject, comps, model):
+    """
+    Set adjustedRent on each comp: its rent plus the model value of the
+    feature differences between the subject and the comp. Features missing on
+    either side are left unadjusted.
+    """
+    subject_x = feature_vector(subject)
+    for comp in comps:
+        rent = first_number(comp, "rent", "price")
+        if not rent:
+            continue
+        comp["adjustedRent"] = adjusted_rent(model, rent, subject_x, feature_vector(comp))
+    return comps
+
+
+def adjusted_rent(model, rent, subject_x, comp_x):
+    """
+    Return a comp's rent adjusted to the subject, given both feature vectors.
+    """
+    coefficients = model.coefficients
+    adjustment = sum(
+        coefficients[j] * (subject_x[j] - comp_x[j])
+        for j in range(1, len(coefficients))
+        if subject_x[j] is not None and comp_x[j] is not None
+    )
+    return round(rent + adjustment, -1)
+
+
+def _zip_key(market):
+    return str(market).encode("ascii")[:5].ljust(5, b"\0")
+
+
+def _open_mapped(path):
+    """
+    Memory-map the model file, reusing the mapping while the file is unchanged.
+    """
+    mtime = os.path.getmtime(path)
+    key = (path, mtime)
+    if key not in _mapped:
+        for f, m in _mapped.values():
+            m.close()
+            f.close()
+        _mapped.clear()
+        f = open(path, "rb")
+        _mapped[key] = (f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+    return _mapped[key][1]
+
+
+def _find_record(mapped, key):
+    """
+    Binary search the sorted fixed-width records for a market key.
+    """
+    magic, version, n_features, count = _HEADER.unpack_from(mapped, 0)
+    if magic != _MAGIC or version != _VERSION or n_features != len(FEATURES):
+        raise ValueError("Unrecognized hedonic model file")
+
+    lo, hi = 0, count - 1
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        offset = _HEADER.size + mid * _RECORD.size
+        market = mapped[offset:offset + 5]
+        if market == key:
+            return _RECORD.unpack_from(mapped, offset)
+        if market < key:
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    return None
+
+
+def load_model(zip_code):
+    """
+    Return the model for a ZIP code, falling back to the all-markets model
+    and then to the default coefficients.
+    """
+    path = model_path()
+    if not os.path.exists(path):
+        return DEFAULT_MODEL
+
+    try:
+        mapped = _open_mapped(path)
+        for market in ([str(zip_code)[:5]] if zip_code else []) + [ALL_MARKETS]:
+            record = _find_record(mapped, _zip_key(market))
+            if record:
+                return Model(market, tuple(record[3:]), record[1], record[2])
+    except (OSError, ValueError, struct.error) as e:
+        logger.warning(f"Could not read hedonic model file {path}: {str(e)}")
+    return DEFAULT_MODEL
+
+
+def _solve(matrix, vector):
+    """
+    Solve a small dense linear system with Gaussian elimination and
+    partial pivoting. Returns None for a singular system.
+    """
+    n = len(vector)
+    a = [list(row) + [vector[i]] for i, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+        if abs(a[pivot][col]) < 1e-12:
+            return None
+        a[col], a[pivot] = a[pivot], a[col]
+        for row in range(col + 1, n):
+            factor = a[row][col] / a[col][col]
+            for k in range(col, n + 1):
+                a[row][k] -= factor * a[col][k]
+    solution = [0.0] * n
+    for row in range(n - 1, -1, -1):
+        total = a[row][n] - sum(a[row][k] * solution[k] for k in range(row + 1, n))
+        solution[row] = total / a[row][row]
+    return solution
+
+
+def fit_market(rows):
+    """
+    Fit coefficients for one market from (features, rent) rows.
+
+    Ridge regression shrinks each slope towards its default coefficient
+    with the weight of RIDGE_PRIOR_SAMPLES listings, scaled by the feature's
+    variance so the units do not matter. The intercept is not penalized.
+    """
+    n = len(rows)
+    k = len(FEATURES)
+    means = [sum(x[j] for x, _ in rows) / n for j in range(k)]
+    variances = [sum((x[j] - means[j]) ** 2 for x, _ in rows) / n for j in range(k)]
+
+    xtx = [[0.0] * k for _ in range(k)]
+    xty = [0.0] * k
+    for x, y in rows:
+        for i in range(k):
+            xty[i] += x[i] * y
+            for j in range(k):
+                xtx[i][j] += x[i] * x[j]
+
+    for j in range(1, k):
+        penalty = RIDGE_PRIOR_SAMPLES * max(variances[j], 1e-6)
+        xtx[j][j] += penalty
+        xty[j] += penalty * DEFAULT_COEFFICIENTS[j]
+
+    coefficients = _solve(xtx, xty)
+    if coefficients is None:
+        return None
+
+    residuals = [y - sum(c * v for c, v in zip(coefficients, x)) for x, y in rows]
+    rmse = math.sqrt(sum(r * r for r in residuals) / n)
+    return coefficients, rmse
+
+
+def fit(listings):
+    """
+    Fit per-ZIP models plus an all-markets model from listing dicts that
+    carry a rent, features and a ZIP code. Returns {market: Model}.
+    """
+    by_market = defaultdict(list)
+    for listing in listings:
+        rent = first_number(listing, "rent", "price")
+        x = feature_vector(listing)
+        zip_code = str(listing.get("zipCode") or "")[:5]
+        if not rent or rent <= 0 or any(v is None for v in x) or not zip_code:
+            continue
+        row = (x, rent)
+        by_market[zip_code].append(row)
+        by_market[ALL_MARKETS].append(row)
+
+    models = {}
+    for market, rows in by_market.items():
+        if len(rows) < MIN_SAMPLES:
+            continue
+        fitted = fit_market(rows)
+        if fitted:
+            models[market] = Model(market, tuple(fitted[0]), len(rows), fitted[1])
+    return models
+
+
+def save_models(models, path=None):
+    """
+    Write models to the fixed-width binary format, sorted by market key,
+    replacing the existing file atomically.
+    """
+    path = path or model_path()
+    ordered = sorted(models.values(), key=lambda m: _zip_key(m.market))
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, len(FEATURES), len(ordered)))
+        for model in ordered:
+            f.write(_RECORD.pack(_zip_key(model.market), model.samples, model.rmse, *model.coefficients))
+    os.replace(tmp_path, path)
+    return path
+
+
+def listings_from_analysis_cache():
+    """
+    Collect real (non-mock) comps and rental listings stored in cached
+    analyses. ZIP codes are taken from the end of the formatted address.
+    """
+    listings = {}
+    conn = sqlite3.connect(analysis_cache.cache_path())
+    try:
+        rows = conn.execute("SELECT payload FROM analysis_cache").fetchall()
+    except sqlite3.Error:
+        rows = []
+    finally:
+        conn.close()
+
+    for (payload,) in rows:
+        try:
+            analysis = json.loads(payload)
+        except ValueError:
+            continue
+        for comp in (analysis.get("comparableProperties") or []) + (analysis.get("recentRentals") or []):
+            if comp.get("source") == "Mock Data":
+                continue
+            address = str(comp.get("address") or "")
+            match = _ZIP_PATTERN.search(address)
+            if not match:
+                continue
+            listing = dict(comp)
+            listing["zipCode"] = match.group(1)
+            listings[address.lower()] = listing
+    return list(listings.values())
+
+
+def listings_from_file(path):
+    """
+    Read listings from a JSON array or JSON-lines file of RentCast listings.
+    """
+    with open(path) as f:
+        text = f.read().strip()
+    if text.startswith("["):
+        return json.loads(text)
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def main():
+    """
+    Batch fitting and inspection CLI.
+    """
+    args = sys.argv[1:]
+    command = args[0] if args else "fit"
+
+    if command == "fit":
+        listings = [] if "--no-cache" in args else listings_from_analysis_cache()
+        if "--listings" in args:
+            listings.extend(listings_from_file(args[args.index("--listings") + 1]))
+        models = fit(listings)
+        if not models:
+            print(json.dumps({"status": "error", "message": "Not enough listings to fit any market"}))
+            sys.exit(1)
+        path = save_models(models)
+        print(json.dumps({
+            "path": path,
+            "listings": len(listings),
+            "markets": {m.market: {"samples": m.samples, "rmse": round(m.rmse, 1)} for m in models.values()}
+        }, indent=2))
+    elif command == "show":
+        model = load_model(args[1] if len(args) > 1 else None)
+        print(json.dumps(model._asdict(), indent=2))
+    else:
+        print(f"Unknown command: {command}", file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
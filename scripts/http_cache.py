@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+"""
+HTTP-semantics disk cache under the provider client.
+
+Successful provider responses are stored in a local SQLite file with their
+validators (ETag, Last-Modified) and a freshness lifetime, keyed like the
+record/replay archive (method, URL and query parameters, credentials
+excluded). provider_client.get() consults it in live mode:
+
+    fresh     the stored body is served without a request
+    stale     the request is sent conditionally (If-None-Match,
+              If-Modified-Since); a 304 refreshes the entry and the stored
+              body is served, so unchanged listing and market pages cost a
+              round trip but no download
+    missing   a normal request; a 200 is stored for next time
+
+The lifetime comes from the response when it says anything (Cache-Control
+max-age less Age, no-cache for "always revalidate", no-store for "never
+store", or Expires less Date), and otherwise from FRESHNESS_RULES, a
+per-endpoint table for providers that send no caching headers. Entries
+past their lifetime are kept while they have validators, for revalidation.
+The file is kept under a size bound with least-recently-used eviction.
+
+Environment:
+    HTTP_CACHE_ENABLED   "0" disables the cache (default enabled)
+    HTTP_CACHE_PATH      SQLite file (default <cache dir>/http_cache.sqlite)
+    HTTP_CACHE_MAX_MB    bound on stored (compressed) bodies (default 256)
+
+Usage:
+    python scripts/http_cache.py stats
+    python scripts/http_cache.py clear
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import sqlite3
+import logging
+from collections import namedtuple
+from email.utils import parsedate_to_datetime
+
+from engine_settings import cache_dir, env_flag, env_int
+
+logger = logging.getLogger('rentcast_agent.http_cache')
+
+# Freshness (seconds) for responses without caching headers, by URL prefix.
+# The first matching prefix wins; other URLs get no freshness and are only
+# reused through revalidation.
+FRESHNESS_RULES = (
+    ("https://api.rentcast.io/v1/listings/", 60 * 60),
+    ("https://api.rentcast.io/v1/markets", 12 * 60 * 60),
+    ("https://api.rentcast.io/v1/avm/", 24 * 60 * 60),
+    ("https://api.rentcast.io/v1/properties", 24 * 60 * 60),
+    ("https://zillow-com1.p.rapidapi.com/", 60 * 60),
+    ("https://maps.googleapis.com/maps/api/geocode/", 30 * 24 * 60 * 60),
+)
+
+# Response headers kept with a stored body
+_STORED_HEADERS = ("content-type", "etag", "last-modified", "cache-control", "expires", "date")
+
+CachedResponse = namedtuple("CachedResponse", "status body headers fresh")
+
+
+def is_enabled():
+    """
+    Return True unless the cache has been switched off in the environment.
+    """
+    return env_flag("HTTP_CACHE_ENABLED", True)
+
+
+def cache_path():
+    """
+    Return the path of the SQLite file backing the cache.
+    """
+    return os.environ.get("HTTP_CACHE_PATH") or os.path.join(cache_dir(), 'http_cache.sqlite')
+
+
+def max_bytes():
+    """
+    Return the configured bound on stored body bytes.
+    """
+    return max(env_int("HTTP_CACHE_MAX_MB", 256), 1) * 1024 * 1024
+
+
+def _connect():
+    """
+    Open the cache database, creating the table on first use.
+    """
+    conn = sqlite3.connect(cache_path(), timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS http_cache ("
+        " key TEXT PRIMARY KEY,"
+        " url TEXT NOT NULL,"
+        " status INTEGER NOT NULL,"
+        " headers TEXT NOT NULL,"
+        " body BLOB NOT NULL,"
+        " size INTEGER NOT NULL,"
+        " stored_at REAL NOT NULL,"
+        " expires_at REAL NOT NULL,"
+        " accessed_at REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS http_cache_accessed ON http_cache (accessed_at)")
+    return conn
+
+
+def _header(headers, name):
+    """
+    Case-insensitive header lookup on a dict or a requests/httpx header map.
+    """
+    value = headers.get(name)
+    if value is None:
+        for key, candidate in headers.items():
+            if key.lower() == name:
+                return candidate
+    return value
+
+
+def _cache_control(headers):
+    """
+    Parse Cache-Control into a dict of lowercase directives.
+    """
+    directives = {}
+    for part in (_header(headers, "cache-control") or "").split(","):
+        name, _, value = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = value.strip().strip('"')
+    return directives
+
+
+def _http_time(value):
+    try:
+        return parsedate_to_datetime(value).timestamp()
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def endpoint_freshness(url):
+    """
+    Return the FRESHNESS_RULES lifetime for a URL, or 0 when none applies.
+    """
+    for prefix, seconds in FRESHNESS_RULES:
+        if url.startswith(prefix):
+            return seconds
+    return 0
+
+
+def freshness_lifetime(url, headers):
+    """
+    Return how many seconds a response stays fresh, or None when it must
+    not be stored.
+    """
+    directives = _cache_control(headers)
+    if "no-store" in directives:
+        return None
+    if "no-cache" in directives:
+        return 0
+    if "max-age" in directives:
+        try:
+            age = int(_header(headers, "age") or 0)
+            return max(int(directives["max-age"]) - age, 0)
+        except ValueError:
+            return 0
+    expires = _http_time(_header(headers, "expires"))
+    if expires is not None:
+        date = _http_time(_header(headers, "date")) or time.time()
+        return max(expires - date, 0)
+    return endpoint_freshness(url)
+
+
+def _has_validators(headers):
+    return bool(headers.get("etag") or headers.get("last-modified"))
+
+
+def lookup(key):
+    """
+    Return the CachedResponse stored for a request key, or None when there
+    is none or it is stale and cannot be revalidated.
+    """
+    if not is_enabled():
+        return None
+    now = time.time()
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                row = conn.execute(
+                    "SELECT status, headers, body, expires_at FROM http_cache WHERE key = ?", (key,)
+                ).fetchone()
+                if not row:
+                    return None
+                status, headers, body, expires_at = row
+                headers = json.loads(headers)
+                fresh = now < expires_at
+                if not fresh and not _has_validators(headers):
+                    conn.execute("DELETE FROM http_cache WHERE key = ?", (key,))
+                    return None
+                conn.execute("UPDATE http_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            return CachedResponse(status, zlib.decompress(body), headers, fresh)
+        finally:
+            conn.close()
+    except (sqlite3.Error, zlib.error, ValueError) as e:
+        logger.warning(f"HTTP cache read failed: {str(e)}")
+        return None
+
+
+def conditional_headers(cached, headers):
+    """
+    Return the request headers with the validators of a stale cached
+    response added, so the provider can answer 304 Not Modified.
+    """
+    if cached is None or cached.fresh:
+        return headers
+    headers = dict(headers or {})
+    if cached.headers.get("etag"):
+        headers["If-None-Match"] = cached.headers["etag"]
+    if cached.headers.get("last-modified"):
+        headers["If-Modified-Since"] = cached.headers["last-modified"]
+    return headers
+
+
+def store(key, url, response):
+    """
+    Store a 200 response that may be cached, evicting the least recently
+    used entries beyond the size bound. Returns True when stored.
+    """
+    if not is_enabled() or response.status_code != 200:
+        return False
+    lifetime = freshness_lifetime(url, response.headers)
+    if lifetime is None:
+        return False
+    headers = {name: _header(response.headers, name) for name in _STORED_HEADERS}
+    headers = {name: value for name, value in headers.items() if value is not None}
+    if not lifetime and not _has_validators(headers):
+        # Neither reusable as is nor revalidatable
+        return False
+
+    now = time.time()
+    try:
+        body = zlib.compress(response.content, 6)
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO http_cache "
+                    "(key, url, status, headers, body, size, stored_at, expires_at, accessed_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, url, response.status_code, json.dumps(headers), body, len(body), now, now + lifetime, now)
+                )
+                _evict(conn)
+        finally:
+            conn.close()
+        return True
+    except sqlite3.Error as e:
+        logger.warning(f"HTTP cache write failed: {str(e)}")
+        return False
+
+
+def refresh(key, url, not_modified):
+    """
+    Extend a stored response after a 304, taking any new caching headers
+    and validators from the 304 itself.
+    """
+    now = time.time()
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                row = conn.execute("SELECT headers FROM http_cache WHERE key = ?", (key,)).fetchone()
+                if not row:
+                    return
+                headers = json.loads(row[0])
+                for name in _STORED_HEADERS:
+                    value = _header(not_modified.headers, name)
+                    if value is not None and name != "content-type":
+                        headers[name] = value
+                lifetime = freshness_lifetime(url, headers) or 0
+                conn.execute(
+                    "UPDATE http_cache SET headers = ?, stored_at = ?, expires_at = ?, accessed_at = ? WHERE key = ?",
+                    (json.dumps(headers), now, now + lifetime, now, key)
+                )
+        finally:
+            conn.close()
+    except (sqlite3.Error, ValueError) as e:
+        logger.warning(f"HTTP cache refresh failed: {str(e)}")
+
+
+def _evict(conn):
+    """
+    Drop least recently used entries until the stored bodies fit the bound.
+    """
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM http_cache").fetchone()[0]
+    limit = max_bytes()
+    if total <= limit:
+        return
+    removed = 0
+    for key, size in conn.execute("SELECT key, size FROM http_cache ORDER BY accessed_at ASC").fetchall():
+        if total <= limit:
+            break
+        conn.execute("DELETE FROM http_cache WHERE key = ?", (key,))
+        total -= size
+        removed += 1
+    logger.info(f"Evicted {removed} responses from the HTTP cache")
+
+
+def clear():
+    """
+    Delete every stored response. Returns the number removed.
+    """
+    conn = _connect()
+    try:
+        with conn:
+            cursor = conn.execute("DELETE FROM http_cache")
+        return cursor.rowcount
+    finally:
+        conn.close()
+
+
+def stats():
+    """
+    Summarize the cache contents per URL.
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT url, COUNT(*), SUM(size), SUM(expires_at > ?) FROM http_cache GROUP BY url ORDER BY url",
+            (now,)
+        ).fetchall()
+    finally:
+        conn.close()
+    return {
+        "path": cache_path(),
+        "maxBytes": max_bytes(),
+        "endpoints": {
+            url: {"responses": count, "compressedBytes": size, "fresh": fresh}
+            for url, count, size, fresh in rows
+        }
+    }
+
+
+def main():
+    """
+    Maintenance CLI for the cache.
+    """
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "stats":
+        result = stats()
+    elif command == "clear":
+        result = {"removed": clear()}
+    else:
+        print(f"Unknown command: {command}", file=sys.stderr)
+        sys.exit(2)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
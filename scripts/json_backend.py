@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+JSON encoding and decoding for the analysis engine.
+
+Provider payloads (listing pages of hundreds of records) and batch outputs
+are decoded and encoded on every run. orjson is used when installed
+(pip install orjson), several times faster than the standard library for
+both directions; otherwise the stdlib json module is used with the same
+results.
+
+    loads / dumps      drop-in decode and compact encode
+    response_json      decode a provider response body without the
+                       requests/stdlib detour through text
+    write              stream an analysis or batch to a binary stream,
+                       encoding large arrays element by element instead of
+                       building one giant string
+    describe           short shape summary of a payload for log lines, so
+                       payloads are never re-serialized just to be logged
+
+Environment:
+    FAIRRENT_JSON_BACKEND   "stdlib" forces the standard library encoder
+"""
+import os
+import json
+import logging
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger('rentcast_agent.json_backend')
+
+# Arrays at least this long are streamed element by element by write()
+STREAM_MIN_ITEMS = 32
+
+
+def backend():
+    """
+    Return the name of the active backend.
+    """
+    if orjson is not None and (os.environ.get("FAIRRENT_JSON_BACKEND") or "").strip().lower() != "stdlib":
+        return "orjson"
+    return "json"
+
+
+def loads(data):
+    """
+    Decode JSON from bytes or str.
+    """
+    if backend() == "orjson":
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps_bytes(obj):
+    """
+    Encode obj as compact UTF-8 JSON bytes.
+    """
+    if backend() == "orjson":
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # Values orjson refuses (e.g. out-of-range ints) go through stdlib
+            pass
+    return json.dumps(obj, separators=(",", ":")).encode("utf-8")
+
+
+def dumps(obj):
+    """
+    Encode obj as a compact JSON string.
+    """
+    return dumps_bytes(obj).decode("utf-8")
+
+
+def response_json(response):
+    """
+    Decode a provider response body (requests.Response or ProviderResponse).
+    Raises ValueError on invalid JSON, like response.json().
+    """
+    return loads(response.content)
+
+
+def iter_encode(obj):
+    """
+    Yield the JSON encoding of obj in chunks. Long lists, at the top level
+    or as values of a top-level object, are encoded one element at a time.
+    """
+    if isinstance(obj, list) and len(obj) >= STREAM_MIN_ITEMS:
+        yield b"["
+        for index, item in enumerate(obj):
+            if index:
+                yield b","
+            yield dumps_bytes(item)
+        yield b"]"
+    elif isinstance(obj, list):
+        # Short lists, e.g. a small batch of analyses, still stream per analysis
+        yield b"["
+        for index, item in enumerate(obj):
+            if index:
+                yield b","
+            yield from iter_encode(item) if isinstance(item, dict) else (dumps_bytes(item),)
+        yield b"]"
+    elif isinstance(obj, dict):
+        yield b"{"
+        for index, (key, value) in enumerate(obj.items()):
+            if index:
+                yield b","
+            yield dumps_bytes(str(key)) + b":"
+            if isinstance(value, list) and len(value) >= STREAM_MIN_ITEMS:
+                yield from iter_encode(value)
+            else:
+                yield dumps_bytes(value)
+        yield b"}"
+    else:
+        yield dumps_bytes(obj)
+
+
+def write(obj, stream):
+    """
+    Stream the JSON encoding of obj, followed by a newline, to a binary stream.
+    """
+    for chunk in iter_encode(obj):
+        stream.write(chunk)
+    stream.write(b"\n")
+    stream.flush()
+
+
+def describe(payload):
+    """
+    Summarize a payload's shape for logging without encoding it.
+    """
+    if isinstance(payload, list):
+        return f"list of {len(payload)} items"
+    if isinstance(payload, dict):
+        keys = list(payload)
+        more = f", +{len(keys) - 8} more" if len(keys) > 8 else ""
+        return f"object with keys {', '.join(str(k) for k in keys[:8])}{more}"
+    return type(payload).__name__
@@ -0,0 +1,375 @@
+#!/usr/bin/env python3
+"""
+Priority lanes for provider calls and CPU.
+
+Interactive analyses (one property from the rent-analysis route) and bulk
+work (batches, the analysis pool) run in separate processes but draw on the
+same provider rate limits. Every live provider call to a rate-limited host
+first takes a token from its lane's bucket. The buckets sit in a small
+SQLite file shared by every engine process on the host, and each update is
+one short transaction.
+
+    weighted fair sharing  a host's rate (PROVIDER_RATE_LIMITS) is split
+                           between the lanes that asked for tokens in the
+                           last ACTIVE_SECONDS in proportion to their
+                           weights (LANE_WEIGHTS); a lane alone gets the
+                           whole rate, and tokens that overflow a full
+                           bucket go to the other lanes, so bulk work uses
+                           whatever capacity interactive requests leave
+    preemption             while an interactive caller is waiting for a
+                           token, bulk callers take none, whatever their
+                           share
+    burst allowance        an idle lane keeps refilling its share, so the
+                           first calls of a new interactive request do not
+                           wait behind a running batch
+
+Bulk processes also lower their CPU priority (os.nice) so interactive
+analyses get the cores first.
+
+A process's lane is set with set_lane(), or ENGINE_LANE, and defaults to
+interactive. rentcast_agent.py runs batches in the bulk lane and the
+analysis pool's workers are always bulk.
+
+Environment:
+    ENGINE_LANE                interactive | bulk
+    PROVIDER_RATE_LIMITS       requests per second per host, e.g.
+                               "api.rentcast.io=20,zillow-com1.p.rapidapi.com=5"
+                               (default "api.rentcast.io=20"); other hosts
+                               are not limited. RentCast's rate is per key
+                               and is multiplied by the keys in rotation
+                               that the call may use (credential_pool.py);
+                               calls with a customer's own keys get buckets
+                               of their own
+    LANE_WEIGHTS               e.g. "interactive=4,bulk=1" (the default)
+    LANE_SCHEDULER_ENABLED     "0" turns scheduling off
+    LANE_SCHEDULER_MAX_WAIT    seconds a call waits before going ahead
+                               anyway (default 30)
+    LANE_SCHEDULER_PATH        SQLite file (default <cache dir>/lane_scheduler.sqlite)
+    ENGINE_BULK_NICE           niceness added by bulk processes (default 10)
+
+Usage:
+    python scripts/lane_scheduler.py stats
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import sqlite3
+import logging
+from urllib.parse import urlsplit
+
+import credential_pool
+from engine_settings import cache_dir, env_flag, env_float, env_int
+
+logger = logging.getLogger('rentcast_agent.lane_scheduler')
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+LANES = (INTERACTIVE, BULK)
+
+DEFAULT_RATE_LIMITS = "api.rentcast.io=20"
+DEFAULT_WEIGHTS = "interactive=4,bulk=1"
+# A lane that asked for a token this recently shares the rate
+ACTIVE_SECONDS = 2.0
+# Bucket capacity, in seconds of the lane's share
+BURST_SECONDS = 0.5
+# Longest single sleep between attempts
+_POLL_SECONDS = 0.25
+
+_lane = None
+
+
+def set_lane(lane):
+    """
+    Set the lane of this process's provider calls.
+    """
+    global _lane
+    if lane not in LANES:
+        raise ValueError(f"Unknown lane '{lane}'")
+    _lane = lane
+
+
+def current_lane():
+    """
+    Return the lane of this process: set_lane(), then ENGINE_LANE, then
+    interactive.
+    """
+    if _lane:
+        return _lane
+    lane = (os.environ.get("ENGINE_LANE") or "").strip().lower()
+    return lane if lane in LANES else INTERACTIVE
+
+
+def apply_cpu_priority():
+    """
+    Lower this process's CPU priority when it runs in the bulk lane.
+    """
+    if current_lane() != BULK or not hasattr(os, "nice"):
+        return
+    try:
+        os.nice(max(env_int("ENGINE_BULK_NICE", 10), 0))
+    except OSError as e:
+        logger.warning(f"Could not lower CPU priority: {str(e)}")
+
+
+def _parse_pairs(text):
+    pairs = {}
+    for item in (text or "").split(","):
+        name, _, value = item.strip().partition("=")
+        try:
+            pairs[name.strip().lower()] = float(value)
+        except ValueError:
+            continue
+    return pairs
+
+
+def rate_limit(host):
+    """
+    Return the configured requests per second for a host, or None.
+    """
+    limits = _parse_pairs(os.environ.get("PROVIDER_RATE_LIMITS") or DEFAULT_RATE_LIMITS)
+    rate = limits.get((host or "").lower())
+    return rate if rate and rate > 0 else None
+
+
+def weights():
+    """
+    Return the weight of every lane.
+    """
+    configured = _parse_pairs(os.environ.get("LANE_WEIGHTS") or DEFAULT_WEIGHTS)
+    defaults = _parse_pairs(DEFAULT_WEIGHTS)
+    return {lane: max(configured.get(lane, defaults[lane]), 0.01) for lane in LANES}
+
+
+def scheduler_path():
+    """
+    Return the path of the shared bucket file.
+    """
+    return os.environ.get("LANE_SCHEDULER_PATH") or os.path.join(cache_dir(), 'lane_scheduler.sqlite')
+
+
+def _connect():
+    conn = sqlite3.connect(scheduler_path(), timeout=10, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS lane_buckets ("
+        " host TEXT NOT NULL,"
+        " lane TEXT NOT NULL,"
+        " tokens REAL NOT NULL,"
+        " updated_at REAL NOT NULL,"
+        " demand_at REAL NOT NULL,"
+        " waiting_until REAL NOT NULL,"
+        " PRIMARY KEY (host, lane))"
+    )
+    return conn
+
+
+def _take(conn, host, lane, rate):
+    """
+    Try to take one token for lane in a single transaction. Returns 0 when
+    taken, otherwise the number of seconds to wait before trying again.
+    """
+    lane_weights = weights()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Read the clock inside the lock so updates never move backwards
+        now = time.time()
+        rows = {
+            row[0]: list(row[1:])
+            for row in conn.execute(
+                "SELECT lane, tokens, updated_at, demand_at, waiting_until FROM lane_buckets WHERE host = ?",
+                (host,)
+            )
+        }
+        all_weight = sum(lane_weights.values())
+        for name in LANES:
+            if name not in rows:
+                # A new bucket starts full
+                rows[name] = [rate * BURST_SECONDS * lane_weights[name] / all_weight, now, 0.0, 0.0]
+        rows[lane][2] = now
+
+        active = [name for name in LANES if now - rows[name][2] <= ACTIVE_SECONDS]
+        active_weight = sum(lane_weights[name] for name in active)
+        shares = {}
+        capacities = {}
+        for name in LANES:
+            # Active lanes split the rate; an idle lane refills its nominal share
+            shares[name] = lane_weights[name] / (active_weight if name in active else all_weight)
+            capacities[name] = max(rate * BURST_SECONDS * shares[name], 1.0)
+        # Tokens produced since the last update: idle lanes top up first, the
+        # active lanes split the rest by weight, and what a full bucket cannot
+        # hold goes to the active lanes that can use it
+        elapsed = max(now - min(row[1] for row in rows.values()), 0)
+        budget = elapsed * rate
+        for name in LANES:
+            if name not in active:
+                added = min(capacities[name] - rows[name][0], elapsed * rate * shares[name])
+                if added > 0:
+                    rows[name][0] += added
+                    budget -= added
+        overflow = 0.0
+        for name in active:
+            tokens = rows[name][0] + max(budget, 0) * shares[name]
+            overflow += max(tokens - capacities[name], 0)
+            rows[name][0] = min(tokens, capacities[name])
+        for name in active:
+            room = capacities[name] - rows[name][0]
+            if overflow > 0 and room > 0:
+                rows[name][0] += min(room, overflow)
+                overflow -= min(room, overflow)
+        for name in LANES:
+            rows[name][0] = min(rows[name][0], capacities[name])
+            rows[name][1] = now
+
+        wait = 0.0
+        bucket = rows[lane]
+        interactive_waiting = rows[INTERACTIVE][3] - now
+        if lane != INTERACTIVE and interactive_waiting > 0:
+            wait = interactive_waiting
+        elif bucket[0] >= 1.0:
+            bucket[0] -= 1.0
+        else:
+            wait = (1.0 - bucket[0]) / (rate * shares[lane])
+            if lane == INTERACTIVE:
+                bucket[3] = now + wait
+
+        conn.executemany(
+            "INSERT OR REPLACE INTO lane_buckets (host, lane, tokens, updated_at, demand_at, waiting_until) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            [(host, name, *values) for name, values in rows.items()]
+        )
+        conn.execute("COMMIT")
+        return wait
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+
+
+def _schedule(url, credentials=None):
+    """
+    Return (bucket host, rate) when calls to url are scheduled, else None.
+    """
+    if not env_flag("LANE_SCHEDULER_ENABLED", True):
+        return None
+    host = urlsplit(url).hostname
+    rate = rate_limit(host)
+    if rate and host == credential_pool.HOST:
+        # RentCast limits each key, so the call's keys add up; keys outside
+        # the shared pool have their own limits and buckets
+        rate *= credential_pool.key_count(credentials or None)
+        scope = credential_pool.scope_of(credentials)
+        if scope != "shared":
+            host = f"{host}#{scope}"
+    return (host, rate) if rate else None
+
+
+def acquire(url, lane=None, credentials=None):
+    """
+    Block until the lane may call url with `credentials` (the keys the call
+    may use). Returns the seconds waited. Hosts without a rate limit return
+    at once.
+    """
+    scheduled = _schedule(url, credentials)
+    if not scheduled:
+        return 0.0
+    host, rate = scheduled
+    lane = lane or current_lane()
+    max_wait = env_float("LANE_SCHEDULER_MAX_WAIT", 30.0)
+    started = time.monotonic()
+    try:
+        conn = _connect()
+    except sqlite3.Error as e:
+        logger.warning(f"Lane scheduler unavailable: {str(e)}")
+        return 0.0
+    try:
+        while True:
+            try:
+                wait = _take(conn, host, lane, rate)
+            except sqlite3.Error as e:
+                logger.warning(f"Lane scheduler unavailable: {str(e)}")
+                return time.monotonic() - started
+            waited = time.monotonic() - started
+            if wait <= 0:
+                if waited > 0.05:
+                    logger.info(f"Waited {waited:.2f}s for a {host} token in the {lane} lane")
+                return waited
+            if waited >= max_wait:
+                logger.warning(f"Gave up waiting for a {host} token in the {lane} lane after {waited:.1f}s")
+                return waited
+            time.sleep(min(wait, _POLL_SECONDS))
+    finally:
+        conn.close()
+
+
+async def acquire_async(url, lane=None, credentials=None):
+    """
+    Asyncio variant of acquire(). Bucket updates run in a worker thread and
+    waits do not block the event loop.
+    """
+    scheduled = _schedule(url, credentials)
+    if not scheduled:
+        return 0.0
+    host, rate = scheduled
+    lane = lane or current_lane()
+    max_wait = env_float("LANE_SCHEDULER_MAX_WAIT", 30.0)
+    started = time.monotonic()
+
+    def take():
+        conn = _connect()
+        try:
+            return _take(conn, host, lane, rate)
+        finally:
+            conn.close()
+
+    while True:
+        try:
+            wait = await asyncio.to_thread(take)
+        except sqlite3.Error as e:
+            logger.warning(f"Lane scheduler unavailable: {str(e)}")
+            return time.monotonic() - started
+        waited = time.monotonic() - started
+        if wait <= 0 or waited >= max_wait:
+            if wait > 0:
+                logger.warning(f"Gave up waiting for a {host} token in the {lane} lane after {waited:.1f}s")
+            return waited
+        await asyncio.sleep(min(wait, _POLL_SECONDS))
+
+
+def stats():
+    """
+    Return the current state of every bucket.
+    """
+    now = time.time()
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT host, lane, tokens, updated_at, demand_at, waiting_until FROM lane_buckets ORDER BY host, lane"
+        ).fetchall()
+    finally:
+        conn.close()
+    result = {"path": scheduler_path(), "weights": weights(), "hosts": {}}
+    for host, lane, tokens, updated_at, demand_at, waiting_until in rows:
+        result["hosts"].setdefault(host, {"ratePerSecond": rate_limit(host)})[lane] = {
+            "tokens": round(tokens, 2),
+            "active": now - demand_at <= ACTIVE_SECONDS,
+            "lastDemandSecondsAgo": round(now - demand_at, 1) if demand_at else None,
+            "waiting": waiting_until > now,
+        }
+    return result
+
+
+def main():
+    """
+    Scheduler inspection CLI.
+    """
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "stats":
+        print(json.dumps(stats(), indent=2))
+    else:
+        print(f"Unknown command: {command}", file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+Precomputed ZIP market summary table.
+
+Market insights used to be derived on every analysis from a live
+/v1/markets response (walking and sorting the rental history each time).
+This module keeps a local SQLite table of per-ZIP aggregates, broken down by
+bedroom count and property type where RentCast provides them:
+
+    median / mean / min / max rent, average days on market,
+    total and new listings, trailing 3/6/12-month rent trend,
+    and the change over the full history window.
+
+Analyses read a row with one primary-key lookup. Rows are refreshed by a
+scheduled job, e.g. nightly from cron:
+
+    0 3 * * * cd /path/to/fairrent && venv/bin/python scripts/market_summary.py refresh
+
+and are also written through whenever an analysis has to fall back to a live
+/v1/markets call because its ZIP is missing or stale.
+
+Environment:
+    MARKET_SUMMARY_PATH     SQLite file (default <cache dir>/market_summary.sqlite)
+    MARKET_SUMMARY_MAX_AGE  seconds before a row is considered stale (default 604800)
+
+Usage:
+    python scripts/market_summary.py refresh [--zips 94107,94105] [--stale-only]
+    python scripts/market_summary.py show 94107 [bedrooms] [propertyType]
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+
+from engine_settings import cache_dir, env_int
+
+logger = logging.getLogger('rentcast_agent.market_summary')
+
+DEFAULT_MAX_AGE_SECONDS = 7 * 24 * 60 * 60
+
+# Empty string in a key column means "all bedrooms" / "all property types"
+ANY = ""
+
+COLUMNS = (
+    "zip_code", "bedrooms", "property_type",
+    "median_rent", "average_rent", "min_rent", "max_rent",
+    "average_days_on_market", "total_listings", "new_listings",
+    "trend_3m", "trend_6m", "trend_12m",
+    "history_change", "history_months",
+    "last_updated", "refreshed_at"
+)
+
+
+def summary_path():
+    """
+    Return the path of the SQLite file holding the summary table.
+    """
+    return os.environ.get("MARKET_SUMMARY_PATH") or os.path.join(cache_dir(), 'market_summary.sqlite')
+
+
+def max_age_seconds():
+    """
+    Return the age after which a summary row is treated as stale.
+    """
+    return env_int("MARKET_SUMMARY_MAX_AGE", DEFAULT_MAX_AGE_SECONDS)
+
+
+def _connect():
+    """
+    Open the summary database, creating the table on first use.
+    """
+    conn = sqlite3.connect(summary_path(), timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # Reads go through a shared memory map so pool workers share one page cache
+    conn.execute("PRAGMA mmap_size=268435456")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS zip_market_summary ("
+        " zip_code TEXT NOT NULL,"
+        " bedrooms TEXT NOT NULL,"
+        " property_type TEXT NOT NULL,"
+        " median_rent REAL, average_rent REAL, min_rent REAL, max_rent REAL,"
+        " average_days_on_market REAL, total_listings INTEGER, new_listings INTEGER,"
+        " trend_3m REAL, trend_6m REAL, trend_12m REAL,"
+        " history_change REAL, history_months INTEGER,"
+        " last_updated TEXT, refreshed_at REAL NOT NULL,"
+        " PRIMARY KEY (zip_code, bedrooms, property_type)"
+        ") WITHOUT ROWID"
+    )
+    return conn
+
+
+def _key(value):
+    """
+    Normalize a bedroom count or property type into a key column value.
+    """
+    if value is None:
+        return ANY
+    text = str(value).strip().lower()
+    if text.endswith(".0"):
+        text = text[:-2]
+    return text
+
+
+def _percent_change(old, new):
+    if not old or new is None:
+        return None
+    return round((new - old) / old * 100, 2)
+
+
+def _month_index(month_key):
+    """
+    Convert a "YYYY-MM" history key into a month counter.
+    """
+    try:
+        year, month = str(month_key)[:7].split("-")
+        return int(year) * 12 + int(month) - 1
+    except ValueError:
+        return None
+
+
+def _history_trends(history, field="averageRent"):
+    """
+    Compute trailing 3/6/12-month trends and the full-window change from a
+    RentCast history mapping of "YYYY-MM" -> {averageRent, ...}.
+    """
+    series = {}
+    for month_key, entry in (history or {}).items():
+        index = _month_index(month_key)
+        value = (entry or {}).get(field)
+        if index is not None and value:
+            series[index] = value
+
+    trends = {"trend_3m": None, "trend_6m": None, "trend_12m": None,
+              "history_change": None, "history_months": len(series)}
+    if len(series) < 2:
+        return trends
+
+    months = sorted(series)
+    latest = months[-1]
+    for span in (3, 6, 12):
+        trends[f"trend_{span}m"] = _percent_change(series.get(latest - span), series[latest])
+    trends["history_change"] = _percent_change(series[months[0]], series[latest])
+    return trends
+
+
+def _summary_row(zip_code, bedrooms, property_type, data, history, refreshed_at, last_updated):
+    row = {
+        "zip_code": zip_code,
+        "bedrooms": bedrooms,
+        "property_type": property_type,
+        "median_rent": data.get("medianRent"),
+        "average_rent": data.get("averageRent"),
+        "min_rent": data.get("minRent"),
+        "max_rent": data.get("maxRent"),
+        "average_days_on_market": data.get("averageDaysOnMarket"),
+        "total_listings": data.get("totalListings"),
+        "new_listings": data.get("newListings"),
+        "last_updated": last_updated,
+        "refreshed_at": refreshed_at
+    }
+    row.update(_history_trends(history))
+    return row
+
+
+def summarize_market_payload(zip_code, payload, refreshed_at=None):
+    """
+    Turn one /v1/markets response into summary rows: the ZIP as a whole plus
+    one row per bedroom count and per property type breakdown.
+    """
+    rental_data = (payload or {}).get("rentalData") or {}
+    if not rental_data:
+        return []
+
+    refreshed_at = refreshed_at or time.time()
+    last_updated = rental_data.get("lastUpdatedDate")
+    history = rental_data.get("history") or {}
+    rows = [_summary_row(zip_code, ANY, ANY, rental_data, history, refreshed_at, last_updated)]
+
+    breakdowns = (
+        ("dataByBedrooms", "bedrooms", lambda v: (_key(v), ANY)),
+        ("dataByPropertyType", "propertyType", lambda v: (ANY, _key(v)))
+    )
+    for section, field, keys in breakdowns:
+        for entry in rental_data.get(section) or []:
+            if entry.get(field) is None:
+                continue
+            bedrooms, property_type = keys(entry.get(field))
+            # Per-breakdown history lives inside each month's matching section
+            sub_history = {}
+            for month_key, month in history.items():
+                for sub in (month or {}).get(section) or []:
+                    if _key(sub.get(field)) == _key(entry.get(field)):
+                        sub_history[month_key] = sub
+            rows.append(_summary_row(zip_code, bedrooms, property_type, entry,
+                                     sub_history, refreshed_at, last_updated))
+    return rows
+
+
+def store_rows(rows):
+    """
+    Upsert summary rows.
+    """
+    if not rows:
+        return 0
+    placeholders = ", ".join("?" for _ in COLUMNS)
+    conn = _connect()
+    try:
+        with conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO zip_market_summary ({', '.join(COLUMNS)}) VALUES ({placeholders})",
+                [tuple(row.get(column) for column in COLUMNS) for row in rows]
+            )
+    finally:
+        conn.close()
+    return len(rows)
+
+
+def store_market_payload(zip_code, payload):
+    """
+    Summarize a live /v1/markets response and write it through to the table.
+    """
+    try:
+        return store_rows(summarize_market_payload(str(zip_code)[:5], payload))
+    except sqlite3.Error as e:
+        logger.warning(f"Could not store market summary for {zip_code}: {str(e)}")
+        return 0
+
+
+def lookup(zip_code, bedrooms=None, property_type=None, max_age=None):
+    """
+    Return the most specific fresh summary row for the ZIP as a dict,
+    preferring an exact bedroom+type row, then bedroom, then type, then the
+    whole ZIP. Returns None when nothing fresh is available.
+    """
+    if not zip_code:
+        return None
+    bedrooms, property_type = _key(bedrooms), _key(property_type)
+    max_age = max_age_seconds() if max_age is None else max_age
+
+    try:
+        conn = _connect()
+        try:
+            cursor = conn.execute(
+                f"SELECT {', '.join(COLUMNS)} FROM zip_market_summary "
+                "WHERE zip_code = ? AND bedrooms IN (?, '') AND property_type IN (?, '') "
+                "AND refreshed_at >= ?",
+                (str(zip_code)[:5], bedrooms, property_type, time.time() - max_age)
+            )
+            rows = [dict(zip(COLUMNS, values)) for values in cursor.fetchall()]
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"Market summary lookup failed: {str(e)}")
+        return None
+
+    if not rows:
+        return None
+    rows.sort(key=lambda r: (r["bedrooms"] == bedrooms and bedrooms != ANY,
+                             r["property_type"] == property_type and property_type != ANY),
+              reverse=True)
+    return rows[0]
+
+
+def data_version(zip_code):
+    """
+    Return a digest of the ZIP's summary rows, or None when it has none.
+    Refresh times are left out, so the digest only changes with the data.
+    """
+    columns = [column for column in COLUMNS if column != "refreshed_at"]
+    try:
+        conn = _connect()
+        try:
+            rows = conn.execute(
+                f"SELECT {', '.join(columns)} FROM zip_market_summary WHERE zip_code = ? "
+                "ORDER BY bedrooms, property_type",
+                (str(zip_code)[:5],)
+            ).fetchall()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"Market summary lookup failed: {str(e)}")
+        return None
+    if not rows:
+        return None
+    return hashlib.blake2b(json.dumps(rows).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def known_zip_codes(stale_only=False):
+    """
+    Return the ZIP codes present in the table, stalest first.
+    """
+    conn = _connect()
+    try:
+        query = "SELECT zip_code, MIN(refreshed_at) AS oldest FROM zip_market_summary GROUP BY zip_code"
+        params = ()
+        if stale_only:
+            query += " HAVING oldest < ?"
+            params = (time.time() - max_age_seconds(),)
+        return [row[0] for row in conn.execute(query + " ORDER BY oldest", params).fetchall()]
+    finally:
+        conn.close()
+
+
+def refresh(zip_codes):
+    """
+    Fetch /v1/markets for each ZIP and rebuild its summary rows.
+    The call bypasses the shared and HTTP caches, so a refreshed row never
+    carries market data older than its refreshed_at.
+    Returns {zip: rows_written}.
+    """
+    # Imported here: rentcast_agent imports this module at load time
+    import rentcast_agent
+
+    results = {}
+    for zip_code in zip_codes:
+        payload = rentcast_agent.get_market_trends({"zipCode": zip_code}, fresh=True)
+        results[zip_code] = store_market_payload(zip_code, payload) if payload else 0
+    return results
+
+
+def main():
+    """
+    Refresh and inspection CLI for the summary table.
+    """
+    args = sys.argv[1:]
+    command = args[0] if args else "refresh"
+
+    if command == "refresh":
+        if "--zips" in args:
+            zip_codes = [z.strip() for z in args[args.index("--zips") + 1].split(",") if z.strip()]
+        else:
+            zip_codes = known_zip_codes(stale_only="--stale-only" in args)
+        print(json.dumps({"refreshed": refresh(zip_codes)}, indent=2))
+    elif command == "show":
+        if len(args) < 2:
+            print("Usage: market_summary.py show <zip> [bedrooms] [propertyType]", file=sys.stderr)
+            sys.exit(2)
+        row = lookup(args[1], args[2] if len(args) > 2 else None,
+                     args[3] if len(args) > 3 else None, max_age=float("inf"))
+        print(json.dumps(row, indent=2))
+    else:
+        print(f"Unknown command: {command}", file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
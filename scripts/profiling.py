@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Opt-in profiling of single analyses.
+
+An analysis runs under cProfile and tracemalloc when its input has
+"profile": true, or at random for a sampled fraction ENGINE_PROFILE_RATE of
+analyses (0.01 profiles one in a hundred), so slow or memory-hungry
+addresses can be examined in production without editing the engine. Each
+profiled analysis writes two files to logs/profiles/, next to
+logs/rentcast_agent.log:
+
+    <time>-<pid>-<address>.pstats       cProfile statistics, readable with
+                                        pstats or `profiling.py show`
+    <time>-<pid>-<address>.alloc.txt    wall time, traced and peak memory and
+                                        the top allocating source lines
+
+and logs a line pointing at them. The profile covers the whole request,
+including a cache lookup, so send refreshCache with "profile" to profile a
+fresh analysis. Only one analysis per process is profiled at a time; in an
+async batch the profile also sees the other analyses sharing the event loop.
+
+Environment:
+    ENGINE_PROFILE_RATE     fraction of analyses profiled (default 0)
+    ENGINE_PROFILE_MEMORY   "0" skips tracemalloc, which slows Python code down
+    ENGINE_PROFILE_TOP      allocating lines listed (default 25)
+    ENGINE_PROFILE_DIR      output directory (default logs/profiles)
+
+Usage:
+    python scripts/profiling.py show logs/profiles/<file>.pstats [--sort cumulative] [--limit 30]
+"""
+import os
+import re
+import sys
+import time
+import pstats
+import random
+import cProfile
+import logging
+import threading
+import tracemalloc
+from datetime import datetime
+from contextlib import contextmanager
+
+from engine_settings import LOG_DIR, env_flag, env_float, env_int
+
+logger = logging.getLogger('rentcast_agent.profiling')
+
+_active = threading.Lock()
+
+# Allocations made by the profiler itself are not reported
+_IGNORED_TRACES = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def profile_dir():
+    """
+    Return the directory profiles are written to, creating it if needed.
+    """
+    path = os.environ.get("ENGINE_PROFILE_DIR") or os.path.join(LOG_DIR, 'profiles')
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def should_profile(property_details):
+    """
+    Return True when this analysis should be profiled: asked for by its
+    input or picked by ENGINE_PROFILE_RATE.
+    """
+    if property_details.get("profile") is True:
+        return True
+    rate = env_float("ENGINE_PROFILE_RATE", 0.0)
+    return rate > 0 and random.random() < rate
+
+
+def _label(property_details):
+    address = str(property_details.get("address") or "analysis")
+    return re.sub(r"[^A-Za-z0-9]+", "-", address).strip("-")[:40] or "analysis"
+
+
+def _megabytes(size):
+    return f"{size / (1024 * 1024):.1f} MiB"
+
+
+def _write(base, profiler, seconds, memory, address):
+    stats_path = f"{base}.pstats"
+    profiler.dump_stats(stats_path)
+    alloc_path = f"{base}.alloc.txt"
+    with open(alloc_path, "w") as f:
+        f.write(f"Analysis profile for {address}\n")
+        f.write(f"Wall time: {seconds:.3f}s\n")
+        if memory is None:
+            f.write("Memory tracing off (ENGINE_PROFILE_MEMORY=0)\n")
+        else:
+            snapshot, current, peak = memory
+            top = env_int("ENGINE_PROFILE_TOP", 25)
+            f.write(f"Traced memory: {_megabytes(current)} at the end, {_megabytes(peak)} peak\n")
+            f.write(f"Top {top} allocating lines:\n")
+            for rank, stat in enumerate(snapshot.statistics("lineno")[:top], 1):
+                f.write(f"{rank:4d}. {stat}\n")
+    return stats_path, alloc_path
+
+
+@contextmanager
+def profiled(property_details):
+    """
+    Profile the block when should_profile() picks this analysis.
+    Profiling failures are logged and never fail the analysis.
+    """
+    if not should_profile(property_details) or not _active.acquire(blocking=False):
+        yield
+        return
+    try:
+        trace_memory = env_flag("ENGINE_PROFILE_MEMORY", True)
+        started_tracing = trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        if trace_memory:
+            tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            seconds = time.perf_counter() - started
+            memory = None
+            if trace_memory:
+                snapshot = tracemalloc.take_snapshot().filter_traces(_IGNORED_TRACES)
+                memory = (snapshot, *tracemalloc.get_traced_memory())
+            if started_tracing:
+                tracemalloc.stop()
+            address = property_details.get("address")
+            try:
+                base = os.path.join(
+                    profile_dir(),
+                    f"{datetime.now():%Y%m%d-%H%M%S-%f}-{os.getpid()}-{_label(property_details)}"
+                )
+                stats_path, alloc_path = _write(base, profiler, seconds, memory, address)
+                peak = f", peak memory {_megabytes(memory[2])}" if memory else ""
+                logger.info(f"Profiled analysis of {address} ({seconds:.3f}s{peak}): {stats_path}, {alloc_path}")
+            except OSError as e:
+                logger.warning(f"Could not write analysis profile: {str(e)}")
+    finally:
+        _active.release()
+
+
+def main():
+    """
+    Profile inspection CLI.
+    """
+    args = sys.argv[1:]
+    if len(args) < 2 or args[0] != "show":
+        print("Usage: profiling.py show <file.pstats> [--sort cumulative] [--limit 30]", file=sys.stderr)
+        sys.exit(2)
+    sort = args[args.index("--sort") + 1] if "--sort" in args else "cumulative"
+    limit = int(args[args.index("--limit") + 1]) if "--limit" in args else 30
+    pstats.Stats(args[1]).sort_stats(sort).print_stats(limit)
+
+
+if __name__ == "__main__":
+    main()
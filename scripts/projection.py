@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Output projection and compact responses.
+
+A full analysis carries raw provider payloads (the /v1/markets response as
+marketTrends, AVM comparables under historicalData and valueEstimate) and
+repeats the comps in mapData. Callers that need less can ask for less:
+
+    fields    a list (or comma-separated string) of dotted paths to return,
+              e.g. ["rentRange", "rentEstimate.compsUsed",
+              "comparableProperties.address", "comparableProperties.rent"];
+              a path into a list applies to every element. cache, degraded,
+              analysisDepth, persistError, status and error are always
+              returned
+    compact   drop the raw provider payloads and duplicated arrays listed in
+              COMPACT_DROPPED; the summaries derived from them (marketSummary,
+              comparableProperties, ...) stay
+
+Shaping applies to the response only. The result cache and persisted
+reports keep the full analysis, so requests with different projections
+share one cache entry.
+
+Environment:
+    ENGINE_COMPACT_OUTPUT   "1" makes compact the default for every request
+"""
+import logging
+
+from engine_settings import env_flag
+
+logger = logging.getLogger('rentcast_agent.projection')
+
+# Response envelope fields returned whatever the projection
+ALWAYS_KEPT = ("cache", "degraded", "analysisDepth", "persistError", "status", "error")
+
+# Raw provider payloads and duplicates left out of compact responses
+COMPACT_DROPPED = (
+    "marketTrends",
+    "historicalData.comparables",
+    "historicalData.history",
+    "valueEstimate.comparables",
+    "mapData.comparables",
+)
+
+
+def parse_fields(fields):
+    """
+    Turn a list or comma-separated string of dotted paths into a tree of
+    {key: subtree}, where True selects the whole value.
+    Raises ValueError for anything else.
+    """
+    if isinstance(fields, str):
+        fields = fields.split(",")
+    if not isinstance(fields, list) or not all(isinstance(field, str) for field in fields):
+        raise ValueError("fields must be a list of dotted field paths")
+
+    tree = {}
+    for field in fields:
+        parts = [part for part in field.strip().split(".") if part]
+        node = tree
+        for i, part in enumerate(parts):
+            if node.get(part) is True:
+                break
+            if i == len(parts) - 1:
+                node[part] = True
+            else:
+                node = node.setdefault(part, {})
+    return tree
+
+
+def project(value, tree):
+    """
+    Return the parts of value selected by a parse_fields() tree.
+    """
+    if tree is True:
+        return value
+    if isinstance(value, list):
+        return [project(item, tree) for item in value]
+    if isinstance(value, dict):
+        return {key: project(value[key], subtree) for key, subtree in tree.items() if key in value}
+    return value
+
+
+def _without(value, parts):
+    """
+    Return value with the dotted path removed, copying only what changes.
+    """
+    if isinstance(value, list):
+        return [_without(item, parts) for item in value]
+    if not isinstance(value, dict) or parts[0] not in value:
+        return value
+    copy = dict(value)
+    if len(parts) == 1:
+        del copy[parts[0]]
+    else:
+        copy[parts[0]] = _without(value[parts[0]], parts[1:])
+    return copy
+
+
+def compact(analysis):
+    """
+    Return the analysis without the COMPACT_DROPPED paths.
+    """
+    for path in COMPACT_DROPPED:
+        analysis = _without(analysis, path.split("."))
+    return analysis
+
+
+def shape(analysis, options):
+    """
+    Apply the request's `compact` and `fields` options to an analysis.
+    The analysis passed in is not modified.
+    """
+    if not isinstance(analysis, dict):
+        return analysis
+    if options.get("compact", env_flag("ENGINE_COMPACT_OUTPUT", False)):
+        analysis = compact(analysis)
+    if options.get("fields"):
+        tree = parse_fields(options["fields"])
+        for key in ALWAYS_KEPT:
+            tree[key] = True
+        analysis = project(analysis, tree)
+    return analysis
+
+
+def shape_batch(analyses, inputs):
+    """
+    Shape every analysis of a batch with the options of its input. Invalid
+    options fail only that entry.
+    """
+    shaped = []
+    for analysis, options in zip(analyses, inputs):
+        try:
+            shaped.append(shape(analysis, options))
+        except ValueError as e:
+            shaped.append({"error": str(e), "status": "error"})
+    return shaped
@@ -0,0 +1,501 @@
+#!/usr/bin/env python3
+"""
+HTTP transport for the provider fetchers in rentcast_agent.py.
+
+Every RentCast, Zillow and Google call goes through get(), which reuses one
+pooled requests.Session per process, or through get_async() for the asyncio
+pipeline, which uses a pooled httpx.AsyncClient per event loop when httpx is
+installed (pip install httpx) and otherwise runs get() in a worker thread.
+Both run in one of three modes:
+
+    live    call the provider (default)
+    record  call the provider and archive each response
+    replay  serve archived responses only, never touching the network
+
+In live mode responses also go through the HTTP-semantics disk cache in
+http_cache.py: fresh responses are served locally and stale ones are
+revalidated with conditional requests; fresh=True skips the lookup so the
+call always reaches the provider (its response is still stored). Calls that
+do reach the network
+first wait for a token from the caller's priority lane (lane_scheduler.py)
+when the host is rate limited. Calls given `credentials` (RentCast keys)
+are sent with a key from the credential pool (credential_pool.py) and
+retried on another key when theirs is rejected or rate limited.
+
+The archive is a SQLite file of zlib-compressed bodies keyed by a hash of
+the method, URL and query parameters. Credentials (API key headers and the
+Google "key" parameter) are not part of the key, so an archive recorded with
+one key replays on a box with none. The live HTTP cache adds the credential
+scope (credential_pool.scope_of()) to that key for calls sent with a
+customer's own keys, so their responses are never served to anyone else;
+the archive is only read in replay mode, never in production. Replay can add simulated latency so
+load tests see production-like timing.
+
+Environment:
+    PROVIDER_MODE             live | record | replay (default live)
+    PROVIDER_ARCHIVE_PATH     archive file (default <cache dir>/provider_archive.sqlite)
+    PROVIDER_REPLAY_LATENCY   "recorded" to replay the latency seen while
+                              recording, "<ms>" for a fixed delay or
+                              "<ms>:<jitter ms>" for a deterministic spread
+    PROVIDER_TIMEOUT          request timeout in seconds (default 30)
+    PROVIDER_MAX_CONNECTIONS  connection limit of each async client (default 100)
+
+Usage:
+    python scripts/provider_client.py stats
+"""
+import os
+import sys
+import json
+import time
+import zlib
+import asyncio
+import weakref
+import hashlib
+import sqlite3
+import logging
+import threading
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import credential_pool
+import http_cache
+import json_backend
+import lane_scheduler
+from engine_settings import cache_dir, env_float, env_int
+
+try:
+    import httpx
+except ImportError:
+    httpx = None
+
+logger = logging.getLogger('rentcast_agent.provider_client')
+
+MODES = ("live", "record", "replay")
+
+# Query parameters that carry credentials and must not affect the archive key
+_SECRET_PARAMS = {"key", "apikey", "api_key"}
+
+# Environment variables given a placeholder in replay mode so the fetchers'
+# "no API key" checks pass without real credentials
+_REPLAY_CREDENTIALS = ("RENTCAST_API_KEY", "RAPIDAPI_KEY", "NEXT_PUBLIC_GOOGLE_MAPS_API_KEY")
+
+_session = None
+
+# Requests this process has sent to the network
+_network_calls = 0
+_network_calls_lock = threading.Lock()
+
+# One async client per event loop; clients cannot be shared across loops
+_async_sessions = weakref.WeakKeyDictionary()
+
+
+class ProviderResponse:
+    """
+    Minimal stand-in for requests.Response used for replayed responses.
+    """
+
+    def __init__(self, status_code, content, headers=None, url=""):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.url = url
+
+    @property
+    def ok(self):
+        return 200 <= self.status_code < 400
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json_backend.loads(self.content)
+
+
+def mode():
+    """
+    Return the configured transport mode.
+    """
+    value = (os.environ.get("PROVIDER_MODE") or "live").strip().lower()
+    if value not in MODES:
+        logger.warning(f"Unknown PROVIDER_MODE '{value}', using live")
+        return "live"
+    return value
+
+
+def archive_path():
+    """
+    Return the path of the record/replay archive.
+    """
+    return os.environ.get("PROVIDER_ARCHIVE_PATH") or os.path.join(cache_dir(), 'provider_archive.sqlite')
+
+
+def apply_replay_credentials():
+    """
+    In replay mode, give every provider credential a placeholder value so
+    fetchers do not skip their calls for lack of a key.
+    """
+    if mode() != "replay":
+        return
+    for name in _REPLAY_CREDENTIALS:
+        if not os.environ.get(name):
+            os.environ[name] = "replay"
+
+
+def session():
+    """
+    Return the process-wide pooled session, creating it on first use.
+    """
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=8, pool_maxsize=16)
+        _session.mount("https://", adapter)
+        _session.mount("http://", adapter)
+    return _session
+
+
+def reset_session():
+    """
+    Drop the pooled session, e.g. in a freshly forked worker process that
+    must not share sockets with its parent.
+    """
+    global _session
+    if _session is not None:
+        _session.close()
+    _session = None
+
+
+def async_session():
+    """
+    Return the pooled httpx.AsyncClient of the running event loop, creating
+    it on first use. Requires httpx.
+    """
+    loop = asyncio.get_running_loop()
+    client = _async_sessions.get(loop)
+    if client is None:
+        max_connections = max(env_int("PROVIDER_MAX_CONNECTIONS", 100), 1)
+        client = httpx.AsyncClient(limits=httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=min(max_connections, 32)
+        ))
+        _async_sessions[loop] = client
+    return client
+
+
+async def close_async_session():
+    """
+    Close the running event loop's async client, if it has one.
+    """
+    client = _async_sessions.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
+
+
+def request_key(method, url, params=None):
+    """
+    Return the archive key for a request, ignoring credential parameters.
+    """
+    items = sorted(
+        (str(k), str(v)) for k, v in (params or {}).items()
+        if str(k).lower() not in _SECRET_PARAMS and v is not None
+    )
+    canonical = f"{method.upper()} {url}?{urlencode(items)}"
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def scoped_key(key, credentials=None):
+    """
+    Return the HTTP cache key for a request key sent with `credentials`:
+    unchanged for the shared pool, otherwise tied to the keys' scope.
+    """
+    scope = credential_pool.scope_of(credentials)
+    if scope == "shared":
+        return key
+    return hashlib.sha256(f"{key} {scope}".encode("utf-8")).hexdigest()
+
+
+def _connect():
+    conn = sqlite3.connect(archive_path(), timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS provider_responses ("
+        " key TEXT PRIMARY KEY,"
+        " method TEXT NOT NULL,"
+        " url TEXT NOT NULL,"
+        " status INTEGER NOT NULL,"
+        " headers TEXT NOT NULL,"
+        " body BLOB NOT NULL,"
+        " elapsed_ms REAL NOT NULL,"
+        " recorded_at REAL NOT NULL)"
+    )
+    return conn
+
+
+def _archive(key, method, url, response, elapsed_ms):
+    """
+    Store a live response in the archive, replacing any earlier recording.
+    """
+    headers = {k: v for k, v in response.headers.items()
+               if k.lower() in ("content-type", "etag", "last-modified", "cache-control")}
+    try:
+        conn = _connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO provider_responses "
+                    "(key, method, url, status, headers, body, elapsed_ms, recorded_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (key, method, url, response.status_code, json.dumps(headers),
+                     zlib.compress(response.content, 6), elapsed_ms, time.time())
+                )
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.warning(f"Could not archive response for {url}: {str(e)}")
+
+
+def _replay_delay(key, recorded_ms):
+    """
+    Return the simulated latency in seconds for a replayed response.
+    Jitter is derived from the request key so runs are reproducible.
+    """
+    setting = (os.environ.get("PROVIDER_REPLAY_LATENCY") or "").strip().lower()
+    if not setting:
+        return 0.0
+    if setting == "recorded":
+        return recorded_ms / 1000.0
+    try:
+        mean, _, jitter = setting.partition(":")
+        delay = float(mean)
+        if jitter:
+            fraction = int(key[:8], 16) / 0xFFFFFFFF
+            delay += (fraction * 2 - 1) * float(jitter)
+        return max(delay, 0.0) / 1000.0
+    except ValueError:
+        logger.warning(f"Invalid PROVIDER_REPLAY_LATENCY '{setting}'")
+        return 0.0
+
+
+def _load_replay(key, method, url):
+    """
+    Load a recorded response and its simulated latency in seconds, or a 404
+    when the request was never recorded.
+    """
+    try:
+        conn = _connect()
+        try:
+            row = conn.execute(
+                "SELECT status, headers, body, elapsed_ms FROM provider_responses WHERE key = ?",
+                (key,)
+            ).fetchone()
+        finally:
+            conn.close()
+    except sqlite3.Error as e:
+        logger.error(f"Could not read provider archive: {str(e)}")
+        row = None
+
+    if not row:
+        logger.warning(f"No recorded response for {method} {url}")
+        return ProviderResponse(404, b'{"message": "No recorded response"}', url=url), 0.0
+
+    status, headers, body, elapsed_ms = row
+    response = ProviderResponse(status, zlib.decompress(body), json.loads(headers), url=url)
+    return response, _replay_delay(key, elapsed_ms)
+
+
+def _replay(key, method, url):
+    """
+    Serve a recorded response after its simulated latency.
+    """
+    response, delay = _load_replay(key, method, url)
+    if delay:
+        time.sleep(delay)
+    return response
+
+
+def _cached_response(cached, url, outcome):
+    """
+    Build a ProviderResponse from an http_cache entry. The X-Cache header
+    says whether it was served fresh ("hit") or after a 304 ("revalidated").
+    """
+    logger.info(f"HTTP cache {outcome} for {url}")
+    return ProviderResponse(cached.status, cached.body, dict(cached.headers, **{"x-cache": outcome}), url=url)
+
+
+def _through_cache(key, url, cached, response):
+    """
+    Apply a live response to the HTTP cache: a 304 refreshes and serves the
+    cached entry, anything else is stored when cacheable and returned.
+    """
+    if response.status_code == 304 and cached is not None:
+        http_cache.refresh(key, url, response)
+        return _cached_response(cached, url, "revalidated")
+    http_cache.store(key, url, response)
+    return response
+
+
+def network_calls():
+    """
+    Return how many requests this process has sent to the network; cache
+    hits and replayed responses are not counted.
+    """
+    return _network_calls
+
+
+def _count_network_call():
+    global _network_calls
+    with _network_calls_lock:
+        _network_calls += 1
+
+
+def _no_credential(url):
+    """
+    Response for a call whose keys are all out of rotation; it never
+    reaches the network.
+    """
+    logger.error(f"No RentCast API key in rotation for {url}")
+    body = b'{"message": "No API key with remaining quota"}'
+    return ProviderResponse(credential_pool.RATE_LIMITED_STATUS, body, url=url)
+
+
+def _with_key(headers, api_key):
+    return dict(headers or {}, **{credential_pool.HEADER: api_key})
+
+
+def get(url, headers=None, params=None, timeout=None, credentials=None, fresh=False):
+    """
+    Issue a GET through the configured transport mode.
+    Returns a requests.Response (live/record) or ProviderResponse (replay);
+    both expose status_code, headers, content, text and json().
+    `credentials` are the API keys the call may be sent with; `fresh`
+    bypasses the HTTP cache.
+    """
+    current_mode = mode()
+    key = request_key("GET", url, params)
+
+    if current_mode == "replay":
+        return _replay(key, "GET", url)
+
+    cache_key = scoped_key(key, credentials)
+    cached = http_cache.lookup(cache_key) if current_mode == "live" and not fresh else None
+    if cached is not None and cached.fresh:
+        return _cached_response(cached, url, "hit")
+    headers = http_cache.conditional_headers(cached, headers)
+
+    timeout = timeout or env_float("PROVIDER_TIMEOUT", 30.0)
+    for _ in range(max(len(credentials or ()), 1)):
+        api_key = credential_pool.checkout(credentials) if credentials else None
+        if credentials and api_key is None:
+            return _no_credential(url)
+        lane_scheduler.acquire(url, credentials=credentials)
+        _count_network_call()
+        started = time.perf_counter()
+        try:
+            response = session().get(
+                url, headers=_with_key(headers, api_key) if api_key else headers, params=params, timeout=timeout
+            )
+        finally:
+            if api_key:
+                credential_pool.release(api_key)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if not api_key or credential_pool.record(api_key, response.status_code, response.headers):
+            break
+
+    if current_mode == "record":
+        _archive(key, "GET", url, response, elapsed_ms)
+        return response
+    return _through_cache(cache_key, url, cached, response)
+
+
+async def get_async(url, headers=None, params=None, timeout=None, credentials=None, fresh=False):
+    """
+    Asyncio variant of get(), with the same modes and return types
+    (an httpx.Response behaves like a requests.Response here).
+    """
+    current_mode = mode()
+    key = request_key("GET", url, params)
+
+    if current_mode == "replay":
+        response, delay = _load_replay(key, "GET", url)
+        if delay:
+            await asyncio.sleep(delay)
+        return response
+
+    cache_key = scoped_key(key, credentials)
+    cached = await asyncio.to_thread(http_cache.lookup, cache_key) if current_mode == "live" and not fresh else None
+    if cached is not None and cached.fresh:
+        return _cached_response(cached, url, "hit")
+    headers = http_cache.conditional_headers(cached, headers)
+
+    timeout = timeout or env_float("PROVIDER_TIMEOUT", 30.0)
+    if httpx is not None:
+        # requests drops None-valued parameters; httpx would send them empty
+        params = {k: v for k, v in (params or {}).items() if v is not None}
+    for _ in range(max(len(credentials or ()), 1)):
+        api_key = await asyncio.to_thread(credential_pool.checkout, credentials) if credentials else None
+        if credentials and api_key is None:
+            return _no_credential(url)
+        request_headers = _with_key(headers, api_key) if api_key else headers
+        await lane_scheduler.acquire_async(url, credentials=credentials)
+        _count_network_call()
+        started = time.perf_counter()
+        try:
+            if httpx is None:
+                response = await asyncio.to_thread(
+                    session().get, url, headers=request_headers, params=params, timeout=timeout
+                )
+            else:
+                response = await async_session().get(url, headers=request_headers, params=params, timeout=timeout)
+        finally:
+            if api_key:
+                credential_pool.release(api_key)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if not api_key:
+            break
+        if await asyncio.to_thread(credential_pool.record, api_key, response.status_code, response.headers):
+            break
+
+    if current_mode == "record":
+        _archive(key, "GET", url, response, elapsed_ms)
+        return response
+    return await asyncio.to_thread(_through_cache, cache_key, url, cached, response)
+
+
+def stats():
+    """
+    Summarize the archive contents per URL.
+    """
+    conn = _connect()
+    try:
+        rows = conn.execute(
+            "SELECT url, COUNT(*), SUM(LENGTH(body)), AVG(elapsed_ms) "
+            "FROM provider_responses GROUP BY url ORDER BY url"
+        ).fetchall()
+    finally:
+        conn.close()
+    return {
+        "path": archive_path(),
+        "endpoints": {
+            url: {"responses": count, "compressedBytes": size, "avgRecordedMs": round(avg or 0, 1)}
+            for url, count, size, avg in rows
+        }
+    }
+
+
+def main():
+    """
+    Archive inspection CLI.
+    """
+    command = sys.argv[1] if len(sys.argv) > 1 else "stats"
+    if command == "stats":
+        print(json.dumps(stats(), indent=2))
+    else:
+        print(f"Unknown command: {command}", file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
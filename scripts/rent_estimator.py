@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Robust comparable-weighting rent estimator.
+
+Every candidate comparable gets a weight from three kernels:
+    distance    exponential decay with distance from the subject
+    similarity  Gaussian kernel over bedroom, bathroom and size differences
+    recency     half-life decay on the listing date
+The estimate is the weighted median of the comps that survive a MAD-based
+outlier screen (run from MIN_OUTLIER_COMPS comps up), with a Huber
+M-estimate and weighted mean reported alongside and a weighted bootstrap
+confidence interval for the median. Small comp sets get an interval at least
+as wide as their dispersion or the +/-10% default.
+
+Comp attributes are pulled into flat per-field lists once, and every later
+stage works on those columns, so the cost stays linear in the number of
+candidates (plus one sort) and hundreds of comps remain cheap.
+"""
+import math
+import random
+import hashlib
+from datetime import datetime
+
+# Distance (miles) at which the distance weight falls to 1/e
+DISTANCE_SCALE_MILES = 2.0
+# Weight given to comps with no usable location
+UNKNOWN_DISTANCE_WEIGHT = 0.5
+# Kernel widths for the similarity weight
+BED_SCALE = 1.0
+BATH_SCALE = 1.0
+SQFT_LOG_SCALE = 0.25
+# Listing age (days) at which the recency weight halves
+RECENCY_HALF_LIFE_DAYS = 180.0
+# Weight given to comps with no listing date
+UNKNOWN_RECENCY_WEIGHT = 0.75
+# Credibility of comps that do not carry one, no higher than a RentCast comp's
+DEFAULT_CREDIBILITY = 0.9
+# Robust z-score above which a comp is rejected as an outlier
+OUTLIER_Z = 3.5
+# Fewest comps the outlier screen runs on; with fewer, one comp's deviation
+# sets the MAD scale and valid comps get rejected
+MIN_OUTLIER_COMPS = 5
+# Below this many comps (or effective sample size) the interval is widened
+# to at least the weighted MAD, and at least this fraction of the median,
+# either side of the median
+SMALL_SAMPLE_COMPS = 5
+MIN_INTERVAL_FRACTION = 0.1
+# Huber tuning constant (95% efficiency under normal errors)
+HUBER_K = 1.345
+BOOTSTRAP_SAMPLES = 500
+CONFIDENCE_LEVEL = 0.9
+
+
+def to_float(value):
+    """
+    Convert provider values such as "2", 2.0 or "$2,400" to float, or None.
+    """
+    if value is None or value == "" or isinstance(value, bool):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if math.isfinite(value) else None
+    cleaned = "".join(ch for ch in str(value) if ch.isdigit() or ch in ".-")
+    try:
+        return float(cleaned)
+    except ValueError:
+        return None
+
+
+def first_number(record, *keys):
+    """
+    Return the first numeric value found under any of the given keys.
+    """
+    for key in keys:
+        value = to_float(record.get(key))
+        if value is not None:
+            return value
+    return None
+
+
+def _parse_date(value):
+    """
+    Parse an ISO date or timestamp as returned by RentCast, or None.
+    """
+    if not value or not isinstance(value, str):
+        return None
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")[:19])
+    except ValueError:
+        return None
+
+
+def _distance_miles(lat1, lon1, lat2, lon2):
+    """
+    Haversine distance in miles.
+    """
+    lat1_rad, lat2_rad = math.radians(lat1), math.radians(lat2)
+    dlat = lat2_rad - lat1_rad
+    dlon = math.radians(lon2 - lon1)
+    a = math.sin(dlat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2
+    return 3959 * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+def comp_columns(subject, comps):
+    """
+    Extract the per-comp columns used by the estimator.
+    Comps without a positive rent are dropped. The rent column prefers
+    adjustedRent so that hedonic adjustments, when present, are used.
+    """
+    subject_lat = to_float(subject.get("latitude"))
+    subject_lon = to_float(subject.get("longitude"))
+
+    columns = {"index": [], "rent": [], "beds": [], "baths": [], "sqft": [],
+               "distance": [], "listed": [], "credibility": []}
+    for i, comp in enumerate(comps):
+        rent = first_number(comp, "adjustedRent", "rent", "price")
+        if not rent or rent <= 0:
+            continue
+
+        distance = None
+        lat = to_float(comp.get("latitude"))
+        lon = to_float(comp.get("longitude"))
+        if subject_lat and subject_lon and lat and lon:
+            distance = _distance_miles(subject_lat, subject_lon, lat, lon)
+        elif comp.get("distance") not in (None, ""):
+            distance = to_float(comp.get("distance"))
+
+        columns["index"].append(i)
+        columns["rent"].append(rent)
+        columns["beds"].append(first_number(comp, "bedrooms", "beds"))
+        columns["baths"].append(first_number(comp, "bathrooms", "baths"))
+        columns["sqft"].append(first_number(comp, "squareFootage", "sqft", "squareFeet"))
+        columns["distance"].append(distance)
+        columns["listed"].append(_parse_date(comp.get("listedDate") or comp.get("lastSeenDate")))
+        credibility = to_float(comp.get("credibility"))
+        columns["credibility"].append(DEFAULT_CREDIBILITY if credibility is None else credibility)
+    return columns
+
+
+def _log_size(value):
+    return math.log(max(value, 1.0))
+
+
+# Subject feature -> (kernel width, transform) of the similarity kernels
+SIMILARITY_KERNELS = {
+    "beds": (BED_SCALE, None),
+    "baths": (BATH_SCALE, None),
+    "sqft": (SQFT_LOG_SCALE, _log_size),
+}
+
+
+def subject_features(subject):
+    """
+    Return the subject's beds, baths and sqft as used by the similarity
+    kernels, with None for features it lacks.
+    """
+    return {
+        "beds": first_number(subject, "beds", "bedrooms"),
+        "baths": first_number(subject, "baths", "bathrooms"),
+        "sqft": first_number(subject, "squareFeet", "squareFootage", "sqft") or None,
+    }
+
+
+def similarity_kernel(values, target, scale, transform=None):
+    """
+    Gaussian kernel weight of every comp value against the subject's. A
+    missing subject value gives every comp 1.0, a missing comp value 0.8.
+    """
+    if target is None:
+        return [1.0] * len(values)
+    if transform:
+        target = transform(target)
+    out = []
+    for v in values:
+        if v is None:
+            out.append(0.8)
+            continue
+        diff = ((transform(v) if transform else v) - target) / scale
+        out.append(math.exp(-0.5 * diff * diff))
+    return out
+
+
+def weight_factors(subject, columns, now=None):
+    """
+    Return the per-comp factors of the weights: distance, recency and
+    credibility, which depend only on the comps, and the beds, baths and
+    sqft similarity kernels, which depend on the subject.
+    """
+    now = now or datetime.now()
+    factors = {
+        "distance": [
+            math.exp(-d / DISTANCE_SCALE_MILES) if d is not None else UNKNOWN_DISTANCE_WEIGHT
+            for d in columns["distance"]
+        ],
+        "recency": [
+            UNKNOWN_RECENCY_WEIGHT if listed is None
+            else 0.5 ** (max((now - listed).days, 0) / RECENCY_HALF_LIFE_DAYS)
+            for listed in columns["listed"]
+        ],
+        "credibility": columns["credibility"],
+    }
+    features = subject_features(subject)
+    for name, (scale, transform) in SIMILARITY_KERNELS.items():
+        factors[name] = similarity_kernel(columns[name], features[name], scale, transform)
+    return factors
+
+
+def combine_weights(factors):
+    """
+    Multiply weight_factors() into one weight per comp.
+    """
+    return [
+        d * b * ba * s * r * c
+        for d, b, ba, s, r, c in zip(
+            factors["distance"], factors["beds"], factors["baths"], factors["sqft"],
+            factors["recency"], factors["credibility"]
+        )
+    ]
+
+
+def compute_weights(subject, columns, now=None):
+    """
+    Return the combined distance x similarity x recency x credibility
+    weight for every comp in the columns.
+    """
+    return combine_weights(weight_factors(subject, columns, now))
+
+
+def weighted_quantile(values, weights, q, presorted=False):
+    """
+    Weighted quantile (q in [0, 1]) using the cumulative-weight definition.
+    """
+    pairs = list(zip(values, weights)) if presorted else sorted(zip(values, weights))
+    total = sum(w for _, w in pairs)
+    if not pairs or total <= 0:
+        return None
+    target = q * total
+    cumulative = 0.0
+    for value, weight in pairs:
+        cumulative += weight
+        if cumulative >= target:
+            return value
+    return pairs[-1][0]
+
+
+def weighted_median(values, weights):
+    """
+    Weighted median of the values.
+    """
+    return weighted_quantile(values, weights, 0.5)
+
+
+def weighted_mad(values, weights, center):
+    """
+    Weighted median absolute deviation around the center, scaled to
+    estimate a normal standard deviation.
+    """
+    deviations = [abs(v - center) for v in values]
+    mad = weighted_median(deviations, weights) or 0.0
+    return 1.4826 * mad
+
+
+def reject_outliers(values, weights):
+    """
+    Return the indexes of values whose robust z-score is within OUTLIER_Z.
+    Nothing is rejected when there are fewer than MIN_OUTLIER_COMPS values
+    or the spread is zero (identical rents).
+    """
+    if len(values) < MIN_OUTLIER_COMPS:
+        return list(range(len(values)))
+    center = weighted_median(values, weights)
+    scale = weighted_mad(values, weights, center)
+    if not scale:
+        return list(range(len(values)))
+    return [i for i, v in enumerate(values) if abs(v - center) / scale <= OUTLIER_Z]
+
+
+def huber_location(values, weights, k=HUBER_K, iterations=20):
+    """
+    Huber M-estimate of location via iteratively reweighted least squares,
+    starting at the weighted median with a fixed MAD scale.
+    """
+    location = weighted_median(values, weights)
+    scale = weighted_mad(values, weights, location)
+    if not scale:
+        return location
+    for _ in range(iterations):
+        robust_w = []
+        for v, w in zip(values, weights):
+            r = abs(v - location) / scale
+            robust_w.append(w * (1.0 if r <= k else k / r))
+        total = sum(robust_w)
+        if total <= 0:
+            break
+        updated = sum(v * w for v, w in zip(values, robust_w)) / total
+        if abs(updated - location) < 0.01:
+            location = updated
+            break
+        location = updated
+    return location
+
+
+def resample_counts(n, samples=BOOTSTRAP_SAMPLES, seed=0):
+    """
+    Draw bootstrap resamples of n positions, each as a list of how often
+    every position was drawn.
+    """
+    rng = random.Random(seed)
+    positions = range(n)
+    resamples = []
+    for _ in range(samples):
+        counts = [0] * n
+        for pos in rng.choices(positions, k=n):
+            counts[pos] += 1
+        resamples.append(counts)
+    return resamples
+
+
+def bootstrap_interval(values, weights, samples=BOOTSTRAP_SAMPLES, level=CONFIDENCE_LEVEL, seed=None,
+                       resamples=None):
+    """
+    Percentile bootstrap interval for the weighted median.
+
+    Values are sorted once; each replicate scans the sorted column
+    accumulating count x weight, so a replicate costs O(n) with no
+    per-replicate sort. The resamples (counts over the sorted positions) are
+    drawn from a generator seeded from the data, so identical inputs always
+    give identical intervals, unless the caller passes its own.
+    """
+    n = len(values)
+    if n < 2:
+        return None
+    order = sorted(range(n), key=lambda i: values[i])
+    sorted_values = [values[i] for i in order]
+    sorted_weights = [weights[i] for i in order]
+
+    if resamples is None:
+        if seed is None:
+            digest = hashlib.sha256(repr((sorted_values, sorted_weights)).encode()).hexdigest()
+            seed = int(digest[:16], 16)
+        resamples = resample_counts(n, samples, seed)
+
+    medians = []
+    for counts in resamples:
+        resampled = [c * w for c, w in zip(counts, sorted_weights)]
+        half = sum(resampled) / 2.0
+        if half <= 0:
+            continue
+        cumulative = 0.0
+        for pos, w in enumerate(resampled):
+            cumulative += w
+            if cumulative >= half:
+                medians.append(sorted_values[pos])
+                break
+
+    if not medians:
+        return None
+    medians.sort()
+    tail = (1.0 - level) / 2.0
+    low = medians[int(tail * (len(medians) - 1))]
+    high = medians[int(math.ceil((1.0 - tail) * (len(medians) - 1)))]
+    return low, high
+
+
+def estimate_rent(subject, comps, now=None, samples=BOOTSTRAP_SAMPLES, level=CONFIDENCE_LEVEL):
+    """
+    Estimate the subject's rent from a candidate comp set.
+    Returns None when no comp has a usable rent.
+    """
+    columns = comp_columns(subject, comps)
+    if not columns["rent"]:
+        return None
+    return estimate_from_columns(columns, compute_weights(subject, columns, now), samples, level)
+
+
+def estimate_from_columns(columns, weights, samples=BOOTSTRAP_SAMPLES, level=CONFIDENCE_LEVEL, resamples=None):
+    """
+    Estimate rent from comp columns ("index" and "rent" are used) and their
+    weights. `resamples`, when given, returns the bootstrap resamples for n
+    values (see resample_counts()).
+    """
+    # Guard against every kernel underflowing to zero for a very poor comp set
+    if sum(weights) <= 0:
+        weights = [1.0] * len(weights)
+
+    keep = reject_outliers(columns["rent"], weights)
+    rents = [columns["rent"][i] for i in keep]
+    kept_weights = [weights[i] for i in keep]
+
+    median = weighted_median(rents, kept_weights)
+    total = sum(kept_weights)
+    mean = sum(r * w for r, w in zip(rents, kept_weights)) / total
+    huber = huber_location(rents, kept_weights)
+    interval = bootstrap_interval(
+        rents, kept_weights, samples=samples, level=level,
+        resamples=resamples(len(rents)) if resamples and len(rents) > 1 else None
+    )
+    if interval is None:
+        # A single usable comp carries no spread information
+        interval = (median * (1 - MIN_INTERVAL_FRACTION), median * (1 + MIN_INTERVAL_FRACTION))
+    low, high = min(interval[0], median), max(interval[1], median)
+
+    # Kish effective sample size tells the caller how much the weights concentrate
+    effective_n = total * total / sum(w * w for w in kept_weights) if total else 0
+
+    # A bootstrap of a handful of comps understates the spread; never report
+    # a narrower interval than the comps' own dispersion or the +/-10% default
+    if len(rents) < SMALL_SAMPLE_COMPS or effective_n < SMALL_SAMPLE_COMPS:
+        floor = max(weighted_mad(rents, kept_weights, median), median * MIN_INTERVAL_FRACTION)
+        low, high = min(low, median - floor), max(high, median + floor)
+
+    kept = set(keep)
+    rejected = set(comp_index for i, comp_index in enumerate(columns["index"]) if i not in kept)
+    weight_by_comp = dict(zip(columns["index"], weights))
+
+    return {
+        "median": median,
+        "weightedMean": mean,
+        "huberLocation": huber,
+        "low": low,
+        "high": high,
+        "confidenceLevel": level,
+        "compsConsidered": len(columns["rent"]),
+        "compsUsed": len(rents),
+        "outliersRejected": len(rejected),
+        "effectiveSampleSize": round(effective_n, 1),
+        "weights": weight_by_comp,
+        "rejected": rejected
+    }
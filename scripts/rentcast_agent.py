@@ -2,13 +2,34 @@
 import os
 import sys
 import json
-import requests
 import math
 import re
 from dotenv import load_dotenv
 from urllib.parse import quote
 from datetime import datetime, timedelta
 import logging
+import time
+import asyncio
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+import address_key
+import admission
+import analysis_cache
+import analysis_store
+import comp_merge
+import credential_pool
+import hedonic_model
+import json_backend
+import lane_scheduler
+import market_summary
+import profiling
+import projection
+import provider_client
+import shared_cache
+import zip_reference
+import rent_estimator
+from engine_settings import env_flag, env_int
 
 # Set up logging
 log_dir = os.path.join(
@@ -34,6 +55,9 @@ try:
 except Exception as e:
     logger.error(f"Could not load environment variables: {str(e)}")
 
+# Replayed responses do not need real credentials
+provider_client.apply_replay_credentials()
+
 def calculate_distance(lat1, lon1, lat2, lon2):
     """
     Calculate the distance between two points using the Haversine formula.
@@ -59,271 +83,409 @@ def calculate_distance(lat1, lon1, lat2, lon2):
     
     return round(distance, 1)
 
-def search_zillow_rentals(property_details):
+# A provider call described before it is sent, so the same fetcher logic runs
+# on the blocking client and on the asyncio client. Requests with a
+# cache_kind are read through the shared cache tier.
+ProviderRequest = namedtuple(
+    "ProviderRequest", "url headers params cache_kind cache_zip credentials", defaults=(None, None, None)
+)
+
+# Radius rings (miles) searched around the property when its ZIP and the
+# neighboring ZIPs do not yield enough comparables
+COMP_SEARCH_RADII = (2, 5, 10)
+
+# Rent estimator credibility of Zillow comps and of generated mock comps
+# (RentCast comps carry 0.9)
+ZILLOW_CREDIBILITY = 0.8
+MOCK_CREDIBILITY = 0.1
+
+def send_request(request, fresh=False):
     """
-    Search Zillow for rental properties based on the provided details.
-    Returns a list of comparable properties.
+    Send a ProviderRequest with the blocking client. `fresh` bypasses the
+    shared and HTTP caches.
     """
-    try:
-        # Extract property details
-        zip_code = property_details.get("zipCode", "")
-        beds = property_details.get("beds", "")
-        baths = property_details.get("baths", "")
-        
-        # Get RapidAPI key from environment
-        api_key = os.environ.get("RAPIDAPI_KEY")
-        
-        if not api_key:
-            print("Warning: No RapidAPI key found for Zillow search.", file=sys.stderr)
-            return []
-        
-        # Prepare the API request
-        url = "https://zillow-com1.p.rapidapi.com/propertyExtendedSearch"
-        headers = {
-            "X-RapidAPI-Key": api_key,
-            "X-RapidAPI-Host": "zillow-com1.p.rapidapi.com"
-        }
-        
-        # Build the query parameters
-        params = {
-            "location": zip_code,
-            "home_type": "Houses",
-            "isRentalOnly": "true"
-        }
-        
-        print(f"DEBUG: Making Zillow API request with params: {params}", file=sys.stderr)
+    if request.cache_kind:
+        return shared_cache.get(
+            request.cache_kind, request.cache_zip, request.url,
+            headers=request.headers, params=request.params, credentials=request.credentials, fresh=fresh
+        )
+    return provider_client.get(
+        request.url, headers=request.headers, params=request.params, credentials=request.credentials, fresh=fresh
+    )
+
+async def send_request_async(request, fresh=False):
+    """
+    Send a ProviderRequest with the asyncio client.
+    """
+    if request.cache_kind:
+        return await shared_cache.get_async(
+            request.cache_kind, request.cache_zip, request.url,
+            headers=request.headers, params=request.params, credentials=request.credentials, fresh=fresh
+        )
+    return await provider_client.get_async(
+        request.url, headers=request.headers, params=request.params, credentials=request.credentials, fresh=fresh
+    )
+
+def _zillow_request(property_details):
+    """
+    Build the Zillow rental search, or None without a RapidAPI key.
+    """
+    zip_code = property_details.get("zipCode", "")
+    
+    # Get RapidAPI key from environment
+    api_key = os.environ.get("RAPIDAPI_KEY")
+    
+    if not api_key:
+        print("Warning: No RapidAPI key found for Zillow search.", file=sys.stderr)
+        return None
+    
+    # Prepare the API request
+    url = "https://zillow-com1.p.rapidapi.com/propertyExtendedSearch"
+    headers = {
+        "X-RapidAPI-Key": api_key,
+        "X-RapidAPI-Host": "zillow-com1.p.rapidapi.com"
+    }
+    
+    # Build the query parameters
+    params = {
+        "location": zip_code,
+        "home_type": "Houses",
+        "isRentalOnly": "true"
+    }
+    
+    return ProviderRequest(url, headers, params)
+
+def _parse_zillow_rentals(response, property_details):
+    """
+    Format a Zillow search response as comparables.
+    """
+    # Check if the request was successful
+    if response.status_code == 200:
+        data = json_backend.response_json(response)
+        print(f"DEBUG: Zillow API response: {json_backend.describe(data)}", file=sys.stderr)
         
-        # Make the API request
-        response = requests.get(url, headers=headers, params=params)
+        # Extract properties from the response
+        properties = data.get("props", [])
         
-        # Check if the request was successful
-        if response.status_code == 200:
-            data = response.json()
-            print(f"DEBUG: Zillow API response: {json.dumps(data)[:500]}...", file=sys.stderr)
+        if properties:
+            formatted_comps = []
             
-            # Extract properties from the response
-            properties = data.get("props", [])
+            # Get the subject property coordinates
+            subject_lat = property_details.get("latitude")
+            subject_lon = property_details.get("longitude")
             
-            if properties:
-                formatted_comps = []
-                
-                # Get the subject property coordinates
-                subject_lat = property_details.get("latitude")
-                subject_lon = property_details.get("longitude")
+            for prop in properties[:3]:  # Limit to 3 comparables
+                # Calculate distance if coordinates are available
+                distance = 0
+                if subject_lat and subject_lon and prop.get("latitude") and prop.get("longitude"):
+                    distance = calculate_distance(
+                        subject_lat, subject_lon,
+                        prop.get("latitude"), prop.get("longitude")
+                    )
                 
-                for prop in properties[:3]:  # Limit to 3 comparables
-                    # Calculate distance if coordinates are available
-                    distance = 0
-                    if subject_lat and subject_lon and prop.get("latitude") and prop.get("longitude"):
-                        distance = calculate_distance(
-                            subject_lat, subject_lon,
-                            prop.get("latitude"), prop.get("longitude")
-                        )
-                    
-                    # Extract rent
-                    rent = prop.get("price", 0)
-                    if isinstance(rent, str):
-                        # Remove non-numeric characters and convert to float
-                        rent = float(re.sub(r'[^\d.]', '', rent)) if re.sub(r'[^\d.]', '', rent) else 0
-                    
-                    formatted_comp = {
-                        "address": prop.get("address", "Unknown"),
-                        "beds": prop.get("bedrooms", 0),
-                        "baths": prop.get("bathrooms", 0),
-                        "sqft": prop.get("livingArea", 0),
-                        "rent": rent,
-                        "yearBuilt": prop.get("yearBuilt", "Unknown"),
-                        "distance": distance,
-                        "amenities": [],
-                        "propertyType": prop.get("homeType", "Unknown"),
-                        "source": "Zillow",
-                        "url": f"https://www.zillow.com/homedetails/{prop.get('zpid')}_zpid/"
-                    }
-                    formatted_comps.append(formatted_comp)
+                # Extract rent
+                rent = prop.get("price", 0)
+                if isinstance(rent, str):
+                    # Remove non-numeric characters and convert to float
+                    rent = float(re.sub(r'[^\d.]', '', rent)) if re.sub(r'[^\d.]', '', rent) else 0
                 
-                return formatted_comps
-        else:
-            print(f"DEBUG: Zillow API response status code: {response.status_code}", file=sys.stderr)
-            print(f"DEBUG: Zillow API response text: {response.text}", file=sys.stderr)
+                formatted_comp = {
+                    "address": prop.get("address", "Unknown"),
+                    "beds": prop.get("bedrooms", 0),
+                    "baths": prop.get("bathrooms", 0),
+                    "sqft": prop.get("livingArea", 0),
+                    "rent": rent,
+                    "yearBuilt": prop.get("yearBuilt", "Unknown"),
+                    "distance": distance,
+                    "amenities": [],
+                    "propertyType": prop.get("homeType", "Unknown"),
+                    "source": "Zillow",
+                    "credibility": ZILLOW_CREDIBILITY,
+                    "url": f"https://www.zillow.com/homedetails/{prop.get('zpid')}_zpid/",
+                    "latitude": prop.get("latitude"),
+                    "longitude": prop.get("longitude")
+                }
+                formatted_comps.append(formatted_comp)
+            
+            return formatted_comps
+    else:
+        print(f"DEBUG: Zillow API response status code: {response.status_code}", file=sys.stderr)
+        print(f"DEBUG: Zillow API response text: {response.text}", file=sys.stderr)
+    
+    return []
+
+def search_zillow_rentals(property_details):
+    """
+    Search Zillow for rental properties based on the provided details.
+    Returns a list of comparable properties.
+    """
+    try:
+        request = _zillow_request(property_details)
+        if request is None:
+            return []
         
-        return []
+        print(f"DEBUG: Making Zillow API request with params: {request.params}", file=sys.stderr)
+        return _parse_zillow_rentals(send_request(request), property_details)
     
     except Exception as e:
         print(f"Error searching Zillow: {str(e)}", file=sys.stderr)
         return []
 
-def find_comparable_properties(property_details):
+async def search_zillow_rentals_async(property_details):
     """
-    Find comparable rental properties using the Rentcast API and Zillow.
-    Falls back to mock data if the API calls fail.
+    Asyncio variant of search_zillow_rentals().
     """
-    # Get API key from input data or environment
-    api_key = property_details.get("rentcastApiKey") or os.environ.get("RENTCAST_API_KEY")
+    try:
+        request = _zillow_request(property_details)
+        if request is None:
+            return []
+        
+        print(f"DEBUG: Making Zillow API request with params: {request.params}", file=sys.stderr)
+        return _parse_zillow_rentals(await send_request_async(request), property_details)
     
-    # Clean the API key to remove any trailing whitespace or special characters
-    if api_key:
-        api_key = api_key.strip()
-        logger.info(f"Using Rentcast API key: {api_key[:5]}...{api_key[-5:]}")
+    except Exception as e:
+        print(f"Error searching Zillow: {str(e)}", file=sys.stderr)
+        return []
+
+def _comparables_credentials(property_details):
+    """
+    Return the RentCast keys for the comparables search (see
+    credential_pool.keys_for()), or an empty tuple when there are none.
+    """
+    credentials = credential_pool.keys_for(property_details)
+    if credentials:
+        logger.info(f"Using {len(credentials)} Rentcast API key(s)")
     else:
         logger.error("No Rentcast API key found")
-        return generate_mock_comparables(property_details)
-    
-    # Initialize list to store all comparables
-    all_comparables = []
-    
-    # Get the subject property coordinates
-    subject_lat = property_details.get("latitude")
-    subject_lon = property_details.get("longitude")
-    
-    # If coordinates aren't provided, try to geocode the address
-    if not subject_lat or not subject_lon:
-        logger.warning("No coordinates found in property details, attempting to geocode")
-        location_data = geocode_address(property_details)
-        if location_data:
-            subject_lat = location_data.get("latitude")
-            subject_lon = location_data.get("longitude")
-            # Update the property details with the geocoded data
-            property_details.update(location_data)
-        else:
-            logger.error("Failed to geocode property address")
-            # Continue with analysis but note the error
-            property_details["geocoding_error"] = True
-    
+    return credentials
+
+def _comparables_request(property_details, credentials, zip_code=None, radius=None):
+    """
+    Build the RentCast property search used for comparables, in the
+    property's ZIP code, in zip_code when given, or within radius miles of
+    the property's coordinates when given.
+    """
     # Log the coordinates we're using
-    logger.info(f"Using coordinates: {subject_lat}, {subject_lon}")
+    logger.info(f"Using coordinates: {property_details.get('latitude')}, {property_details.get('longitude')}")
     
     # Get the zip code and other location data
-    zip_code = property_details.get("zip_code") or property_details.get("zipCode")
+    zip_code = zip_code or property_details.get("zip_code") or property_details.get("zipCode")
     city = property_details.get("city", "")
     state = property_details.get("state", "")
     
     logger.info(f"Location data: ZIP={zip_code}, City={city}, State={state}")
     
-    # Try to get comparables from Rentcast API
-    try:
-        # Extract property details
-        beds = property_details.get("beds", "")
-        baths = property_details.get("baths", "")
-        property_type = property_details.get("propertyType", "")
-        
-        # Prepare the API request
-        url = "https://api.rentcast.io/v1/properties"
-        headers = {
-            "X-API-KEY": api_key,
-            "Content-Type": "application/json"
-        }
-        
-        # Build the query parameters - prioritize using location data
-        params = {}
-        
-        # First try to use zip code
-        if zip_code:
-            params["zipCode"] = zip_code
-        # If no zip code, try city and state
-        elif city and state:
-            params["city"] = city
-            params["state"] = state
-        # If only city is available, use it (state might be inferred)
-        elif city:
-            params["city"] = city
-        
-        # Add property details to the query
-        if beds:
-            params["bedrooms"] = beds
-        if baths:
-            params["bathrooms"] = baths
-        if property_type:
-            params["propertyType"] = property_type
-        
-        logger.info(f"Making API request to {url} with params: {params}")
-        
-        # Make the API request
-        response = requests.get(url, headers=headers, params=params)
+    # Extract property details
+    beds = property_details.get("beds", "")
+    baths = property_details.get("baths", "")
+    property_type = property_details.get("propertyType", "")
+    
+    # Prepare the API request
+    url = "https://api.rentcast.io/v1/properties"
+    headers = {
+        "Content-Type": "application/json"
+    }
+    
+    # Build the query parameters - prioritize using location data
+    params = {}
+    
+    # A radius ring searches around the property itself
+    if radius:
+        params["latitude"] = property_details.get("latitude")
+        params["longitude"] = property_details.get("longitude")
+        params["radius"] = radius
+    # First try to use zip code
+    elif zip_code:
+        params["zipCode"] = zip_code
+    # If no zip code, try city and state
+    elif city and state:
+        params["city"] = city
+        params["state"] = state
+    # If only city is available, use it (state might be inferred)
+    elif city:
+        params["city"] = city
+    
+    # Add property details to the query
+    if beds:
+        params["bedrooms"] = beds
+    if baths:
+        params["bathrooms"] = baths
+    if property_type:
+        params["propertyType"] = property_type
+    
+    logger.info(f"Making API request to {url} with params: {params}")
+    return ProviderRequest(url, headers, params, shared_cache.KIND_PROPERTIES, zip_code, credentials)
+
+def _parse_comparables(response, property_details, limit):
+    """
+    Convert a RentCast property search response into comparables.
+    """
+    all_comparables = []
+    subject_lat = property_details.get("latitude")
+    subject_lon = property_details.get("longitude")
+    
+    # Check if the request was successful
+    if response.status_code == 200:
+        # The API returns an array of properties directly
+        properties = json_backend.response_json(response)
+        logger.debug(f"API response: {json_backend.describe(properties)}")
         
-        # Check if the request was successful
-        if response.status_code == 200:
-            # The API returns an array of properties directly
-            properties = response.json()
-            logger.debug(f"API response: {json.dumps(properties)[:500]}...")
+        # Check if properties is a list with items
+        if isinstance(properties, list) and properties:
+            logger.info(f"Found {len(properties)} properties from Rentcast API")
             
-            # Check if properties is a list with items
-            if isinstance(properties, list) and properties:
-                logger.info(f"Found {len(properties)} properties from Rentcast API")
+            # Process the properties to create comparable objects
+            comparable_count = 0
+            for prop in properties:
+                # Calculate rent if rentZestimate is not available
+                rent = 0
+                if "rentZestimate" in prop and prop["rentZestimate"]:
+                    rent = prop["rentZestimate"]
+                elif "price" in prop and prop["price"]:
+                    rent = prop["price"]
+                else:
+                    rent = calculate_rent_estimate(prop)
                 
-                # Process the properties to create comparable objects
-                comparable_count = 0
-                for prop in properties:
-                    # Calculate rent if rentZestimate is not available
-                    rent = 0
-                    if "rentZestimate" in prop and prop["rentZestimate"]:
-                        rent = prop["rentZestimate"]
-                    elif "price" in prop and prop["price"]:
-                        rent = prop["price"]
-                    else:
-                        rent = calculate_rent_estimate(prop)
-                    
-                    # Skip properties with no rent data
-                    if not rent:
-                        continue
-                    
-                    # Create a comparable object
-                    comparable = {
-                        "address": prop.get("formattedAddress", ""),
-                        "rent": rent,
-                        "bedrooms": prop.get("bedrooms", 0),
-                        "bathrooms": prop.get("bathrooms", 0),
-                        "squareFootage": prop.get("squareFootage", 0),
-                        "yearBuilt": prop.get("yearBuilt", 0),
-                        "latitude": prop.get("latitude", 0),
-                        "longitude": prop.get("longitude", 0),
-                        "source": "Rentcast",
-                        "distance": 0,
-                        "similarity": 0.9,  # Default similarity score
-                        "adjustedRent": rent,  # Default to the same as rent
-                        "credibility": 0.9,  # Default credibility score
-                        "propertyType": prop.get("propertyType", "")
-                    }
-                    
-                    # Calculate distance if coordinates are available
-                    if subject_lat and subject_lon and prop.get("latitude") and prop.get("longitude"):
-                        distance = calculate_distance(
-                            subject_lat, subject_lon,
-                            prop["latitude"], prop["longitude"]
-                        )
-                        comparable["distance"] = distance
-                        
-                        # Adjust similarity based on distance
-                        if distance < 1:
-                            comparable["similarity"] = 0.95
-                        elif distance < 3:
-                            comparable["similarity"] = 0.9
-                        elif distance < 5:
-                            comparable["similarity"] = 0.85
-                        else:
-                            comparable["similarity"] = 0.8
-                    
-                    # Add the comparable to our list
-                    all_comparables.append(comparable)
-                    comparable_count += 1
+                # Skip properties with no rent data
+                if not rent:
+                    continue
+                
+                # Create a comparable object
+                comparable = {
+                    "address": prop.get("formattedAddress", ""),
+                    "rent": rent,
+                    "bedrooms": prop.get("bedrooms", 0),
+                    "bathrooms": prop.get("bathrooms", 0),
+                    "squareFootage": prop.get("squareFootage", 0),
+                    "yearBuilt": prop.get("yearBuilt", 0),
+                    "latitude": prop.get("latitude", 0),
+                    "longitude": prop.get("longitude", 0),
+                    "source": "Rentcast",
+                    "distance": 0,
+                    "similarity": 0.9,  # Default similarity score
+                    "adjustedRent": rent,  # Default to the same as rent
+                    "credibility": 0.9,  # Default credibility score
+                    "propertyType": prop.get("propertyType", "")
+                }
+                
+                # Calculate distance if coordinates are available
+                if subject_lat and subject_lon and prop.get("latitude") and prop.get("longitude"):
+                    distance = calculate_distance(
+                        subject_lat, subject_lon,
+                        prop["latitude"], prop["longitude"]
+                    )
+                    comparable["distance"] = distance
                     
-                    # Limit to 5 comparables
-                    if comparable_count >= 5:
-                        break
+                    # Adjust similarity based on distance
+                    if distance < 1:
+                        comparable["similarity"] = 0.95
+                    elif distance < 3:
+                        comparable["similarity"] = 0.9
+                    elif distance < 5:
+                        comparable["similarity"] = 0.85
+                    else:
+                        comparable["similarity"] = 0.8
                 
-                logger.info(f"Found {comparable_count} comparable properties")
-            else:
-                logger.warning("No properties found in Rentcast API response")
+                # Add the comparable to our list
+                all_comparables.append(comparable)
+                comparable_count += 1
+                
+                # Stop once we have enough comparables
+                if limit and comparable_count >= limit:
+                    break
+            
+            logger.info(f"Found {comparable_count} comparable properties")
         else:
-            logger.error(f"Rentcast API request failed with status code: {response.status_code}")
-            logger.error(f"Response: {response.text}")
-    except Exception as e:
-        logger.exception(f"Exception during Rentcast API request: {str(e)}")
+            logger.warning("No properties found in Rentcast API response")
+    else:
+        logger.error(f"Rentcast API request failed with status code: {response.status_code}")
+        logger.error(f"Response: {response.text}")
+    return all_comparables
+
+def _comp_search_rings(property_details, credentials):
+    """
+    Yield (description, searches) for each ring of the adaptive comparables
+    search, widening from the property's ZIP to its neighboring ZIPs and
+    then to radius rings around its coordinates. Rings are built lazily so
+    the search stops without building the outer ones.
+    """
+    yield "subject ZIP", [_comparables_request(property_details, credentials)]
     
-    # If we don't have enough comparables from Rentcast, try Zillow
-    if len(all_comparables) < 3:
-        logger.info("Not enough comparables from Rentcast, trying Zillow")
-        zillow_comparables = search_zillow_rentals(property_details)
-        all_comparables.extend(zillow_comparables)
+    neighbor_zips = _neighbor_zip_codes(property_details)
+    if neighbor_zips:
+        yield (f"neighboring ZIPs {', '.join(neighbor_zips)}",
+               [_comparables_request(property_details, credentials, zip_code) for zip_code in neighbor_zips])
+    
+    if property_details.get("latitude") and property_details.get("longitude"):
+        for radius in COMP_SEARCH_RADII:
+            yield f"{radius} mile radius", [_comparables_request(property_details, credentials, radius=radius)]
+
+def subject_zip_listings(property_details, fresh=False):
+    """
+    Return the RentCast property search in the property's own ZIP code (the
+    first ring of the comparables search) as parsed JSON, through the same
+    caches as an analysis unless `fresh` is set, or None when it cannot be
+    fetched.
+    """
+    credentials = credential_pool.keys_for(property_details)
+    if not credentials or not property_details.get("zipCode"):
+        return None
+    response = send_request(_comparables_request(property_details, credentials), fresh)
+    if response.status_code != 200:
+        return None
+    return json_backend.response_json(response)
+
+def _send_or_error(request):
+    try:
+        return send_request(request)
+    except Exception as e:
+        return e
+
+def _send_ring(searches):
+    """
+    Send one ring of comparables searches concurrently with the blocking
+    client. Failed searches are returned as their exceptions.
+    """
+    if len(searches) == 1:
+        return [_send_or_error(searches[0])]
+    with ThreadPoolExecutor(max_workers=len(searches)) as executor:
+        return list(executor.map(_send_or_error, searches))
+
+async def _send_ring_async(searches):
+    """
+    Asyncio variant of _send_ring().
+    """
+    return await asyncio.gather(*(send_request_async(r) for r in searches), return_exceptions=True)
+
+def _add_ring_comparables(all_comparables, responses, property_details, limit):
+    """
+    Parse one ring's responses into all_comparables, merging comps already
+    found in an inner ring or another search of the same ring.
+    """
+    for response in responses:
+        if isinstance(response, Exception):
+            logger.error(f"Exception during Rentcast API request: {str(response)}")
+            continue
+        try:
+            all_comparables.extend(_parse_comparables(response, property_details, limit))
+        except Exception as e:
+            logger.exception(f"Exception during Rentcast API request: {str(e)}")
+    all_comparables[:] = comp_merge.merge(all_comparables)
+
+def _neighbor_zip_codes(property_details):
+    """
+    Return the ZIP codes bordering the property's ZIP, nearest first,
+    from the local reference dataset.
+    """
+    zip_code = property_details.get("zip_code") or property_details.get("zipCode")
+    return zip_reference.neighbors(zip_code) if zip_code else ()
+
+def _finish_comparables(property_details, all_comparables, limit):
+    """
+    Merge duplicates across sources, top up a short comp list with mock
+    data and return the most similar.
+    """
+    all_comparables = comp_merge.merge(all_comparables)
     
     # If we still don't have enough comparables, generate mock data
     if len(all_comparables) < 3:
@@ -332,23 +494,82 @@ def find_comparable_properties(property_details):
         all_comparables.extend(mock_comparables)
     
     # Sort comparables by similarity (highest first)
-    all_comparables.sort(key=lambda x: x["similarity"], reverse=True)
+    all_comparables.sort(key=lambda x: x.get("similarity", 0), reverse=True)
+    
+    # Return the top comparables
+    return all_comparables[:limit] if limit else all_comparables
+
+def find_comparable_properties(property_details, limit=5):
+    """
+    Find comparable rental properties using the Rentcast API and Zillow.
+    The RentCast search widens from the property's ZIP to neighboring ZIPs
+    and then to radius rings, fetching each ring concurrently and stopping
+    once COMP_SEARCH_MIN_COMPS (default 3) distinct comps are found.
+    Falls back to mock data if the API calls fail.
+    Returns the `limit` most similar comparables, or every candidate
+    found when limit is None.
+    """
+    credentials = _comparables_credentials(property_details)
+    if not credentials:
+        return generate_mock_comparables(property_details)
+    
+    # If coordinates aren't provided, try to geocode the address
+    if not property_details.get("latitude") or not property_details.get("longitude"):
+        logger.warning("No coordinates found in property details, attempting to geocode")
+        apply_location(property_details, resolve_location(property_details))
+    
+    # Search outward ring by ring until enough distinct comps are found
+    all_comparables = []
+    target = env_int("COMP_SEARCH_MIN_COMPS", 3)
+    for description, searches in _comp_search_rings(property_details, credentials):
+        logger.info(f"Searching {description} for comparables")
+        _add_ring_comparables(all_comparables, _send_ring(searches), property_details, limit)
+        if len(all_comparables) >= target:
+            break
+    
+    # If we don't have enough comparables from Rentcast, try Zillow
+    if len(all_comparables) < target:
+        logger.info("Not enough comparables from Rentcast, trying Zillow")
+        all_comparables.extend(search_zillow_rentals(property_details))
     
-    # Return the top 5 comparables
-    return all_comparables[:5]
+    return _finish_comparables(property_details, all_comparables, limit)
+
+async def find_comparable_properties_async(property_details, limit=5):
+    """
+    Asyncio variant of find_comparable_properties().
+    """
+    credentials = _comparables_credentials(property_details)
+    if not credentials:
+        return generate_mock_comparables(property_details)
+    
+    # If coordinates aren't provided, try to geocode the address
+    if not property_details.get("latitude") or not property_details.get("longitude"):
+        logger.warning("No coordinates found in property details, attempting to geocode")
+        apply_location(property_details, await resolve_location_async(property_details))
+    
+    # Search outward ring by ring until enough distinct comps are found
+    all_comparables = []
+    target = env_int("COMP_SEARCH_MIN_COMPS", 3)
+    for description, searches in _comp_search_rings(property_details, credentials):
+        logger.info(f"Searching {description} for comparables")
+        _add_ring_comparables(all_comparables, await _send_ring_async(searches), property_details, limit)
+        if len(all_comparables) >= target:
+            break
+    
+    # If we don't have enough comparables from Rentcast, try Zillow
+    if len(all_comparables) < target:
+        logger.info("Not enough comparables from Rentcast, trying Zillow")
+        all_comparables.extend(await search_zillow_rentals_async(property_details))
+    
+    return _finish_comparables(property_details, all_comparables, limit)
 
 def calculate_rent_estimate(property_data):
     """
     Calculate a rent estimate based on property data when rentZestimate is not available.
+    Uses the hedonic model fitted for the property's ZIP code.
     """
-    sqft = property_data.get("squareFootage", 0)
-    beds = property_data.get("bedrooms", 0)
-    baths = property_data.get("bathrooms", 0)
-    
-    # Simple formula: $2.50 per sqft + $200 per bedroom + $150 per bathroom
-    base_rent = sqft * 2.5
-    base_rent += beds * 200
-    base_rent += baths * 150
+    model = hedonic_model.load_model(property_data.get("zipCode"))
+    base_rent = hedonic_model.predict(model, property_data)
     
     return round(base_rent, -1)  # Round to nearest 10
 
@@ -364,19 +585,19 @@ def generate_mock_comparables(property_details):
     property_type = property_details.get("propertyType", "")
     zip_code = property_details.get("zipCode", "")
     
-    # Generate base rent (this would normally come from real data)
-    base_rent = sqft * 2.5  # Simple formula: $2.50 per sqft
+    # Generate base rent from the market's hedonic model
+    model = hedonic_model.load_model(zip_code)
+    base_rent = hedonic_model.predict(model, property_details)
     
-    # Adjust for bedrooms and bathrooms
-    base_rent += beds * 200  # Add $200 per bedroom
-    base_rent += baths * 150  # Add $150 per bathroom
+    # Place the comps in the property's ZIP and its nearest neighbors
+    places = _mock_places(property_details, zip_code)
     
     # Create comparable properties with slight variations
     comparables = []
     
     # Comparable 1: Similar size, slightly fewer amenities
     comparables.append({
-        "address": f"123 Nearby St, {zip_code}",
+        "address": f"123 Nearby St, {places[0]['locality']}",
         "beds": beds,
         "baths": baths,
         "sqft": sqft - 50,
@@ -386,13 +607,14 @@ def generate_mock_comparables(property_details):
         "amenities": ["Parking", "Dishwasher"],
         "propertyType": property_type,
         "source": "Mock Data",
+        "credibility": MOCK_CREDIBILITY,
         "latitude": None,
         "longitude": None
     })
     
     # Comparable 2: Slightly larger, more amenities, higher price
     comparables.append({
-        "address": f"456 Similar Ave, {zip_code}",
+        "address": f"456 Similar Ave, {places[1]['locality']}",
         "beds": beds,
         "baths": baths + 0.5 if baths < 2 else baths,
         "sqft": sqft + 100,
@@ -402,13 +624,14 @@ def generate_mock_comparables(property_details):
         "amenities": ["Parking", "Dishwasher", "Pool", "Gym"],
         "propertyType": property_type,
         "source": "Mock Data",
+        "credibility": MOCK_CREDIBILITY,
         "latitude": None,
         "longitude": None
     })
     
     # Comparable 3: Similar overall, different mix of features
     comparables.append({
-        "address": f"789 Close Blvd, {zip_code}",
+        "address": f"789 Close Blvd, {places[2]['locality']}",
         "beds": beds + (1 if beds < 3 else 0),
         "baths": baths - 0.5 if baths > 1 else baths,
         "sqft": sqft + 25,
@@ -418,493 +641,527 @@ def generate_mock_comparables(property_details):
         "amenities": ["Washer/Dryer", "Balcony", "Parking"],
         "propertyType": property_type,
         "source": "Mock Data",
+        "credibility": MOCK_CREDIBILITY,
         "latitude": None,
         "longitude": None
     })
     
+    for comparable, place in zip(comparables, places):
+        comparable["latitude"] = place["latitude"]
+        comparable["longitude"] = place["longitude"]
+        if place["distance"] is not None:
+            comparable["distance"] = place["distance"]
+    
     return comparables
 
-def get_market_trends(property_details):
+def _mock_places(property_details, zip_code):
     """
-    Get market trends data from RentCast API based on zip code.
+    Return three locations for mock comparables: the property's ZIP followed
+    by its nearest neighboring ZIPs, with centroids from the local reference
+    dataset. Each has a locality for the address line, coordinates (None
+    when unknown) and the distance from the property when it can be measured.
     """
-    # Check if we have an API key
-    api_key = os.environ.get("RENTCAST_API_KEY")
-    if not api_key:
-        print("Warning: No RentCast API key found. Skipping market trends.", 
+    subject = zip_reference.lookup(zip_code)
+    records = [subject] if subject else []
+    records.extend(filter(None, (zip_reference.lookup(z) for z in _neighbor_zip_codes(property_details))))
+    subject_lat = property_details.get("latitude")
+    subject_lon = property_details.get("longitude")
+    
+    places = []
+    for record in records[:3]:
+        distance = None
+        if subject_lat and subject_lon and record.latitude is not None:
+            distance = calculate_distance(subject_lat, subject_lon, record.latitude, record.longitude)
+        places.append({
+            "locality": f"{record.city}, {record.state} {record.zip_code}" if record.city else record.zip_code,
+            "latitude": record.latitude,
+            "longitude": record.longitude,
+            "distance": distance
+        })
+    while len(places) < 3:
+        places.append({"locality": zip_code, "latitude": None, "longitude": None, "distance": None})
+    return places
+
+def _rentcast_request(property_details, skipping, url, params, required="zipCode", cache_kind=None):
+    """
+    Build a RentCast request with the standard headers. Returns None, with a
+    warning, when there is no API key or the required zip code/address is
+    missing from the property details.
+    """
+    # Check if we have an API key: the request's own, its tenant's or the shared pool
+    credentials = credential_pool.keys_for(property_details)
+    if not credentials:
+        print(f"Warning: No RentCast API key found. Skipping {skipping}.", 
               file=sys.stderr)
         return None
     
-    # Clean the API key
-    api_key = api_key.strip()
-
-    # Get the zip code from property details
-    zip_code = property_details.get("zipCode")
-    if not zip_code:
-        print("Warning: No zip code provided. Skipping market trends.", 
+    # Get the required property details
+    if not property_details.get(required):
+        field = "zip code" if required == "zipCode" else required
+        print(f"Warning: No {field} provided. Skipping {skipping}.", 
               file=sys.stderr)
         return None
 
-    # Construct the API request
-    url = "https://api.rentcast.io/v1/markets"
+    # The key is picked from the credentials when the request is sent
     headers = {
-        "accept": "application/json",
-        "X-API-KEY": api_key
-    }
-    params = {
-        "zipCode": zip_code,
-        "propertyType": property_details.get("propertyType", ""),
-        "bedrooms": property_details.get("beds", ""),
-        "limit": 1
+        "accept": "application/json"
     }
+    return ProviderRequest(url, headers, params, cache_kind, property_details.get("zipCode"), credentials)
 
-    # Make the API request
-    try:
-        print(f"DEBUG: Making API request to {url} with params: {params}", 
-              file=sys.stderr)
-        response = requests.get(url, headers=headers, params=params)
+def _market_trends_request(property_details):
+    return _rentcast_request(
+        property_details, "market trends", "https://api.rentcast.io/v1/markets",
+        {
+            "zipCode": property_details.get("zipCode"),
+            "propertyType": property_details.get("propertyType", ""),
+            "bedrooms": property_details.get("beds", ""),
+            "limit": 1
+        },
+        cache_kind=shared_cache.KIND_MARKET
+    )
+
+def _parse_market_trends(response, property_details):
+    # Check for API errors
+    if response.status_code != 200:
+        print(f"ERROR: Market trends API returned status code {response.status_code}", file=sys.stderr)
+        print(f"Response: {response.text}", file=sys.stderr)
+        return None
         
-        # Check for API errors
-        if response.status_code != 200:
-            print(f"ERROR: Market trends API returned status code {response.status_code}", file=sys.stderr)
-            print(f"Response: {response.text}", file=sys.stderr)
-            return None
-            
-        data = response.json()
-        print(f"DEBUG: API response: {json.dumps(data, indent=2)}", file=sys.stderr)
-        return data
-    except Exception as e:
-        print(f"ERROR: Error fetching market trends: {e}", file=sys.stderr)
+    data = json_backend.response_json(response)
+    print(f"DEBUG: API response: {json_backend.describe(data)}", file=sys.stderr)
+    return data
+
+def _historical_rental_request(property_details):
+    return _rentcast_request(
+        property_details, "historical data", "https://api.rentcast.io/v1/avm/rent/long-term",
+        {
+            "address": address_key.property_address(property_details),
+            "propertyType": property_details.get("propertyType", ""),
+            "bedrooms": property_details.get("beds", ""),
+            "bathrooms": property_details.get("baths", ""),
+            "squareFootage": property_details.get("squareFeet", "")
+        },
+        required="address"
+    )
+
+def _parse_historical_rental_data(response, property_details):
+    # Check for API errors
+    if response.status_code != 200:
+        print(f"ERROR: Historical data API returned status code {response.status_code}", file=sys.stderr)
+        print(f"Response: {response.text}", file=sys.stderr)
         return None
+        
+    data = json_backend.response_json(response)
+    print(f"DEBUG: API response: {json_backend.describe(data)}", file=sys.stderr)
+    return data
 
-def get_historical_rental_data(property_details):
-    """
-    Get historical rental data for a property from RentCast API.
-    """
-    # Check if we have an API key
-    api_key = os.environ.get("RENTCAST_API_KEY")
-    if not api_key:
-        print("Warning: No RentCast API key found. Skipping historical data.", 
-              file=sys.stderr)
+def _owner_info_request(property_details):
+    return _rentcast_request(
+        property_details, "owner information", "https://api.rentcast.io/v1/properties",
+        {
+            "address": address_key.property_address(property_details),
+            "includeDetails": "true"  # Include detailed information including owner data
+        },
+        required="address"
+    )
+
+def _parse_owner_info(response, property_details):
+    # Check for API errors
+    if response.status_code != 200:
+        print(f"ERROR: Property owner API returned status code {response.status_code}", file=sys.stderr)
+        print(f"Response: {response.text}", file=sys.stderr)
         return None
+        
+    data = json_backend.response_json(response)
     
-    # Clean the API key
-    api_key = api_key.strip()
-
-    # Get the required property details
-    address = property_details.get("address")
-    if not address:
-        print("Warning: No address provided. Skipping historical data.", 
-              file=sys.stderr)
+    # Check if we got property data
+    if not data or not isinstance(data, list) or len(data) == 0:
+        print(f"ERROR: No property data found for address: {property_details.get('address')}", file=sys.stderr)
         return None
-
-    # Construct the API request
-    url = "https://api.rentcast.io/v1/avm/rent/long-term"
-    headers = {
-        "accept": "application/json",
-        "X-API-KEY": api_key
+        
+    # Get the first property (most relevant match)
+    property_data = data[0]
+    
+    # Extract owner information
+    owner_info = {
+        "ownerName": property_data.get("ownerName"),
+        "ownerAddress": property_data.get("ownerAddress"),
+        "ownerCity": property_data.get("ownerCity"),
+        "ownerState": property_data.get("ownerState"),
+        "ownerZip": property_data.get("ownerZip"),
+        "ownerOccupied": property_data.get("ownerOccupied", False),
+        "corporateOwned": property_data.get("corporateOwned", False)
     }
     
-    # Prepare parameters for the API request
-    params = {
-        "address": address,
-        "propertyType": property_details.get("propertyType", ""),
-        "bedrooms": property_details.get("beds", ""),
-        "bathrooms": property_details.get("baths", ""),
-        "squareFootage": property_details.get("squareFeet", "")
-    }
+    print(f"DEBUG: Owner information: {json.dumps(owner_info)}", file=sys.stderr)
+    return owner_info
 
-    # Make the API request
-    try:
-        print(f"DEBUG: Making API request to {url} with params: {params}", 
-              file=sys.stderr)
-        response = requests.get(url, headers=headers, params=params)
-        
-        # Check for API errors
-        if response.status_code != 200:
-            print(f"ERROR: Historical data API returned status code {response.status_code}", file=sys.stderr)
-            print(f"Response: {response.text}", file=sys.stderr)
-            return None
-            
-        data = response.json()
-        print(f"DEBUG: API response: {json.dumps(data, indent=2)}", file=sys.stderr)
-        return data
-    except Exception as e:
-        print(f"ERROR: Error fetching historical rental data: {e}", file=sys.stderr)
+def _value_estimate_request(property_details):
+    return _rentcast_request(
+        property_details, "property value estimate", "https://api.rentcast.io/v1/avm/value",
+        {
+            "address": address_key.property_address(property_details),
+            "propertyType": property_details.get("propertyType", ""),
+            "bedrooms": property_details.get("beds", ""),
+            "bathrooms": property_details.get("baths", ""),
+            "squareFootage": property_details.get("squareFeet", "")
+        },
+        required="address"
+    )
+
+def _parse_value_estimate(response, property_details):
+    # Check for API errors
+    if response.status_code != 200:
+        print(f"ERROR: Property value API returned status code {response.status_code}", file=sys.stderr)
+        print(f"Response: {response.text}", file=sys.stderr)
         return None
+        
+    data = json_backend.response_json(response)
+    print(f"DEBUG: API response: {json_backend.describe(data)}", file=sys.stderr)
+    
+    # Format the response
+    value_estimate = {
+        "value": data.get("value"),
+        "valueRangeLow": data.get("valueRangeLow"),
+        "valueRangeHigh": data.get("valueRangeHigh"),
+        "latitude": data.get("latitude"),
+        "longitude": data.get("longitude"),
+        "comparables": data.get("comparables", [])
+    }
+    
+    return value_estimate
 
-def get_property_owner_info(property_details):
-    """
-    Get property owner information from RentCast API.
-    """
-    # Check if we have an API key
-    api_key = os.environ.get("RENTCAST_API_KEY")
-    if not api_key:
-        print("Warning: No RentCast API key found. Skipping owner information.", 
-              file=sys.stderr)
+def _recent_sales_request(property_details):
+    return _rentcast_request(
+        property_details, "recent sales comps", "https://api.rentcast.io/v1/listings/sale",
+        {
+            "zipCode": property_details.get("zipCode"),
+            "propertyType": property_details.get("propertyType", ""),
+            "bedrooms": property_details.get("beds", ""),
+            "bathrooms": property_details.get("baths", ""),
+            "limit": 10,  # Limit to 10 recent sales
+            "sort": "listedDate",
+            "order": "desc"  # Most recent first
+        }
+    )
+
+def _parse_recent_sales(response, property_details):
+    # Check for API errors
+    if response.status_code != 200:
+        print(f"ERROR: Recent sales API returned status code {response.status_code}", file=sys.stderr)
+        print(f"Response: {response.text}", file=sys.stderr)
         return None
+        
+    data = json_backend.response_json(response)
+    
+    # Format the response
+    sales_comps = []
+    for listing in data:
+        sales_comp = {
+            "address": listing.get("formattedAddress"),
+            "price": listing.get("price"),
+            "beds": listing.get("bedrooms"),
+            "baths": listing.get("bathrooms"),
+            "sqft": listing.get("squareFootage"),
+            "yearBuilt": listing.get("yearBuilt"),
+            "propertyType": listing.get("propertyType"),
+            "listedDate": listing.get("listedDate"),
+            "latitude": listing.get("latitude"),
+            "longitude": listing.get("longitude"),
+            "daysOnMarket": listing.get("daysOnMarket")
+        }
+        sales_comps.append(sales_comp)
     
-    # Clean the API key
-    api_key = api_key.strip()
+    return sales_comps
 
-    # Get the required property details
-    address = property_details.get("address")
-    if not address:
-        print("Warning: No address provided. Skipping owner information.", 
-              file=sys.stderr)
+def _recent_rentals_request(property_details):
+    return _rentcast_request(
+        property_details, "recent rental comps", "https://api.rentcast.io/v1/listings/rental",
+        {
+            "zipCode": property_details.get("zipCode"),
+            "propertyType": property_details.get("propertyType", ""),
+            "bedrooms": property_details.get("beds", ""),
+            "bathrooms": property_details.get("baths", ""),
+            "limit": 10,  # Limit to 10 recent rentals
+            "sort": "listedDate",
+            "order": "desc"  # Most recent first
+        },
+        cache_kind=shared_cache.KIND_RENTAL_LISTINGS
+    )
+
+def _parse_recent_rentals(response, property_details):
+    # Check for API errors
+    if response.status_code != 200:
+        print(f"ERROR: Recent rentals API returned status code {response.status_code}", file=sys.stderr)
+        print(f"Response: {response.text}", file=sys.stderr)
         return None
+        
+    data = json_backend.response_json(response)
+    
+    # Format the response
+    rental_comps = []
+    for listing in data:
+        rental_comp = {
+            "address": listing.get("formattedAddress"),
+            "rent": listing.get("price"),
+            "beds": listing.get("bedrooms"),
+            "baths": listing.get("bathrooms"),
+            "sqft": listing.get("squareFootage"),
+            "yearBuilt": listing.get("yearBuilt"),
+            "propertyType": listing.get("propertyType"),
+            "listedDate": listing.get("listedDate"),
+            "latitude": listing.get("latitude"),
+            "longitude": listing.get("longitude"),
+            "daysOnMarket": listing.get("daysOnMarket")
+        }
+        rental_comps.append(rental_comp)
+    
+    return rental_comps
 
-    # Construct the API request
-    url = "https://api.rentcast.io/v1/properties"
-    headers = {
-        "accept": "application/json",
-        "X-API-KEY": api_key
+def _market_statistics_request(property_details):
+    return _rentcast_request(
+        property_details, "detailed market statistics", "https://api.rentcast.io/v1/markets/statistics",
+        {
+            "zipCode": property_details.get("zipCode"),
+            "propertyType": property_details.get("propertyType", ""),
+            "bedrooms": property_details.get("beds", "")
+        }
+    )
+
+def _parse_market_statistics(response, property_details):
+    # Check for API errors
+    if response.status_code != 200:
+        print(f"ERROR: Market statistics API returned status code {response.status_code}", file=sys.stderr)
+        print(f"Response: {response.text}", file=sys.stderr)
+        return None
+        
+    data = json_backend.response_json(response)
+    print(f"DEBUG: API response: {json_backend.describe(data)}", file=sys.stderr)
+    
+    # Extract key statistics
+    market_stats = {
+        "rentalMarket": {
+            "averageRent": data.get("rentalMarket", {}).get("averageRent"),
+            "medianRent": data.get("rentalMarket", {}).get("medianRent"),
+            "averageDaysOnMarket": data.get("rentalMarket", {}).get("averageDaysOnMarket"),
+            "totalListings": data.get("rentalMarket", {}).get("totalListings"),
+            "rentTrend": data.get("rentalMarket", {}).get("rentTrend"),
+            "rentTrendPercentage": data.get("rentalMarket", {}).get("rentTrendPercentage")
+        },
+        "saleMarket": {
+            "averagePrice": data.get("saleMarket", {}).get("averagePrice"),
+            "medianPrice": data.get("saleMarket", {}).get("medianPrice"),
+            "averageDaysOnMarket": data.get("saleMarket", {}).get("averageDaysOnMarket"),
+            "totalListings": data.get("saleMarket", {}).get("totalListings"),
+            "priceTrend": data.get("saleMarket", {}).get("priceTrend"),
+            "priceTrendPercentage": data.get("saleMarket", {}).get("priceTrendPercentage")
+        },
+        "investmentMetrics": {
+            "averageCapRate": data.get("investmentMetrics", {}).get("averageCapRate"),
+            "medianCapRate": data.get("investmentMetrics", {}).get("medianCapRate"),
+            "averageCashOnCashReturn": data.get("investmentMetrics", {}).get("averageCashOnCashReturn"),
+            "medianCashOnCashReturn": data.get("investmentMetrics", {}).get("medianCashOnCashReturn"),
+            "averageRentToPrice": data.get("investmentMetrics", {}).get("averageRentToPrice"),
+            "medianRentToPrice": data.get("investmentMetrics", {}).get("medianRentToPrice")
+        }
     }
     
-    # Prepare parameters for the API request
-    params = {
-        "address": address,
-        "includeDetails": "true"  # Include detailed information including owner data
-    }
+    return market_stats
+
+# RentCast data sets fetched for an analysis:
+# name -> (request builder, response parser, description for errors)
+RENTCAST_FETCHERS = {
+    "market_trends": (_market_trends_request, _parse_market_trends, "market trends"),
+    "historical_data": (_historical_rental_request, _parse_historical_rental_data, "historical rental data"),
+    "owner_info": (_owner_info_request, _parse_owner_info, "property owner information"),
+    "value_estimate": (_value_estimate_request, _parse_value_estimate, "property value estimate"),
+    "recent_sales": (_recent_sales_request, _parse_recent_sales, "recent sales comps"),
+    "recent_rentals": (_recent_rentals_request, _parse_recent_rentals, "recent rental comps"),
+    "detailed_market_stats": (_market_statistics_request, _parse_market_statistics, "detailed market statistics"),
+}
+
+def fetch_rentcast(name, property_details, fresh=False):
+    """
+    Fetch one of the RENTCAST_FETCHERS data sets with the blocking client,
+    bypassing the caches when `fresh` is set.
+    Returns None when the request is skipped or fails.
+    """
+    build, parse, description = RENTCAST_FETCHERS[name]
+    request = build(property_details)
+    if request is None:
+        return None
 
     # Make the API request
     try:
-        print(f"DEBUG: Making API request to {url} with params: {params}", 
+        print(f"DEBUG: Making API request to {request.url} with params: {request.params}", 
               file=sys.stderr)
-        response = requests.get(url, headers=headers, params=params)
-        
-        # Check for API errors
-        if response.status_code != 200:
-            print(f"ERROR: Property owner API returned status code {response.status_code}", file=sys.stderr)
-            print(f"Response: {response.text}", file=sys.stderr)
-            return None
-            
-        data = response.json()
-        
-        # Check if we got property data
-        if not data or not isinstance(data, list) or len(data) == 0:
-            print(f"ERROR: No property data found for address: {address}", file=sys.stderr)
-            return None
-            
-        # Get the first property (most relevant match)
-        property_data = data[0]
-        
-        # Extract owner information
-        owner_info = {
-            "ownerName": property_data.get("ownerName"),
-            "ownerAddress": property_data.get("ownerAddress"),
-            "ownerCity": property_data.get("ownerCity"),
-            "ownerState": property_data.get("ownerState"),
-            "ownerZip": property_data.get("ownerZip"),
-            "ownerOccupied": property_data.get("ownerOccupied", False),
-            "corporateOwned": property_data.get("corporateOwned", False)
-        }
-        
-        print(f"DEBUG: Owner information: {json.dumps(owner_info)}", file=sys.stderr)
-        return owner_info
+        return parse(send_request(request, fresh), property_details)
     except Exception as e:
-        print(f"ERROR: Error fetching property owner information: {e}", file=sys.stderr)
+        print(f"ERROR: Error fetching {description}: {e}", file=sys.stderr)
         return None
 
-def get_property_value_estimate(property_details):
+async def fetch_rentcast_async(name, property_details, fresh=False):
     """
-    Get real-time property value estimate from RentCast API.
+    Asyncio variant of fetch_rentcast().
     """
-    # Check if we have an API key
-    api_key = os.environ.get("RENTCAST_API_KEY")
-    if not api_key:
-        print("Warning: No RentCast API key found. Skipping property value estimate.", 
-              file=sys.stderr)
-        return None
-    
-    # Clean the API key
-    api_key = api_key.strip()
-
-    # Get the required property details
-    address = property_details.get("address")
-    if not address:
-        print("Warning: No address provided. Skipping property value estimate.", 
-              file=sys.stderr)
+    build, parse, description = RENTCAST_FETCHERS[name]
+    request = build(property_details)
+    if request is None:
         return None
 
-    # Construct the API request
-    url = "https://api.rentcast.io/v1/avm/value"
-    headers = {
-        "accept": "application/json",
-        "X-API-KEY": api_key
-    }
-    
-    # Prepare parameters for the API request
-    params = {
-        "address": address,
-        "propertyType": property_details.get("propertyType", ""),
-        "bedrooms": property_details.get("beds", ""),
-        "bathrooms": property_details.get("baths", ""),
-        "squareFootage": property_details.get("squareFeet", "")
-    }
-
     # Make the API request
     try:
-        print(f"DEBUG: Making API request to {url} with params: {params}", 
+        print(f"DEBUG: Making API request to {request.url} with params: {request.params}", 
               file=sys.stderr)
-        response = requests.get(url, headers=headers, params=params)
-        
-        # Check for API errors
-        if response.status_code != 200:
-            print(f"ERROR: Property value API returned status code {response.status_code}", file=sys.stderr)
-            print(f"Response: {response.text}", file=sys.stderr)
-            return None
-            
-        data = response.json()
-        print(f"DEBUG: API response: {json.dumps(data, indent=2)}", file=sys.stderr)
-        
-        # Format the response
-        value_estimate = {
-            "value": data.get("value"),
-            "valueRangeLow": data.get("valueRangeLow"),
-            "valueRangeHigh": data.get("valueRangeHigh"),
-            "latitude": data.get("latitude"),
-            "longitude": data.get("longitude"),
-            "comparables": data.get("comparables", [])
-        }
-        
-        return value_estimate
+        return parse(await send_request_async(request, fresh), property_details)
     except Exception as e:
-        print(f"ERROR: Error fetching property value estimate: {e}", file=sys.stderr)
+        print(f"ERROR: Error fetching {description}: {e}", file=sys.stderr)
         return None
 
-def get_recent_sales_comps(property_details):
+def get_market_trends(property_details, fresh=False):
     """
-    Get recent sales comps from RentCast API.
+    Get market trends data from RentCast API based on zip code.
+    `fresh` skips the shared and HTTP caches, e.g. for a scheduled refresh.
     """
-    # Check if we have an API key
-    api_key = os.environ.get("RENTCAST_API_KEY")
-    if not api_key:
-        print("Warning: No RentCast API key found. Skipping recent sales comps.", 
-              file=sys.stderr)
-        return None
-    
-    # Clean the API key
-    api_key = api_key.strip()
+    return fetch_rentcast("market_trends", property_details, fresh)
 
-    # Get the required property details
+def _stored_market_summary(property_details):
+    """
+    Return the precomputed summary row for the property, or None.
+    """
     zip_code = property_details.get("zipCode")
-    if not zip_code:
-        print("Warning: No zip code provided. Skipping recent sales comps.", 
-              file=sys.stderr)
-        return None
+    summary = market_summary.lookup(zip_code, property_details.get("beds"), property_details.get("propertyType"))
+    if summary:
+        logger.info(f"Using precomputed market summary for {zip_code} "
+                    f"(bedrooms={summary['bedrooms'] or 'all'}, type={summary['property_type'] or 'all'})")
+    return summary
 
-    # Construct the API request
-    url = "https://api.rentcast.io/v1/listings/sale"
-    headers = {
-        "accept": "application/json",
-        "X-API-KEY": api_key
-    }
+def _summarize_market_trends(property_details, market_trends):
+    """
+    Write a live /v1/markets response through to the summary table.
+    Returns (summary, market_trends).
+    """
+    if not market_trends:
+        return None, None
     
-    # Prepare parameters for the API request
-    params = {
-        "zipCode": zip_code,
-        "propertyType": property_details.get("propertyType", ""),
-        "bedrooms": property_details.get("beds", ""),
-        "bathrooms": property_details.get("baths", ""),
-        "limit": 10,  # Limit to 10 recent sales
-        "sort": "listedDate",
-        "order": "desc"  # Most recent first
-    }
+    zip_code = property_details.get("zipCode")
+    market_summary.store_market_payload(zip_code, market_trends)
+    summary = market_summary.lookup(zip_code, property_details.get("beds"), property_details.get("propertyType"))
+    if not summary:
+        rows = market_summary.summarize_market_payload(zip_code, market_trends)
+        summary = rows[0] if rows else None
+    return summary, market_trends
 
-    # Make the API request
-    try:
-        print(f"DEBUG: Making API request to {url} with params: {params}", 
-              file=sys.stderr)
-        response = requests.get(url, headers=headers, params=params)
-        
-        # Check for API errors
-        if response.status_code != 200:
-            print(f"ERROR: Recent sales API returned status code {response.status_code}", file=sys.stderr)
-            print(f"Response: {response.text}", file=sys.stderr)
-            return None
-            
-        data = response.json()
-        
-        # Format the response
-        sales_comps = []
-        for listing in data:
-            sales_comp = {
-                "address": listing.get("formattedAddress"),
-                "price": listing.get("price"),
-                "beds": listing.get("bedrooms"),
-                "baths": listing.get("bathrooms"),
-                "sqft": listing.get("squareFootage"),
-                "yearBuilt": listing.get("yearBuilt"),
-                "propertyType": listing.get("propertyType"),
-                "listedDate": listing.get("listedDate"),
-                "latitude": listing.get("latitude"),
-                "longitude": listing.get("longitude"),
-                "daysOnMarket": listing.get("daysOnMarket")
-            }
-            sales_comps.append(sales_comp)
-        
-        return sales_comps
-    except Exception as e:
-        print(f"ERROR: Error fetching recent sales comps: {e}", file=sys.stderr)
-        return None
+def get_market_summary(property_details):
+    """
+    Get the precomputed market summary for the property's ZIP code.
+    Reads the local summary table and only calls /v1/markets when the ZIP is
+    missing or stale, writing the live response through to the table.
+    Returns (summary, market_trends) where market_trends is the raw live
+    response, or None when the summary came from the table.
+    """
+    if not property_details.get("zipCode"):
+        return None, None
+    
+    summary = _stored_market_summary(property_details)
+    if summary:
+        return summary, None
+    return _summarize_market_trends(property_details, get_market_trends(property_details))
+
+async def get_market_summary_async(property_details):
+    """
+    Asyncio variant of get_market_summary().
+    """
+    if not property_details.get("zipCode"):
+        return None, None
+    
+    summary = _stored_market_summary(property_details)
+    if summary:
+        return summary, None
+    market_trends = await fetch_rentcast_async("market_trends", property_details)
+    return _summarize_market_trends(property_details, market_trends)
 
-def get_recent_rental_comps(property_details):
+def get_historical_rental_data(property_details):
     """
-    Get recent rental comps from RentCast API.
+    Get historical rental data for a property from RentCast API.
     """
-    # Check if we have an API key
-    api_key = os.environ.get("RENTCAST_API_KEY")
-    if not api_key:
-        print("Warning: No RentCast API key found. Skipping recent rental comps.", 
-              file=sys.stderr)
-        return None
-    
-    # Clean the API key
-    api_key = api_key.strip()
+    return fetch_rentcast("historical_data", property_details)
 
-    # Get the required property details
-    zip_code = property_details.get("zipCode")
-    if not zip_code:
-        print("Warning: No zip code provided. Skipping recent rental comps.", 
-              file=sys.stderr)
-        return None
+def get_property_owner_info(property_details):
+    """
+    Get property owner information from RentCast API.
+    """
+    return fetch_rentcast("owner_info", property_details)
 
-    # Construct the API request
-    url = "https://api.rentcast.io/v1/listings/rental"
-    headers = {
-        "accept": "application/json",
-        "X-API-KEY": api_key
-    }
-    
-    # Prepare parameters for the API request
-    params = {
-        "zipCode": zip_code,
-        "propertyType": property_details.get("propertyType", ""),
-        "bedrooms": property_details.get("beds", ""),
-        "bathrooms": property_details.get("baths", ""),
-        "limit": 10,  # Limit to 10 recent rentals
-        "sort": "listedDate",
-        "order": "desc"  # Most recent first
-    }
+def get_property_value_estimate(property_details):
+    """
+    Get real-time property value estimate from RentCast API.
+    """
+    return fetch_rentcast("value_estimate", property_details)
 
-    # Make the API request
-    try:
-        print(f"DEBUG: Making API request to {url} with params: {params}", 
-              file=sys.stderr)
-        response = requests.get(url, headers=headers, params=params)
-        
-        # Check for API errors
-        if response.status_code != 200:
-            print(f"ERROR: Recent rentals API returned status code {response.status_code}", file=sys.stderr)
-            print(f"Response: {response.text}", file=sys.stderr)
-            return None
-            
-        data = response.json()
-        
-        # Format the response
-        rental_comps = []
-        for listing in data:
-            rental_comp = {
-                "address": listing.get("formattedAddress"),
-                "rent": listing.get("price"),
-                "beds": listing.get("bedrooms"),
-                "baths": listing.get("bathrooms"),
-                "sqft": listing.get("squareFootage"),
-                "yearBuilt": listing.get("yearBuilt"),
-                "propertyType": listing.get("propertyType"),
-                "listedDate": listing.get("listedDate"),
-                "latitude": listing.get("latitude"),
-                "longitude": listing.get("longitude"),
-                "daysOnMarket": listing.get("daysOnMarket")
-            }
-            rental_comps.append(rental_comp)
-        
-        return rental_comps
-    except Exception as e:
-        print(f"ERROR: Error fetching recent rental comps: {e}", file=sys.stderr)
-        return None
+def get_recent_sales_comps(property_details):
+    """
+    Get recent sales comps from RentCast API.
+    """
+    return fetch_rentcast("recent_sales", property_details)
+
+def get_recent_rental_comps(property_details):
+    """
+    Get recent rental comps from RentCast API.
+    """
+    return fetch_rentcast("recent_rentals", property_details)
 
 def get_detailed_market_statistics(property_details):
     """
     Get detailed market statistics from RentCast API.
     """
-    # Check if we have an API key
-    api_key = os.environ.get("RENTCAST_API_KEY")
-    if not api_key:
-        print("Warning: No RentCast API key found. Skipping detailed market statistics.", 
-              file=sys.stderr)
-        return None
-    
-    # Clean the API key
-    api_key = api_key.strip()
+    return fetch_rentcast("detailed_market_stats", property_details)
 
-    # Get the zip code from property details
-    zip_code = property_details.get("zipCode")
-    if not zip_code:
-        print("Warning: No zip code provided. Skipping detailed market statistics.", 
-              file=sys.stderr)
-        return None
+def apply_location(property_details, location_data):
+    """
+    Merge geocoded location data into the property details.
+    Returns False, flagging the property, when geocoding failed.
+    """
+    if not location_data:
+        logger.error("Failed to geocode property address")
+        # Continue with analysis but note the error
+        property_details["geocoding_error"] = True
+        return False
+    property_details.update(location_data)
+    return True
 
-    # Construct the API request
-    url = "https://api.rentcast.io/v1/markets/statistics"
-    headers = {
-        "accept": "application/json",
-        "X-API-KEY": api_key
-    }
-    params = {
-        "zipCode": zip_code,
-        "propertyType": property_details.get("propertyType", ""),
-        "bedrooms": property_details.get("beds", "")
-    }
+# RentCast data sets fetched for every analysis besides comparables and the
+# market summary
+ANALYSIS_FETCHES = (
+    "historical_data", "recent_rentals", "owner_info",
+    "value_estimate", "recent_sales", "detailed_market_stats"
+)
 
-    # Make the API request
-    try:
-        print(f"DEBUG: Making API request to {url} with params: {params}", 
-              file=sys.stderr)
-        response = requests.get(url, headers=headers, params=params)
-        
-        # Check for API errors
-        if response.status_code != 200:
-            print(f"ERROR: Market statistics API returned status code {response.status_code}", file=sys.stderr)
-            print(f"Response: {response.text}", file=sys.stderr)
-            return None
-            
-        data = response.json()
-        print(f"DEBUG: API response: {json.dumps(data, indent=2)}", file=sys.stderr)
-        
-        # Extract key statistics
-        market_stats = {
-            "rentalMarket": {
-                "averageRent": data.get("rentalMarket", {}).get("averageRent"),
-                "medianRent": data.get("rentalMarket", {}).get("medianRent"),
-                "averageDaysOnMarket": data.get("rentalMarket", {}).get("averageDaysOnMarket"),
-                "totalListings": data.get("rentalMarket", {}).get("totalListings"),
-                "rentTrend": data.get("rentalMarket", {}).get("rentTrend"),
-                "rentTrendPercentage": data.get("rentalMarket", {}).get("rentTrendPercentage")
-            },
-            "saleMarket": {
-                "averagePrice": data.get("saleMarket", {}).get("averagePrice"),
-                "medianPrice": data.get("saleMarket", {}).get("medianPrice"),
-                "averageDaysOnMarket": data.get("saleMarket", {}).get("averageDaysOnMarket"),
-                "totalListings": data.get("saleMarket", {}).get("totalListings"),
-                "priceTrend": data.get("saleMarket", {}).get("priceTrend"),
-                "priceTrendPercentage": data.get("saleMarket", {}).get("priceTrendPercentage")
-            },
-            "investmentMetrics": {
-                "averageCapRate": data.get("investmentMetrics", {}).get("averageCapRate"),
-                "medianCapRate": data.get("investmentMetrics", {}).get("medianCapRate"),
-                "averageCashOnCashReturn": data.get("investmentMetrics", {}).get("averageCashOnCashReturn"),
-                "medianCashOnCashReturn": data.get("investmentMetrics", {}).get("medianCashOnCashReturn"),
-                "averageRentToPrice": data.get("investmentMetrics", {}).get("averageRentToPrice"),
-                "medianRentToPrice": data.get("investmentMetrics", {}).get("medianRentToPrice")
-            }
-        }
-        
-        return market_stats
-    except Exception as e:
-        print(f"ERROR: Error fetching detailed market statistics: {e}", file=sys.stderr)
-        return None
+# analysisDepth of a reduced analysis: comparables and the market summary only
+QUICK_DEPTH = "quick"
+
+def _analysis_fetches(property_details):
+    """
+    Return the ANALYSIS_FETCHES data sets to request for the property.
+    A quick analysis requests none of them.
+    """
+    if property_details.get("analysisDepth") == QUICK_DEPTH:
+        return ()
+    return ANALYSIS_FETCHES
+
+def max_provider_calls(property_details):
+    """
+    Return the most provider calls an analysis of the property can make
+    when nothing is cached: geocoding (unless coordinates are supplied),
+    every ring of the comparables search, the Zillow fallback, market data
+    and the ANALYSIS_FETCHES data sets.
+    """
+    zip_code = property_details.get("zip_code") or property_details.get("zipCode")
+    neighbor_count = len(_neighbor_zip_codes(property_details)) if zip_code else zip_reference.MAX_NEIGHBORS
+    geocode = 0 if property_details.get("latitude") and property_details.get("longitude") else 1
+    zillow = 1 if os.environ.get("RAPIDAPI_KEY") else 0
+    comp_searches = 1 + neighbor_count + len(COMP_SEARCH_RADII)
+    return geocode + comp_searches + zillow + 1 + len(_analysis_fetches(property_details))
 
 def analyze_property(property_details):
     """
@@ -912,39 +1169,104 @@ def analyze_property(property_details):
     Returns a comprehensive analysis including rent estimate, comparable properties,
     market trends, and recommendations.
     """
-    # First, geocode the address to get location data
+    # First, resolve the property location
     logger.info("Starting property analysis")
     logger.info(f"Property details: {json.dumps(property_details)}")
     
-    # Geocode the address to get location data
-    location_data = geocode_address(property_details)
-    if not location_data:
-        logger.error("Failed to geocode property address")
-        # Continue with analysis but note the error
-        property_details["geocoding_error"] = True
-    else:
-        logger.info(f"Successfully geocoded property to: {location_data['latitude']}, {location_data['longitude']}")
-        # Make sure the property details include the location data
-        property_details.update(location_data)
+    # Use supplied coordinates, or geocode the address
+    if apply_location(property_details, resolve_location(property_details)):
+        logger.info(f"Resolved property location to: {property_details['latitude']}, {property_details['longitude']} "
+                    f"({property_details.get('locationSource')})")
+    
+    # Find every candidate comparable; the top 5 are shown in the report
+    # while the full set feeds the rent estimator
+    candidates = find_comparable_properties(property_details, limit=None)
+    
+    # Get market summary (precomputed table, live market data only on a miss)
+    summary, market_trends = get_market_summary(property_details)
+    
+    # Get historical rental data, recent rental and sales comps, owner and
+    # value data, and detailed market statistics
+    fetched = {name: fetch_rentcast(name, property_details) for name in _analysis_fetches(property_details)}
     
-    # Find comparable properties
-    comparables = find_comparable_properties(property_details)
-    logger.info(f"Found {len(comparables)} comparable properties")
+    return build_analysis(property_details, candidates, summary, market_trends, fetched)
+
+async def analyze_property_async(property_details):
+    """
+    Asyncio variant of analyze_property() with the same output. After
+    geocoding, every provider call for the property runs concurrently.
+    """
+    logger.info("Starting property analysis")
+    logger.info(f"Property details: {json.dumps(property_details)}")
     
-    # Get market trends data
-    market_trends = get_market_trends(property_details)
+    # Use supplied coordinates, or geocode the address
+    if apply_location(property_details, await resolve_location_async(property_details)):
+        logger.info(f"Resolved property location to: {property_details['latitude']}, {property_details['longitude']} "
+                    f"({property_details.get('locationSource')})")
     
-    # Get historical rental data
-    historical_data = get_historical_rental_data(property_details)
+    names = _analysis_fetches(property_details)
+    candidates, (summary, market_trends), *results = await asyncio.gather(
+        find_comparable_properties_async(property_details, limit=None),
+        get_market_summary_async(property_details),
+        *(fetch_rentcast_async(name, property_details) for name in names)
+    )
+    fetched = dict(zip(names, results))
     
-    # Calculate average rent from comparables
-    if comparables:
-        avg_rent = sum(comp["rent"] for comp in comparables) / len(comparables)
+    return build_analysis(property_details, candidates, summary, market_trends, fetched)
+
+def estimator_comparables(candidates, recent_rentals):
+    """
+    Return the comps that feed the rent estimator: every candidate plus the
+    recent rental comps (dated listings) at other addresses. Mock comps are
+    left out whenever there is real data to estimate from.
+    """
+    real = [comp for comp in candidates if comp.get("source") != "Mock Data"]
+    estimator_comps = real if real or recent_rentals else list(candidates)
+    if recent_rentals:
+        seen_addresses = set(address_key.key(comp.get("address")) for comp in candidates)
+        seen_addresses.discard(None)
+        estimator_comps.extend(
+            rental for rental in recent_rentals
+            if address_key.key(rental.get("address")) not in seen_addresses
+        )
+    return estimator_comps
+
+def build_analysis(property_details, candidates, summary, market_trends, fetched):
+    """
+    Build the analysis from the provider data gathered for a property.
+    `fetched` maps ANALYSIS_FETCHES names to their results.
+    """
+    historical_data = fetched.get("historical_data")
+    recent_rentals = fetched.get("recent_rentals")
+    owner_info = fetched.get("owner_info")
+    value_estimate = fetched.get("value_estimate")
+    recent_sales = fetched.get("recent_sales")
+    detailed_market_stats = fetched.get("detailed_market_stats")
+    
+    comparables = candidates[:5]
+    logger.info(f"Found {len(candidates)} candidate comparables, showing {len(comparables)}")
+    
+    estimator_comps = estimator_comparables(candidates, recent_rentals)
+    
+    # Adjust every comp to the subject with the market's hedonic model
+    hedonic = hedonic_model.load_model(property_details.get("zipCode") or property_details.get("zip_code"))
+    hedonic_model.adjust_comparables(property_details, estimator_comps, hedonic)
+    model_estimate = hedonic_model.predict(hedonic, property_details)
+    
+    # Estimate rent from the weighted, outlier-screened comp set
+    rent_estimate = rent_estimator.estimate_rent(property_details, estimator_comps)
+    if rent_estimate:
+        avg_rent = rent_estimate["weightedMean"]
         
-        # Generate rent range
-        low_rent = round(avg_rent * 0.9, -1)  # 10% below average
-        high_rent = round(avg_rent * 1.1, -1)  # 10% above average
-        median_rent = round(avg_rent, -1)  # Average, rounded to nearest 10
+        # Generate rent range from the weighted median and its bootstrap interval
+        low_rent = round(rent_estimate["low"], -1)
+        high_rent = round(rent_estimate["high"], -1)
+        median_rent = round(rent_estimate["median"], -1)
+        logger.info(
+            f"Rent estimate from {rent_estimate['compsUsed']} of {rent_estimate['compsConsidered']} comps "
+            f"({rent_estimate['outliersRejected']} outliers rejected): "
+            f"{low_rent} / {median_rent} / {high_rent}"
+        )
     else:
         logger.warning("No comparable properties found, using default rent values")
         # Default values if no comparables are found
@@ -998,24 +1320,23 @@ def analyze_property(property_details):
     
     # Add market trends information if available
     market_insights = []
-    if market_trends and "rentalData" in market_trends:
-        rental_data = market_trends["rentalData"]
+    if summary:
         market_insights.append(
             f"The average rent in {property_details.get('zipCode', 'your area')} "
-            f"is ${rental_data.get('averageRent', 0):,} with a median of "
-            f"${rental_data.get('medianRent', 0):,}."
+            f"is ${summary['average_rent'] or 0:,.0f} with a median of "
+            f"${summary['median_rent'] or 0:,.0f}."
         )
         
         # Add days on market info
-        avg_days = rental_data.get("averageDaysOnMarket")
+        avg_days = summary["average_days_on_market"]
         if avg_days:
             market_insights.append(
-                f"Properties in this area stay on the market for an average of {avg_days} days."
+                f"Properties in this area stay on the market for an average of {avg_days:g} days."
             )
         
         # Add info about rental inventory
-        new_listings = rental_data.get("newListings")
-        total_listings = rental_data.get("totalListings")
+        new_listings = summary["new_listings"]
+        total_listings = summary["total_listings"]
         if new_listings and total_listings:
             market_insights.append(
                 f"There are currently {total_listings} rental listings in this area, "
@@ -1023,21 +1344,20 @@ def analyze_property(property_details):
             )
         
         # Add historical trend information
-        if "history" in rental_data:
-            history = rental_data["history"]
-            months = sorted(history.keys())
-            if len(months) >= 2:
-                oldest = history[months[0]]
-                newest = history[months[-1]]
-                if "averageRent" in oldest and "averageRent" in newest:
-                    old_rent = oldest["averageRent"]
-                    new_rent = newest["averageRent"]
-                    change = ((new_rent - old_rent) / old_rent) * 100
-                    direction = "increased" if change > 0 else "decreased"
-                    market_insights.append(
-                        f"Rents have {direction} by {abs(change):.1f}% over the past "
-                        f"{len(months)} months in this area."
-                    )
+        change = summary["history_change"]
+        if change is not None:
+            direction = "increased" if change > 0 else "decreased"
+            market_insights.append(
+                f"Rents have {direction} by {abs(change):.1f}% over the past "
+                f"{summary['history_months']} months in this area."
+            )
+        
+        trend_3m = summary["trend_3m"]
+        if trend_3m is not None and summary["history_months"] > 3:
+            direction = "up" if trend_3m > 0 else "down"
+            market_insights.append(
+                f"Over the last 3 months rents are {direction} {abs(trend_3m):.1f}%."
+            )
     
     # Add historical property data if available
     if historical_data:
@@ -1059,9 +1379,8 @@ def analyze_property(property_details):
     ]
     
     # Add market-based recommendations
-    if market_trends and "rentalData" in market_trends:
-        rental_data = market_trends["rentalData"]
-        avg_days = rental_data.get("averageDaysOnMarket", 0)
+    if summary:
+        avg_days = summary["average_days_on_market"] or 0
         
         if avg_days > 60:
             recommendations.append(
@@ -1131,21 +1450,6 @@ def analyze_property(property_details):
             "address": property_details.get("address", "")
         }
     
-    # Get property owner information
-    owner_info = get_property_owner_info(property_details)
-    
-    # Get property value estimate
-    value_estimate = get_property_value_estimate(property_details)
-    
-    # Get recent sales comps
-    recent_sales = get_recent_sales_comps(property_details)
-    
-    # Get recent rental comps
-    recent_rentals = get_recent_rental_comps(property_details)
-    
-    # Get detailed market statistics
-    detailed_market_stats = get_detailed_market_statistics(property_details)
-    
     # Create the analysis result
     analysis = {
         "rentRange": {
@@ -1153,6 +1457,18 @@ def analyze_property(property_details):
             "median": int(median_rent),
             "high": int(high_rent)
         },
+        "rentEstimate": {
+            "method": "weighted-median",
+            "weightedMean": round(rent_estimate["weightedMean"], 2),
+            "huberLocation": round(rent_estimate["huberLocation"], 2),
+            "confidenceLevel": rent_estimate["confidenceLevel"],
+            "compsConsidered": rent_estimate["compsConsidered"],
+            "compsUsed": rent_estimate["compsUsed"],
+            "outliersRejected": rent_estimate["outliersRejected"],
+            "effectiveSampleSize": rent_estimate["effectiveSampleSize"],
+            "modelEstimate": round(model_estimate, -1),
+            "hedonicModel": {"market": hedonic.market, "samples": hedonic.samples}
+        } if rent_estimate else {"method": "default"},
         "influencingFactors": influencing_factors,
         "marketComparison": market_comparison,
         "marketInsights": market_insights,
@@ -1183,7 +1499,23 @@ def analyze_property(property_details):
     if street_view_data:
         analysis["streetViewData"] = street_view_data
     
-    # Add market trends data if available
+    # Add market summary data if available (and the raw trends on a live fetch)
+    if summary:
+        analysis["marketSummary"] = {
+            "zipCode": summary["zip_code"],
+            "bedrooms": summary["bedrooms"] or None,
+            "propertyType": summary["property_type"] or None,
+            "medianRent": summary["median_rent"],
+            "averageRent": summary["average_rent"],
+            "averageDaysOnMarket": summary["average_days_on_market"],
+            "totalListings": summary["total_listings"],
+            "newListings": summary["new_listings"],
+            "trend3Months": summary["trend_3m"],
+            "trend6Months": summary["trend_6m"],
+            "trend12Months": summary["trend_12m"],
+            "refreshedAt": datetime.fromtimestamp(summary["refreshed_at"]).isoformat()
+        }
+    
     if market_trends:
         analysis["marketTrends"] = market_trends
     
@@ -1207,17 +1539,20 @@ def analyze_property(property_details):
     if detailed_market_stats:
         analysis["detailedMarketStats"] = detailed_market_stats
     
+    if property_details.get("analysisDepth") == QUICK_DEPTH:
+        analysis["analysisDepth"] = QUICK_DEPTH
+    
     return analysis
 
-def geocode_address(property_details):
+def _geocode_request(property_details):
     """
-    Geocode the property address to get latitude and longitude coordinates.
-    Also extracts city, state, and other location data.
+    Build the Google geocoding request for the property address.
+    Returns (location_data, request): the location data the input already
+    provides, and None instead of a request when geocoding is not possible.
     """
     address = property_details.get("address", "")
     zip_code = property_details.get("zipCode", "")
     city = property_details.get("city", "")
-    unit = property_details.get("unit", "")
     
     # If we already have city in the input, use it
     location_data = {
@@ -1230,16 +1565,10 @@ def geocode_address(property_details):
     
     if not address:
         logger.error("No address provided for geocoding")
-        return location_data
+        return location_data, None
     
-    # Combine address components
-    full_address = address
-    if unit:
-        full_address += f" {unit}"
-    if city:
-        full_address += f", {city}"
-    if zip_code and zip_code not in full_address:
-        full_address += f", {zip_code}"
+    # Combine address components into one canonical line
+    full_address = address_key.property_address(property_details)
     
     logger.info(f"Geocoding address: {full_address}")
     
@@ -1247,105 +1576,471 @@ def geocode_address(property_details):
     api_key = os.environ.get("NEXT_PUBLIC_GOOGLE_MAPS_API_KEY")
     if not api_key:
         logger.error("No Google Maps API key found in environment variables")
-        return location_data
+        return location_data, None
     
-    try:
-        # Prepare the API request
-        url = "https://maps.googleapis.com/maps/api/geocode/json"
-        params = {
-            "address": full_address,
-            "key": api_key
-        }
-        
-        # Make the API request
-        geocode_response = requests.get(url, params=params)
-        
-        # Check if the request was successful
-        if geocode_response.status_code == 200:
-            geocode_data = geocode_response.json()
-            
-            # Check if we got results
-            if geocode_data["status"] == "OK" and geocode_data["results"]:
-                # Extract the location data
-                location = geocode_data["results"][0]["geometry"]["location"]
-                latitude = location["lat"]
-                longitude = location["lng"]
-                
-                # Extract address components
-                address_components = geocode_data["results"][0].get("address_components", [])
-                location_data = {
-                    "latitude": latitude,
-                    "longitude": longitude,
-                    "formatted_address": geocode_data["results"][0].get("formatted_address", ""),
-                    "city": city,  # Use the provided city if available
-                    "zip_code": zip_code  # Use the provided zip code if available
-                }
-                
-                # Extract city, state, zip, etc. from geocoding results if not already provided
-                for component in address_components:
-                    types = component.get("types", [])
-                    if "locality" in types and not location_data.get("city"):
-                        location_data["city"] = component.get("long_name")
-                    elif "administrative_area_level_1" in types:
-                        location_data["state"] = component.get("short_name")
-                    elif "postal_code" in types and not location_data.get("zip_code"):
-                        location_data["zip_code"] = component.get("long_name")
-                    elif "neighborhood" in types:
-                        location_data["neighborhood"] = component.get("long_name")
-                    elif "route" in types:
-                        location_data["street"] = component.get("long_name")
-                    elif "street_number" in types:
-                        location_data["street_number"] = component.get("long_name")
-                
-                logger.info(f"Successfully geocoded address to: {latitude}, {longitude}")
-                logger.debug(f"Location data: {json.dumps(location_data)}")
-                
-                return location_data
-            else:
-                logger.error(f"No geocoding results found for address: {full_address}")
-                logger.error(f"Geocoding status: {geocode_data['status']}")
-                
-                # Handle specific error cases
-                if geocode_data["status"] == "REQUEST_DENIED":
-                    error_message = geocode_data.get("error_message", "")
-                    if "not authorized" in error_message.lower():
-                        logger.error("Google Maps API key is not authorized for the Geocoding API. Please enable it in the Google Cloud Console.")
-                    else:
-                        logger.error("Google Maps API key is invalid or has insufficient permissions")
-                elif geocode_data["status"] == "ZERO_RESULTS":
-                    logger.error("No results found for the address. Check if the address is valid.")
-                elif geocode_data["status"] == "OVER_QUERY_LIMIT":
-                    logger.error("Google Maps API query limit exceeded")
-                
-                # Return the basic location data we have
-                return location_data
+    # Prepare the API request
+    url = "https://maps.googleapis.com/maps/api/geocode/json"
+    params = {
+        "address": full_address,
+        "key": api_key
+    }
+    return location_data, ProviderRequest(url, None, params)
+
+def _parse_geocode(geocode_response, property_details, location_data, full_address):
+    """
+    Extract location data from a geocoding response, falling back to the
+    location data the input already provides.
+    """
+    city = property_details.get("city", "")
+    zip_code = property_details.get("zipCode", "")
+    
+    # Check if the request was successful
+    if geocode_response.status_code == 200:
+        geocode_data = json_backend.response_json(geocode_response)
+
+        # Check if we got results
+        if geocode_data["status"] == "OK" and geocode_data["results"]:
+            # Extract the location data
+            location = geocode_data["results"][0]["geometry"]["location"]
+            latitude = location["lat"]
+            longitude = location["lng"]
+
+            # Extract address components
+            address_components = geocode_data["results"][0].get("address_components", [])
+            location_data = {
+                "latitude": latitude,
+                "longitude": longitude,
+                "formatted_address": geocode_data["results"][0].get("formatted_address", ""),
+                "city": city,  # Use the provided city if available
+                "zip_code": zip_code  # Use the provided zip code if available
+            }
+
+            # Extract city, state, zip, etc. from geocoding results if not already provided
+            for component in address_components:
+                types = component.get("types", [])
+                if "locality" in types and not location_data.get("city"):
+                    location_data["city"] = component.get("long_name")
+                elif "administrative_area_level_1" in types:
+                    location_data["state"] = component.get("short_name")
+                elif "postal_code" in types and not location_data.get("zip_code"):
+                    location_data["zip_code"] = component.get("long_name")
+                elif "neighborhood" in types:
+                    location_data["neighborhood"] = component.get("long_name")
+                elif "route" in types:
+                    location_data["street"] = component.get("long_name")
+                elif "street_number" in types:
+                    location_data["street_number"] = component.get("long_name")
+
+            logger.info(f"Successfully geocoded address to: {latitude}, {longitude}")
+            logger.debug(f"Location data: {json.dumps(location_data)}")
+
+            return location_data
         else:
-            logger.error(f"Geocoding failed with status code: {geocode_response.status_code}")
-            logger.error(f"Response: {geocode_response.text}")
+            logger.error(f"No geocoding results found for address: {full_address}")
+            logger.error(f"Geocoding status: {geocode_data['status']}")
+
+            # Handle specific error cases
+            if geocode_data["status"] == "REQUEST_DENIED":
+                error_message = geocode_data.get("error_message", "")
+                if "not authorized" in error_message.lower():
+                    logger.error("Google Maps API key is not authorized for the Geocoding API. Please enable it in the Google Cloud Console.")
+                else:
+                    logger.error("Google Maps API key is invalid or has insufficient permissions")
+            elif geocode_data["status"] == "ZERO_RESULTS":
+                logger.error("No results found for the address. Check if the address is valid.")
+            elif geocode_data["status"] == "OVER_QUERY_LIMIT":
+                logger.error("Google Maps API query limit exceeded")
+
             # Return the basic location data we have
             return location_data
+    else:
+        logger.error(f"Geocoding failed with status code: {geocode_response.status_code}")
+        logger.error(f"Response: {geocode_response.text}")
+        # Return the basic location data we have
+        return location_data
+
+def geocode_address(property_details):
+    """
+    Geocode the property address to get latitude and longitude coordinates.
+    Also extracts city, state, and other location data.
+    """
+    location_data, request = _geocode_request(property_details)
+    if request is None:
+        return location_data
+    
+    try:
+        # Make the API request
+        geocode_response = send_request(request)
+        return _parse_geocode(geocode_response, property_details, location_data, request.params["address"])
+    except Exception as e:
+        logger.exception(f"Exception during geocoding: {str(e)}")
+        # Return the basic location data we have
+        return location_data
+
+async def geocode_address_async(property_details):
+    """
+    Asyncio variant of geocode_address().
+    """
+    location_data, request = _geocode_request(property_details)
+    if request is None:
+        return location_data
+    
+    try:
+        geocode_response = await send_request_async(request)
+        return _parse_geocode(geocode_response, property_details, location_data, request.params["address"])
     except Exception as e:
         logger.exception(f"Exception during geocoding: {str(e)}")
         # Return the basic location data we have
         return location_data
 
+def _coordinate(value, limit):
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if -limit <= number <= limit else None
+
+def supplied_coordinates(property_details):
+    """
+    Return the (latitude, longitude) carried by the input, or None when
+    they are missing or unusable.
+    """
+    latitude = _coordinate(property_details.get("latitude"), 90)
+    longitude = _coordinate(property_details.get("longitude"), 180)
+    if latitude is None or longitude is None or (latitude == 0 and longitude == 0):
+        return None
+    return latitude, longitude
+
+def _fill_from_reference(location_data, coordinates=None):
+    """
+    Fill a missing ZIP code, city, state and county from the local ZIP
+    reference: the record of the known ZIP code, or else the ZIP nearest
+    to the coordinates.
+    """
+    record = zip_reference.lookup(location_data.get("zip_code"))
+    if record is None and coordinates:
+        found = zip_reference.nearest(*coordinates)
+        record = found[0] if found else None
+    if record is None:
+        return location_data
+    
+    for key, value in (("zip_code", record.zip_code), ("city", record.city),
+                       ("state", record.state), ("county", record.county)):
+        if value and not location_data.get(key):
+            location_data[key] = value
+    return location_data
+
+def _local_location(property_details):
+    """
+    Location data built without any network call from coordinates in the
+    input, or None when the input has no usable coordinates.
+    """
+    coordinates = supplied_coordinates(property_details)
+    if not coordinates:
+        return None
+    
+    location_data = {
+        "latitude": coordinates[0],
+        "longitude": coordinates[1],
+        "city": property_details.get("city", ""),
+        "zip_code": property_details.get("zipCode") or property_details.get("zip_code") or "",
+        "state": property_details.get("state", ""),
+        "locationSource": "input"
+    }
+    return _fill_from_reference(location_data, coordinates)
+
+def _complete_geocoded_location(property_details, location_data):
+    """
+    Fill in what geocoding left out from the ZIP reference. When geocoding
+    produced no coordinates, the ZIP code centroid stands in for them.
+    """
+    coordinates = supplied_coordinates(location_data)
+    if coordinates:
+        location_data["locationSource"] = "google"
+    _fill_from_reference(location_data, coordinates)
+    
+    record = zip_reference.lookup(location_data.get("zip_code"))
+    if not coordinates and record and record.latitude is not None:
+        logger.warning(f"Using the centroid of ZIP code {record.zip_code} as the property location")
+        location_data["latitude"] = record.latitude
+        location_data["longitude"] = record.longitude
+        location_data["locationSource"] = "zip-centroid"
+    return _with_zip_code(property_details, location_data)
+
+def _with_zip_code(property_details, location_data):
+    # The RentCast fetchers key on zipCode, so fill it when the input lacks one
+    if not property_details.get("zipCode") and location_data.get("zip_code"):
+        location_data["zipCode"] = location_data["zip_code"]
+    return location_data
+
+def resolve_location(property_details):
+    """
+    Work out the property's coordinates, city, state and ZIP code.
+    Coordinates supplied with the input (e.g. from Google Places in the UI)
+    are trusted and the rest is filled from the local ZIP reference; the
+    address is only geocoded when the input has no usable coordinates.
+    """
+    location_data = _local_location(property_details)
+    if location_data:
+        logger.info("Using the coordinates supplied with the property; skipping geocoding")
+        return _with_zip_code(property_details, location_data)
+    return _complete_geocoded_location(property_details, geocode_address(property_details))
+
+async def resolve_location_async(property_details):
+    """
+    Asyncio variant of resolve_location().
+    """
+    location_data = _local_location(property_details)
+    if location_data:
+        logger.info("Using the coordinates supplied with the property; skipping geocoding")
+        return _with_zip_code(property_details, location_data)
+    return _complete_geocoded_location(property_details, await geocode_address_async(property_details))
+
+def _cached_analysis(property_details):
+    """
+    Look the input up in the result cache.
+    Returns (fingerprint, use_cache, cached analysis or None).
+    """
+    use_cache = analysis_cache.is_enabled() and not property_details.get("skipCache")
+    fingerprint = analysis_cache.property_fingerprint(property_details)
+    max_age = analysis_cache.max_age_seconds(property_details.get("maxCacheAgeSeconds"))
+    
+    if use_cache and not property_details.get("refreshCache"):
+        started = time.perf_counter()
+        cached = analysis_cache.get(fingerprint, max_age)
+        if cached:
+            analysis, age = cached
+            logger.info(
+                f"Serving cached analysis {fingerprint[:12]} "
+                f"(age {age:.0f}s, lookup {(time.perf_counter() - started) * 1000:.1f}ms)"
+            )
+            analysis["cache"] = {
+                "hit": True,
+                "fingerprint": fingerprint,
+                "ageSeconds": round(age, 1),
+                "cachedAt": datetime.fromtimestamp(time.time() - age).isoformat()
+            }
+            return fingerprint, use_cache, analysis
+    return fingerprint, use_cache, None
+
+def _store_analysis(fingerprint, use_cache, analysis):
+    """
+    Cache a freshly computed analysis and mark it as a cache miss.
+    Quick analyses are not cached, so they never stand in for a full one.
+    """
+    if use_cache and analysis.get("analysisDepth") != QUICK_DEPTH:
+        analysis_cache.put(fingerprint, analysis)
+    
+    analysis["cache"] = {
+        "hit": False,
+        "fingerprint": fingerprint,
+        "ageSeconds": 0,
+        "cachedAt": None
+    }
+    return analysis
+
+def get_analysis(property_details):
+    """
+    Return the analysis for a property, serving it from the result cache when
+    an identical input was analyzed recently.
+
+    Input flags:
+        skipCache            bypass the cache entirely
+        refreshCache         recompute and overwrite any cached result
+        maxCacheAgeSeconds   only accept a cached result younger than this
+        analysisDepth        "quick" for comparables and the market summary
+                             only (not cached)
+        profile              write a cProfile and tracemalloc profile of the
+                             request to logs/profiles (see profiling.py)
+    """
+    with profiling.profiled(property_details):
+        fingerprint, use_cache, cached = _cached_analysis(property_details)
+        if cached:
+            return cached
+        return _store_analysis(fingerprint, use_cache, analyze_property(property_details))
+
+async def get_analysis_async(property_details):
+    """
+    Asyncio variant of get_analysis().
+    """
+    with profiling.profiled(property_details):
+        fingerprint, use_cache, cached = _cached_analysis(property_details)
+        if cached:
+            return cached
+        return _store_analysis(fingerprint, use_cache, await analyze_property_async(property_details))
+
+def degraded_analysis(property_details, overload):
+    """
+    Answer a request that admission control shed: serve any cached analysis
+    within the cache TTL, even one the request asked to refresh or found too
+    old, else a quick analysis in one of the bounded quick slots unless
+    ADMISSION_DEGRADED_QUICK=0. Raises the Overloaded error when neither is
+    possible.
+    """
+    logger.warning(f"Overloaded ({overload.reason}); answering in degraded mode")
+    relaxed = dict(property_details)
+    relaxed.pop("refreshCache", None)
+    relaxed.pop("maxCacheAgeSeconds", None)
+    fingerprint, use_cache, analysis = _cached_analysis(relaxed)
+    served = "cached"
+    if not analysis:
+        if not env_flag("ADMISSION_DEGRADED_QUICK", True):
+            raise overload
+        with admission.quick_admitted(overload):
+            analysis = analyze_property(dict(property_details, analysisDepth=QUICK_DEPTH))
+        analysis = _store_analysis(fingerprint, use_cache, analysis)
+        served = QUICK_DEPTH
+    analysis["degraded"] = {
+        "reason": overload.reason,
+        "served": served,
+        "retryAfterSeconds": round(overload.retry_after, 1)
+    }
+    return analysis
+
+def get_admitted_analysis(property_details):
+    """
+    get_analysis() behind admission control: a cache hit is served at once,
+    a new analysis waits for a slot, and a request that is shed gets
+    degraded_analysis(). `deadlineSeconds` in the input caps the wait.
+    """
+    deadline = admission.deadline_seconds(property_details.get("deadlineSeconds"))
+    with profiling.profiled(property_details):
+        fingerprint, use_cache, cached = _cached_analysis(property_details)
+        if cached:
+            return cached
+        try:
+            with admission.admitted(deadline):
+                return _store_analysis(fingerprint, use_cache, analyze_property(property_details))
+        except admission.Overloaded as overload:
+            return degraded_analysis(property_details, overload)
+
+def analyze_batch(properties):
+    """
+    Analyze a list of properties, e.g. a portfolio re-pricing run.
+    Results come back in input order; a failure is reported for that property
+    instead of aborting the batch. Properties sent with persist=true and a
+    reportId are written back to the database in grouped transactions; a
+    result that could not be written carries persistError.
+    """
+    writer = analysis_store.AnalysisWriter()
+    results = []
+    
+    for property_details in properties:
+        try:
+            analysis = get_analysis(property_details)
+        except Exception as e:
+            logger.exception(f"Analysis failed for {property_details.get('address')}: {str(e)}")
+            results.append({"error": str(e), "status": "error"})
+            continue
+        
+        if property_details.get("persist") and property_details.get("reportId"):
+            writer.add(property_details["reportId"], analysis)
+        results.append(analysis)
+    
+    writer.flush()
+    _annotate_persisted(writer, properties, results)
+    return results
+
+def _annotate_persisted(writer, properties, results):
+    """
+    Mark the batch results whose report could not be written.
+    """
+    for property_details, analysis in zip(properties, results):
+        if property_details.get("persist") and property_details.get("reportId"):
+            writer.annotate(property_details["reportId"], analysis)
+
+async def analyze_batch_async(properties):
+    """
+    Asyncio variant of analyze_batch(): up to ENGINE_ASYNC_CONCURRENCY
+    (default 100) analyses share one event loop and connection pool.
+    """
+    slots = asyncio.Semaphore(max(env_int("ENGINE_ASYNC_CONCURRENCY", 100), 1))
+    
+    async def run(property_details):
+        async with slots:
+            try:
+                return await get_analysis_async(property_details)
+            except Exception as e:
+                logger.exception(f"Analysis failed for {property_details.get('address')}: {str(e)}")
+                return {"error": str(e), "status": "error"}
+    
+    try:
+        results = await asyncio.gather(*(run(property_details) for property_details in properties))
+    finally:
+        await provider_client.close_async_session()
+    
+    writer = analysis_store.AnalysisWriter()
+    for property_details, analysis in zip(properties, results):
+        if analysis.get("status") == "error":
+            continue
+        if property_details.get("persist") and property_details.get("reportId"):
+            writer.add(property_details["reportId"], analysis)
+    writer.flush()
+    _annotate_persisted(writer, properties, results)
+    return results
+
 def main():
     """
     Main function to process input and return analysis.
+    Accepts a single property object or a list of properties (batch mode).
     """
     try:
         # Read input from stdin or command line argument
         if len(sys.argv) > 1:
-            property_data = json.loads(sys.argv[1])
+            property_data = json_backend.loads(sys.argv[1])
         else:
-            property_data = json.loads(sys.stdin.read())
+            property_data = json_backend.loads(sys.stdin.buffer.read())
+        
+        if isinstance(property_data, list):
+            # Batches yield provider quota and CPU to interactive analyses
+            if not os.environ.get("ENGINE_LANE"):
+                lane_scheduler.set_lane(lane_scheduler.BULK)
+            lane_scheduler.apply_cpu_priority()
+            if env_flag("ENGINE_ASYNC"):
+                results = asyncio.run(analyze_batch_async(property_data))
+            else:
+                results = analyze_batch(property_data)
+            json_backend.write(projection.shape_batch(results, property_data), sys.stdout.buffer)
+            return
+        
+        if property_data.get("lane") in lane_scheduler.LANES:
+            lane_scheduler.set_lane(property_data["lane"])
+        lane_scheduler.apply_cpu_priority()
         
-        # Analyze the property
-        analysis = analyze_property(property_data)
+        # Evaluate hypothetical variants of the property over one comp set
+        if property_data.get("whatIf"):
+            import what_if
+            deadline = admission.deadline_seconds(property_data.get("deadlineSeconds"))
+            with admission.admitted(deadline), profiling.profiled(property_data):
+                result = what_if.analyze_what_if(property_data)
+            json_backend.write(result, sys.stdout.buffer)
+            return
         
-        # Print the result as JSON
-        print(json.dumps(analysis))
+        # Reject an invalid projection before doing the work
+        if property_data.get("fields"):
+            projection.parse_fields(property_data["fields"])
         
+        # Analyze the property (or reuse a cached analysis of the same input)
+        analysis = get_admitted_analysis(property_data)
+        
+        # Write the result back to its report when asked to
+        if property_data.get("persist") and property_data.get("reportId"):
+            writer = analysis_store.AnalysisWriter()
+            writer.add(property_data["reportId"], analysis)
+            writer.flush()
+            writer.annotate(property_data["reportId"], analysis)
+        
+        # Print the result as JSON, with only the fields the caller asked for
+        json_backend.write(projection.shape(analysis, property_data), sys.stdout.buffer)
+        
+    except admission.Overloaded as overload:
+        # Shed with nothing to serve: tell the caller when to come back
+        overload_response = {
+            "error": f"Overloaded: {overload.reason}",
+            "status": "overloaded",
+            "retryAfterSeconds": round(overload.retry_after, 1)
+        }
+        print(json.dumps(overload_response))
     except Exception as e:
         error_response = {
             "error": str(e),
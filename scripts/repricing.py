@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Incremental re-pricing of a saved portfolio.
+
+A nightly re-pricing run used to analyze every property again. This job
+remembers, per property, what its last price was computed from:
+
+    input     the analysis cache fingerprint of the property input
+    market    market_summary.data_version() of its ZIP, after refreshing
+              the ZIP's market data from the provider
+    listings  a digest of the RentCast search in its ZIP for its bedrooms,
+              bathrooms and property type (the first comparables ring)
+
+and only re-analyzes a property when one of those changed, when it has
+never been priced, or when its price is older than REPRICING_MAX_AGE_DAYS.
+Checking costs one market call per ZIP and one search per distinct
+ZIP/bedrooms/bathrooms/type combination, so a night's provider calls grow
+with the number of markets and with what changed, not with the portfolio.
+Re-analyses run on the analysis pool with refreshCache, so no cached
+result from before the change is reused.
+
+Both probes bypass the shared and HTTP caches, which keep market data for up
+to a day and listings for hours, so a change is seen on the next run. The
+fresh responses are written back to the caches, where the re-analyses
+find them.
+
+The output lists every property whose rent range moved, with the old and
+new range and the change of the median.
+
+State is kept in <cache dir>/repricing.sqlite (REPRICING_PATH).
+
+Usage:
+    python scripts/repricing.py run [--workers N] [--force] [--persist] < portfolio.json
+    python scripts/repricing.py run --reports [--workers N] [--force] [--persist]
+    python scripts/repricing.py status
+
+Input is a JSON array or JSON lines of property objects, or with --reports
+every PropertyReport that is not archived. Properties are identified by
+reportId when they have one, otherwise by address. --persist writes new
+results back to their reports and adds the number written and the reports
+that could not be written (persistFailed) to the output.
+"""
+import os
+import sys
+import json
+import time
+import hashlib
+import sqlite3
+import logging
+
+import address_key
+import analysis_cache
+import analysis_pool
+import analysis_store
+import engine_db
+import market_summary
+from engine_settings import cache_dir, env_int
+
+logger = logging.getLogger('rentcast_agent.repricing')
+
+_RANGE_KEYS = ("low", "median", "high")
+
+
+def state_path():
+    """
+    Return the path of the re-pricing state file.
+    """
+    return os.environ.get("REPRICING_PATH") or os.path.join(cache_dir(), 'repricing.sqlite')
+
+
+def _connect():
+    conn = sqlite3.connect(state_path(), timeout=10)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS repricing_state ("
+        " property_id TEXT PRIMARY KEY,"
+        " address TEXT NOT NULL,"
+        " input_fingerprint TEXT NOT NULL,"
+        " zip_code TEXT,"
+        " market_version TEXT,"
+        " listings_version TEXT,"
+        " rent_low REAL, rent_median REAL, rent_high REAL,"
+        " priced_at REAL NOT NULL)"
+    )
+    return conn
+
+
+def property_id(property_details):
+    """
+    Return the identity a property's state is kept under.
+    """
+    if property_details.get("reportId"):
+        return f"report:{property_details['reportId']}"
+    return f"address:{address_key.property_key(property_details)}"
+
+
+def _digest(payload):
+    if payload is None:
+        return None
+    encoded = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(encoded.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _rent_range(analysis):
+    rent_range = analysis.get("rentRange") or {}
+    return {key: rent_range.get(key) for key in _RANGE_KEYS}
+
+
+def _with_zip_code(property_details, stored):
+    """
+    Return the property input with a ZIP code: its own, the one found on
+    its last run, or a geocoded one.
+    """
+    import rentcast_agent
+
+    if property_details.get("zipCode"):
+        return property_details
+    if stored and stored["zip_code"]:
+        return dict(property_details, zipCode=stored["zip_code"])
+    located = dict(property_details)
+    rentcast_agent.apply_location(located, rentcast_agent.resolve_location(located))
+    return located
+
+
+def _market_version(zip_code, versions):
+    if zip_code not in versions:
+        market_summary.refresh([zip_code])
+        versions[zip_code] = market_summary.data_version(zip_code)
+    return versions[zip_code]
+
+
+def _listings_version(property_details, versions):
+    import rentcast_agent
+
+    combination = tuple(str(property_details.get(key) or "") for key in ("zipCode", "beds", "baths", "propertyType"))
+    if combination not in versions:
+        try:
+            versions[combination] = _digest(rentcast_agent.subject_zip_listings(property_details, fresh=True))
+        except Exception as e:
+            logger.warning(f"Could not fetch listings for {combination[0]}: {str(e)}")
+            versions[combination] = None
+    return versions[combination]
+
+
+def load_state(ids):
+    """
+    Return the stored state of the given property ids, by id.
+    """
+    columns = ("property_id", "address", "input_fingerprint", "zip_code", "market_version",
+               "listings_version", "rent_low", "rent_median", "rent_high", "priced_at")
+    state = {}
+    conn = _connect()
+    try:
+        ids = list(ids)
+        for start in range(0, len(ids), 500):
+            chunk = ids[start:start + 500]
+            for row in conn.execute(
+                f"SELECT {', '.join(columns)} FROM repricing_state "
+                f"WHERE property_id IN ({','.join('?' * len(chunk))})",
+                chunk
+            ):
+                state[row[0]] = dict(zip(columns, row))
+    finally:
+        conn.close()
+    return state
+
+
+def _save_state(rows):
+    conn = _connect()
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO repricing_state (property_id, address, input_fingerprint, zip_code, "
+                "market_version, listings_version, rent_low, rent_median, rent_high, priced_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+    finally:
+        conn.close()
+
+
+def plan(properties, force=False):
+    """
+    Work out which properties need re-pricing. Returns a list of
+    (property_details, tracking, reason) with reason None for properties
+    that are up to date; tracking is what their state will record.
+    """
+    ids = [property_id(property_details) for property_details in properties]
+    state = load_state(ids)
+    max_age = env_int("REPRICING_MAX_AGE_DAYS", 30) * 24 * 60 * 60
+    now = time.time()
+    market_versions, listing_versions = {}, {}
+
+    planned = []
+    for identifier, property_details in zip(ids, properties):
+        stored = state.get(identifier)
+        located = _with_zip_code(property_details, stored)
+        zip_code = str(located.get("zipCode") or "")[:5] or None
+        tracking = {
+            "id": identifier,
+            "address": str(property_details.get("address") or ""),
+            "fingerprint": analysis_cache.property_fingerprint(property_details),
+            "zipCode": zip_code,
+            "market": _market_version(zip_code, market_versions) if zip_code else None,
+            "listings": _listings_version(located, listing_versions) if zip_code else None,
+        }
+        if force:
+            reason = "forced"
+        elif not stored:
+            reason = "new"
+        elif stored["input_fingerprint"] != tracking["fingerprint"]:
+            reason = "input changed"
+        elif stored["market_version"] != tracking["market"]:
+            reason = "market data changed"
+        elif stored["listings_version"] != tracking["listings"]:
+            reason = "listings changed"
+        elif now - stored["priced_at"] > max_age:
+            reason = "expired"
+        else:
+            reason = None
+        planned.append((property_details, tracking, reason))
+    logger.info(
+        f"Re-pricing check: {len(properties)} properties, {len(market_versions)} ZIPs, "
+        f"{len(listing_versions)} listing searches"
+    )
+    return planned
+
+
+def _change(before, after):
+    """
+    Describe how a rent range moved, or None when it did not.
+    """
+    if before == after:
+        return None
+    change = {"before": before, "after": after}
+    if before and before.get("median") and after.get("median") is not None:
+        change["medianChange"] = round(after["median"] - before["median"], 2)
+        change["medianChangePercent"] = round((after["median"] - before["median"]) / before["median"] * 100, 2)
+    return change
+
+
+def reprice(properties, workers=None, force=False, persist=False):
+    """
+    Re-price the properties that need it. Returns a summary with the rent
+    range changes.
+    """
+    properties = list(properties)
+    planned = plan(properties, force)
+    state = load_state(tracking["id"] for _, tracking, _ in planned)
+    pending = [entry for entry in planned if entry[2]]
+
+    summary = {
+        "checked": len(planned),
+        "recomputed": 0,
+        "unchanged": len(planned) - len(pending),
+        "failed": 0,
+        "changes": []
+    }
+    if persist:
+        summary["persisted"] = 0
+        summary["persistFailed"] = []
+    writer = analysis_store.AnalysisWriter() if persist else None
+    rows = []
+    inputs = [dict(property_details, refreshCache=True) for property_details, _, _ in pending]
+    for index, analysis in analysis_pool.run_pool(inputs, workers):
+        property_details, tracking, reason = pending[index]
+        if analysis.get("status") == "error":
+            summary["failed"] += 1
+            continue
+        summary["recomputed"] += 1
+
+        after = _rent_range(analysis)
+        stored = state.get(tracking["id"])
+        before = {key: stored[f"rent_{key}"] for key in _RANGE_KEYS} if stored else None
+        change = _change(before, after)
+        if change:
+            summary["changes"].append(dict(
+                {"id": tracking["id"], "address": tracking["address"], "reason": reason}, **change
+            ))
+        rows.append((
+            tracking["id"], tracking["address"], tracking["fingerprint"], tracking["zipCode"],
+            tracking["market"], tracking["listings"], after["low"], after["median"], after["high"], time.time()
+        ))
+        if writer and property_details.get("reportId"):
+            writer.add(property_details["reportId"], analysis)
+
+    _save_state(rows)
+    if writer:
+        writer.flush()
+        summary["persisted"] = writer.written
+        summary["persistFailed"] = [
+            {"reportId": report_id, "error": error} for report_id, error in writer.failed.items()
+        ]
+    summary["changes"].sort(key=lambda change: -abs(change.get("medianChangePercent") or 0))
+    return summary
+
+
+def report_properties():
+    """
+    Return the engine input of every PropertyReport that is not archived.
+    """
+    db = engine_db.get_database()
+    if db is None:
+        raise RuntimeError("No database configured")
+    return [
+        dict(analysis_store.report_property(row[1:]), reportId=row[0])
+        for row in db.query(
+            f'SELECT "id", {analysis_store.REPORT_INPUT_COLUMNS} FROM "PropertyReport" WHERE "isArchived" = %s',
+            (False,)
+        )
+    ]
+
+
+def status():
+    """
+    Summarize the stored state.
+    """
+    conn = _connect()
+    try:
+        count, oldest, newest = conn.execute(
+            "SELECT COUNT(*), MIN(priced_at), MAX(priced_at) FROM repricing_state"
+        ).fetchone()
+        zip_codes = conn.execute("SELECT COUNT(DISTINCT zip_code) FROM repricing_state").fetchone()[0]
+    finally:
+        conn.close()
+    now = time.time()
+    return {
+        "path": state_path(),
+        "properties": count,
+        "zipCodes": zip_codes,
+        "oldestPriceAgeSeconds": round(now - oldest) if oldest else None,
+        "newestPriceAgeSeconds": round(now - newest) if newest else None,
+    }
+
+
+def main():
+    """
+    Re-pricing CLI.
+    """
+    # rentcast_agent loads .env and configures logging before workers start
+    import lane_scheduler
+    import rentcast_agent  # noqa: F401
+
+    args = sys.argv[1:]
+    command = args[0] if args else "run"
+    if command == "run":
+        lane_scheduler.set_lane(lane_scheduler.BULK)
+        lane_scheduler.apply_cpu_priority()
+        workers = int(args[args.index("--workers") + 1]) if "--workers" in args else None
+        if "--reports" in args:
+            properties = report_properties()
+        else:
+            properties = list(analysis_pool.read_properties(sys.stdin))
+        result = reprice(properties, workers, force="--force" in args, persist="--persist" in args)
+    elif command == "status":
+        result = status()
+    else:
+        print(f"Unknown command: {command}", file=sys.stderr)
+        sys.exit(2)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
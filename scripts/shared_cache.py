@@ -0,0 +1,252 @@
+#!/usr/bin/env python3
+"""
+Shared cache tier over the application's Postgres database.
+
+Provider payloads that are useful to every worker (ZIP market data, property
+search results and rental listings) are cached in the existing
+NeighborhoodHistory table, so a ZIP priced by one worker or teammate is
+served to all of them until it goes stale.
+
+    read-through   get() looks the request up by primary key and only
+                   calls the provider on a miss or stale row (or when
+                   called with fresh=True, which also skips the HTTP cache)
+    write-behind   fresh provider payloads are queued and upserted in bulk
+                   by a background thread (and at process exit), so
+                   analyses never wait on the database write
+
+Each cached request gets a deterministic row id derived from the request
+key, which makes writes idempotent upserts and reads primary-key lookups.
+Requests sent with a customer's own RentCast keys get row ids of their own
+(provider_client.scoped_key()), so only the shared pool's rows are shared.
+Engine rows are marked by rawData.kind; their finalScore is 0 because they
+are not neighborhood scores. The ZIP code and analysisDate columns are
+filled so the table's existing indexes cover ZIP and freshness queries.
+
+Environment:
+    SHARED_CACHE_ENABLED          "0" disables the tier (default enabled when
+                                  DATABASE_URL is usable, see engine_db.py)
+    SHARED_CACHE_TTL              default freshness in seconds (default 21600)
+    SHARED_CACHE_MARKET_TTL       freshness of market data (default 86400)
+    SHARED_CACHE_FLUSH_INTERVAL   seconds between write-behind flushes (default 2)
+"""
+import json
+import atexit
+import asyncio
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+
+import engine_db
+import json_backend
+import provider_client
+from engine_settings import env_int, env_float, env_flag
+
+logger = logging.getLogger('rentcast_agent.shared_cache')
+
+KIND_MARKET = "rentcast_market"
+KIND_PROPERTIES = "rentcast_properties"
+KIND_RENTAL_LISTINGS = "rentcast_rental_listings"
+
+# Flush early once this many writes are queued
+MAX_PENDING = 200
+
+_UPSERT = (
+    'INSERT INTO "NeighborhoodHistory" ("id", "zipCode", "analysisDate", "finalScore", "breakdown", "rawData") '
+    'VALUES (%s, %s, %s, %s, %s, %s) '
+    'ON CONFLICT ("id") DO UPDATE SET '
+    '"analysisDate" = EXCLUDED."analysisDate", '
+    '"breakdown" = EXCLUDED."breakdown", '
+    '"rawData" = EXCLUDED."rawData"'
+)
+
+_pending = []
+_pending_lock = threading.Lock()
+_flush_event = threading.Event()
+_flush_thread = None
+
+
+def _database():
+    if not env_flag("SHARED_CACHE_ENABLED", True):
+        return None
+    return engine_db.get_database()
+
+
+def is_enabled():
+    """
+    Return True when a database is configured for the shared tier.
+    """
+    return _database() is not None
+
+
+def ttl_seconds(kind):
+    """
+    Return how long a cached payload of the given kind stays fresh.
+    """
+    if kind == KIND_MARKET:
+        return env_int("SHARED_CACHE_MARKET_TTL", 24 * 60 * 60)
+    return env_int("SHARED_CACHE_TTL", 6 * 60 * 60)
+
+
+def row_id(url, params, credentials=None):
+    """
+    Deterministic NeighborhoodHistory id for a provider request.
+    """
+    key = provider_client.scoped_key(provider_client.request_key("GET", url, params), credentials)
+    return "fr_" + key[:32]
+
+
+def _timestamp(moment):
+    """
+    Format a UTC datetime the way Prisma stores TIMESTAMP(3) values.
+    """
+    return moment.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def lookup(kind, url, params, credentials=None):
+    """
+    Return the cached payload for a request, or None when missing or stale.
+    """
+    db = _database()
+    if db is None:
+        return None
+    cutoff = _utcnow() - timedelta(seconds=ttl_seconds(kind))
+    try:
+        rows = db.query(
+            'SELECT "rawData" FROM "NeighborhoodHistory" WHERE "id" = %s AND "analysisDate" >= %s',
+            (row_id(url, params, credentials), _timestamp(cutoff))
+        )
+    except Exception as e:
+        logger.warning(f"Shared cache read failed: {str(e)}")
+        return None
+    if not rows:
+        return None
+
+    raw = rows[0][0]
+    if isinstance(raw, str):
+        raw = json_backend.loads(raw)
+    if not isinstance(raw, dict) or raw.get("kind") != kind:
+        return None
+    return raw.get("payload")
+
+
+def enqueue(kind, zip_code, url, params, payload, credentials=None):
+    """
+    Queue a provider payload for the next bulk upsert.
+    """
+    if _database() is None:
+        return
+    cache_params = {k: v for k, v in (params or {}).items() if str(k).lower() != "key"}
+    row = (
+        row_id(url, params, credentials),
+        str(zip_code or "")[:5],
+        _timestamp(_utcnow()),
+        0.0,
+        json.dumps({"kind": kind}),
+        json_backend.dumps({"kind": kind, "url": url, "params": cache_params, "payload": payload})
+    )
+    with _pending_lock:
+        _pending.append(row)
+        pending = len(_pending)
+    _start_flusher()
+    if pending >= MAX_PENDING:
+        _flush_event.set()
+
+
+def flush():
+    """
+    Upsert every queued payload in one transaction. Returns rows written.
+    """
+    with _pending_lock:
+        rows = list(_pending)
+        _pending.clear()
+    db = _database()
+    if not rows or db is None:
+        return 0
+
+    # Later writes for the same request win
+    latest = {}
+    for row in rows:
+        latest[row[0]] = row
+    try:
+        written = db.executemany(_UPSERT, list(latest.values()))
+        logger.debug(f"Shared cache flushed {written} rows")
+        return written
+    except Exception as e:
+        logger.warning(f"Shared cache write failed, dropping {len(latest)} rows: {str(e)}")
+        return 0
+
+
+def _flush_loop():
+    interval = env_float("SHARED_CACHE_FLUSH_INTERVAL", 2.0)
+    while True:
+        _flush_event.wait(interval)
+        _flush_event.clear()
+        flush()
+
+
+def _start_flusher():
+    global _flush_thread
+    if _flush_thread is None:
+        _flush_thread = threading.Thread(target=_flush_loop, name="shared-cache-flush", daemon=True)
+        _flush_thread.start()
+
+
+# Whatever is still queued when the process exits is written before it goes
+atexit.register(flush)
+
+
+def reset_after_fork():
+    """
+    Forget queued writes and the flusher thread inherited from a parent
+    process; the child starts its own on first use.
+    """
+    global _flush_thread
+    with _pending_lock:
+        _pending.clear()
+    _flush_thread = None
+
+
+def get(kind, zip_code, url, headers=None, params=None, credentials=None, fresh=False):
+    """
+    Read-through GET for cacheable provider payloads.
+    Serves a fresh shared row when present, unless `fresh` is set; otherwise
+    calls the provider and queues a successful JSON response for
+    write-behind. Returns a response object like provider_client.get().
+    """
+    payload = None if fresh else lookup(kind, url, params, credentials)
+    if payload is not None:
+        logger.info(f"Shared cache hit for {kind} ({zip_code})")
+        return provider_client.ProviderResponse(200, json_backend.dumps_bytes(payload), url=url)
+
+    response = provider_client.get(url, headers=headers, params=params, credentials=credentials, fresh=fresh)
+    if response.status_code == 200 and is_enabled():
+        try:
+            enqueue(kind, zip_code, url, params, json_backend.response_json(response), credentials)
+        except ValueError:
+            pass
+    return response
+
+
+async def get_async(kind, zip_code, url, headers=None, params=None, credentials=None, fresh=False):
+    """
+    Asyncio variant of get(). The database lookup runs in a worker thread
+    so it does not block the event loop.
+    """
+    payload = None if fresh else await asyncio.to_thread(lookup, kind, url, params, credentials)
+    if payload is not None:
+        logger.info(f"Shared cache hit for {kind} ({zip_code})")
+        return provider_client.ProviderResponse(200, json_backend.dumps_bytes(payload), url=url)
+
+    response = await provider_client.get_async(
+        url, headers=headers, params=params, credentials=credentials, fresh=fresh
+    )
+    if response.status_code == 200 and is_enabled():
+        try:
+            enqueue(kind, zip_code, url, params, json_backend.response_json(response), credentials)
+        except ValueError:
+            pass
+    return response
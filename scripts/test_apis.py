@@ -1,143 +1,415 @@
 #!/usr/bin/env python3
+"""
+Concurrent health and latency probe for the external providers.
+
+Every round sends one request to each provider in parallel and times its
+phases separately:
+
+    dns      name resolution
+    connect  TCP handshake
+    tls      TLS handshake (0 for plain HTTP)
+    ttfb     request written to response headers received (server time
+             plus one round trip)
+    total    the whole exchange, from resolution to the last body byte
+
+After N rounds the report gives each provider's status, error and status
+code counts, p50/p90/p95/p99/max/mean of every phase, and a suggested
+request timeout and hedging delay derived from the total-latency tail, for
+tuning PROVIDER_TIMEOUT and hedged requests in the analysis engine.
+
+With --continuous the probe runs until interrupted, appending every sample
+to a JSON lines time series (rotated past SERIES_MAX_BYTES) and printing
+rolling percentiles over the last --window samples after each round.
+
+--stub starts a local stub server that answers for every provider, and
+--base-url sends every probe to another server (e.g. a shared stub) with
+the same paths, so the probe runs offline. Note that live RentCast and
+OpenAI probes count against the account's quota.
+
+Usage:
+    python scripts/test_apis.py [--samples N] [--timeout S] [--only NAMES]
+    python scripts/test_apis.py --continuous [--interval S] [--series PATH] [--window N]
+    python scripts/test_apis.py --stub [--stub-latency MS] [--samples N]
+"""
 import os
 import sys
 import json
-import requests
+import time
+import socket
+import ssl
+import random
+import argparse
+import threading
+import http.client
+import http.server
+from collections import deque
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 load_dotenv(".env.local")
 
-def test_google_maps_api():
-    api_key = os.environ.get("NEXT_PUBLIC_GOOGLE_MAPS_API_KEY")
-    if not api_key:
-        return {"status": "error", "message": "API key not found"}
-    
-    url = f"https://maps.googleapis.com/maps/api/geocode/json?address=1600+Amphitheatre+Parkway,+Mountain+View,+CA&key={api_key}"
+PHASES = ("dns", "connect", "tls", "ttfb", "total")
+PERCENTILES = (50, 90, 95, 99)
+# Rotate the time series file once it grows past this size
+SERIES_MAX_BYTES = 50 * 1024 * 1024
+# Suggested timeout: this multiple of p99 total latency, at least MIN_TIMEOUT_SECONDS
+TIMEOUT_TAIL_FACTOR = 3.0
+MIN_TIMEOUT_SECONDS = 2.0
+
+_ssl_context = ssl.create_default_context()
+
+
+def _google_request(api_key):
+    params = {"address": "1600 Amphitheatre Parkway, Mountain View, CA", "key": api_key}
+    return "GET", "https://maps.googleapis.com/maps/api/geocode/json?" + urlencode(params), {}, None
+
+
+def _google_check(status, payload):
+    if status != 200:
+        return f"HTTP error: {status}"
     try:
-        response = requests.get(url)
-        if response.status_code == 200:
-            data = response.json()
-            if data.get("status") == "OK":
-                return {"status": "success", "message": "Google Maps API is working"}
-            else:
-                return {"status": "error", "message": f"API error: {data.get('status')}"}
-        else:
-            return {"status": "error", "message": f"HTTP error: {response.status_code}"}
-    except Exception as e:
-        return {"status": "error", "message": f"Exception: {str(e)}"}
+        api_status = json.loads(payload).get("status")
+    except ValueError:
+        return "Invalid JSON response"
+    return None if api_status == "OK" else f"API error: {api_status}"
 
-def test_rapidapi():
-    api_key = os.environ.get("RAPIDAPI_KEY")
-    if not api_key:
-        return {"status": "error", "message": "API key not found"}
-    
-    url = "https://rapidapi.p.rapidapi.com/ping"
-    headers = {
-        "X-RapidAPI-Key": api_key,
-        "X-RapidAPI-Host": "rapidapi.p.rapidapi.com"
-    }
+
+def _rapidapi_request(api_key):
+    # The Zillow search the engine uses for comparables
+    params = {"location": "94107", "status_type": "ForRent"}
+    headers = {"X-RapidAPI-Key": api_key, "X-RapidAPI-Host": "zillow-com1.p.rapidapi.com"}
+    return "GET", "https://zillow-com1.p.rapidapi.com/propertyExtendedSearch?" + urlencode(params), headers, None
+
+
+def _attom_request(api_key):
+    params = {"address1": "1600 Amphitheatre Parkway", "address2": "Mountain View, CA"}
+    headers = {"apikey": api_key, "accept": "application/json"}
+    return ("GET", "https://api.gateway.attomdata.com/propertyapi/v1.0.0/property/basicprofile?" + urlencode(params),
+            headers, None)
+
+
+def _openai_request(api_key):
+    # Listing models authenticates like a completion without spending tokens
+    return "GET", "https://api.openai.com/v1/models", {"Authorization": f"Bearer {api_key}"}, None
+
+
+def _rentcast_request(api_key):
+    params = {"address": "123 Main St, San Francisco, CA 94107"}
+    headers = {"X-API-KEY": api_key, "accept": "application/json"}
+    return "GET", "https://api.rentcast.io/v1/avm/rent/long-term?" + urlencode(params), headers, None
+
+
+def _status_check(status, payload):
+    return None if 200 <= status < 300 else f"HTTP error: {status}"
+
+
+# name -> (API key variable, request builder, response check)
+PROVIDERS = {
+    "Google Maps API": ("NEXT_PUBLIC_GOOGLE_MAPS_API_KEY", _google_request, _google_check),
+    "RapidAPI": ("RAPIDAPI_KEY", _rapidapi_request, _status_check),
+    "ATTOM API": ("ATTOM_API_KEY", _attom_request, _status_check),
+    "OpenAI API": ("OPENAI_API_KEY", _openai_request, _status_check),
+    "Rentcast API": ("RENTCAST_API_KEY", _rentcast_request, _status_check),
+}
+
+
+def timed_request(method, url, headers=None, body=None, timeout=10.0):
+    """
+    Send one request on a fresh connection and time each phase.
+    Returns (status, payload, timings in milliseconds).
+    """
+    parts = urlsplit(url)
+    secure = parts.scheme == "https"
+    port = parts.port or (443 if secure else 80)
+    path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    timings = {}
+
+    started = time.perf_counter()
+    family, socktype, proto, _, address = socket.getaddrinfo(parts.hostname, port, type=socket.SOCK_STREAM)[0]
+    resolved = time.perf_counter()
+    timings["dns"] = (resolved - started) * 1000
+
+    sock = socket.socket(family, socktype, proto)
+    sock.settimeout(timeout)
     try:
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            return {"status": "success", "message": "RapidAPI is working"}
+        sock.connect(address)
+        connected = time.perf_counter()
+        timings["connect"] = (connected - resolved) * 1000
+
+        if secure:
+            sock = _ssl_context.wrap_socket(sock, server_hostname=parts.hostname)
+            conn = http.client.HTTPSConnection(parts.hostname, port, timeout=timeout)
         else:
-            return {"status": "error", "message": f"HTTP error: {response.status_code}"}
-    except Exception as e:
-        return {"status": "error", "message": f"Exception: {str(e)}"}
+            conn = http.client.HTTPConnection(parts.hostname, port, timeout=timeout)
+        handshaken = time.perf_counter()
+        timings["tls"] = (handshaken - connected) * 1000
+
+        conn.sock = sock
+        conn.request(method, path, body=body, headers=headers or {})
+        response = conn.getresponse()
+        first_byte = time.perf_counter()
+        timings["ttfb"] = (first_byte - handshaken) * 1000
+
+        payload = response.read()
+        timings["total"] = (time.perf_counter() - started) * 1000
+        return response.status, payload, timings
+    finally:
+        sock.close()
+
 
-def test_attom_api():
-    api_key = os.environ.get("ATTOM_API_KEY")
+def probe(name, base_url=None, timeout=10.0, stub_key=None):
+    """
+    Probe one provider once. Returns a sample dict with ok, status,
+    message and the phase timings, or None when it has no API key.
+    """
+    key_name, build, check = PROVIDERS[name]
+    api_key = stub_key or os.environ.get(key_name)
     if not api_key:
-        return {"status": "error", "message": "API key not found"}
-    
-    url = "https://api.gateway.attomdata.com/propertyapi/v1.0.0/property/basicprofile"
-    headers = {
-        "apikey": api_key,
-        "accept": "application/json"
-    }
-    params = {
-        "address1": "1600 Amphitheatre Parkway",
-        "address2": "Mountain View, CA"
-    }
+        return None
+
+    method, url, headers, body = build(api_key)
+    if base_url:
+        parts = urlsplit(url)
+        url = base_url.rstrip("/") + parts.path + (f"?{parts.query}" if parts.query else "")
+
+    sample = {"time": datetime.now(timezone.utc).isoformat(), "provider": name}
     try:
-        response = requests.get(url, headers=headers, params=params)
-        if response.status_code == 200:
-            return {"status": "success", "message": "ATTOM API is working"}
-        else:
-            return {"status": "error", "message": f"HTTP error: {response.status_code}"}
-    except Exception as e:
-        return {"status": "error", "message": f"Exception: {str(e)}"}
+        status, payload, timings = timed_request(method, url, headers, body, timeout)
+        error = check(status, payload)
+        sample.update(ok=error is None, status=status, message=error, **{p: round(timings[p], 2) for p in PHASES})
+    except (OSError, http.client.HTTPException) as e:
+        # socket.timeout, DNS, TLS and connection errors are all OSErrors
+        sample.update(ok=False, status=None, message=f"Exception: {type(e).__name__}: {str(e)}")
+    return sample
 
-def test_openai_api():
-    api_key = os.environ.get("OPENAI_API_KEY")
-    if not api_key:
-        return {"status": "error", "message": "API key not found"}
-    
-    url = "https://api.openai.com/v1/chat/completions"
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    data = {
-        "model": os.environ.get("OPENAI_MODEL", "gpt-4"),
-        "messages": [{"role": "user", "content": "Hello, this is a test."}],
-        "max_tokens": 10
+
+def run_round(names, base_url=None, timeout=10.0, stub_key=None):
+    """
+    Probe every named provider in parallel. Returns {name: sample or None}.
+    """
+    with ThreadPoolExecutor(max_workers=max(len(names), 1)) as executor:
+        futures = {name: executor.submit(probe, name, base_url, timeout, stub_key) for name in names}
+        return {name: future.result() for name, future in futures.items()}
+
+
+def percentile(values, pct):
+    """
+    Linear-interpolated percentile of a non-empty list.
+    """
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100.0
+    low = int(position)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+def summarize(samples):
+    """
+    Build one provider's report from its samples.
+    """
+    ok_samples = [s for s in samples if s.get("ok")]
+    report = {
+        "samples": len(samples),
+        "ok": len(ok_samples),
+        "statusCodes": {},
+        "errors": {},
     }
-    try:
-        response = requests.post(url, headers=headers, json=data)
-        if response.status_code == 200:
-            return {"status": "success", "message": "OpenAI API is working"}
+    for sample in samples:
+        code = str(sample.get("status"))
+        report["statusCodes"][code] = report["statusCodes"].get(code, 0) + 1
+        if not sample.get("ok"):
+            report["errors"][sample["message"]] = report["errors"].get(sample["message"], 0) + 1
+
+    if not samples:
+        report.update(status="error", message="No samples")
+    elif len(ok_samples) == len(samples):
+        report.update(status="success", message="All probes succeeded")
+    elif ok_samples:
+        report.update(status="degraded", message=f"{len(samples) - len(ok_samples)} of {len(samples)} probes failed")
+    else:
+        report.update(status="error", message=next(iter(report["errors"])))
+
+    # Latency of every probe that got a response, even an error status
+    timed = [s for s in samples if "total" in s]
+    if timed:
+        report["latencyMs"] = {}
+        for phase in PHASES:
+            values = [s[phase] for s in timed]
+            stats = {f"p{pct}": round(percentile(values, pct), 1) for pct in PERCENTILES}
+            stats.update(max=round(max(values), 1), mean=round(sum(values) / len(values), 1))
+            report["latencyMs"][phase] = stats
+        totals = report["latencyMs"]["total"]
+        report["suggested"] = {
+            "timeoutSeconds": round(max(totals["p99"] * TIMEOUT_TAIL_FACTOR / 1000, MIN_TIMEOUT_SECONDS), 1),
+            "hedgeAfterMs": round(totals["p95"]),
+        }
+    return report
+
+
+def report(names, samples_by_name):
+    """
+    Build the full report for the probed providers.
+    """
+    results = {}
+    for name in names:
+        samples = samples_by_name.get(name)
+        if samples is None:
+            results[name] = {"status": "skipped", "message": "API key not found"}
         else:
-            return {"status": "error", "message": f"HTTP error: {response.status_code}, {response.text}"}
-    except Exception as e:
-        return {"status": "error", "message": f"Exception: {str(e)}"}
+            results[name] = summarize(list(samples))
+    return results
 
-def test_rentcast_api():
-    api_key = os.environ.get("RENTCAST_API_KEY")
-    if not api_key:
-        return {"status": "error", "message": "API key not found"}
-    
-    url = "https://api.rentcast.io/v1/avm/rent"
-    headers = {
-        "X-API-KEY": api_key,
-        "Content-Type": "application/json"
-    }
-    params = {
-        "address": "123 Main St",
-        "zipCode": "94107"
-    }
+
+def _append_series(path, samples):
+    """
+    Append samples to the JSON lines time series, rotating a full file to
+    <path>.1 first.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
     try:
-        response = requests.get(url, headers=headers, params=params)
-        if response.status_code == 200:
-            return {"status": "success", "message": "Rentcast API is working"}
+        if os.path.getsize(path) > SERIES_MAX_BYTES:
+            os.replace(path, path + ".1")
+    except OSError:
+        pass
+    with open(path, "a") as f:
+        for sample in samples:
+            f.write(json.dumps(sample) + "\n")
+
+
+def _rolling_line(names, samples_by_name):
+    parts = []
+    for name in names:
+        samples = samples_by_name.get(name)
+        if samples is None:
+            continue
+        totals = [s["total"] for s in samples if "total" in s]
+        ok = sum(1 for s in samples if s.get("ok"))
+        if totals:
+            parts.append(f"{name}: p50 {percentile(totals, 50):.0f}ms p95 {percentile(totals, 95):.0f}ms "
+                         f"ok {ok}/{len(samples)}")
         else:
-            return {"status": "error", "message": f"HTTP error: {response.status_code}, {response.text}"}
-    except Exception as e:
-        return {"status": "error", "message": f"Exception: {str(e)}"}
+            parts.append(f"{name}: ok {ok}/{len(samples)}")
+    return f"[{datetime.now().strftime('%H:%M:%S')}] " + " | ".join(parts)
+
+
+class _StubHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Answers every provider path with a small canned JSON body after the
+    configured latency.
+    """
+    latency_ms = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self):
+        if self.latency_ms:
+            time.sleep(max(random.gauss(self.latency_ms, self.latency_ms / 4), 0) / 1000)
+        if self.path.startswith("/maps/api/geocode"):
+            payload = {"status": "OK", "results": []}
+        elif self.path.startswith("/v1/models"):
+            payload = {"object": "list", "data": []}
+        else:
+            payload = {"stub": True, "path": self.path.split("?")[0]}
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _respond
+    do_POST = _respond
+
+
+def start_stub(latency_ms=0.0):
+    """
+    Start the stub server on a free local port. Returns its base URL.
+    """
+    handler = type("StubHandler", (_StubHandler,), {"latency_ms": latency_ms})
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def print_summary(results):
+    print("\nSummary:")
+    for status in ("success", "degraded", "error", "skipped"):
+        names = [name for name, result in results.items() if result["status"] == status]
+        print(f"{status.capitalize()} APIs ({len(names)}): {', '.join(names)}")
+    for name, result in results.items():
+        if result["status"] in ("degraded", "error", "skipped"):
+            print(f"\n{name} {result['status']}: {result['message']}")
+
 
 def main():
-    results = {
-        "Google Maps API": test_google_maps_api(),
-        "RapidAPI": test_rapidapi(),
-        "ATTOM API": test_attom_api(),
-        "OpenAI API": test_openai_api(),
-        "Rentcast API": test_rentcast_api()
-    }
-    
+    parser = argparse.ArgumentParser(description="Probe provider health and latency.")
+    parser.add_argument("--samples", type=int, default=5, help="rounds to run (default 5)")
+    parser.add_argument("--interval", type=float, default=1.0, help="seconds between rounds (default 1)")
+    parser.add_argument("--timeout", type=float, default=10.0, help="socket timeout in seconds (default 10)")
+    parser.add_argument("--only", help="comma-separated provider names to probe")
+    parser.add_argument("--continuous", action="store_true", help="run until interrupted")
+    parser.add_argument("--series", help="JSON lines time series file "
+                                         "(default logs/provider_latency.jsonl with --continuous)")
+    parser.add_argument("--window", type=int, default=100, help="rolling window per provider (default 100)")
+    parser.add_argument("--stub", action="store_true", help="probe a local stub server instead of the providers")
+    parser.add_argument("--stub-latency", type=float, default=20.0, help="stub response latency in ms (default 20)")
+    parser.add_argument("--base-url", help="send every probe to this server, keeping the provider paths")
+    args = parser.parse_args()
+
+    names = list(PROVIDERS)
+    if args.only:
+        wanted = {n.strip().lower() for n in args.only.split(",")}
+        names = [n for n in names if n.lower() in wanted or n.split()[0].lower() in wanted]
+
+    base_url = args.base_url
+    stub_key = None
+    if args.stub:
+        base_url = start_stub(args.stub_latency)
+        stub_key = "stub"
+    elif base_url:
+        stub_key = "stub"
+
+    series = args.series
+    if args.continuous and not series:
+        series = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs",
+                              "provider_latency.jsonl")
+
+    window = None if not args.continuous else max(args.window, 1)
+    samples_by_name = {}
+    rounds = 0
+    try:
+        while args.continuous or rounds < args.samples:
+            if rounds:
+                time.sleep(args.interval)
+            results = run_round(names, base_url, args.timeout, stub_key)
+            rounds += 1
+            taken = [sample for sample in results.values() if sample is not None]
+            for name, sample in results.items():
+                if sample is not None:
+                    samples_by_name.setdefault(name, deque(maxlen=window)).append(sample)
+            if series and taken:
+                _append_series(series, taken)
+            if args.continuous:
+                print(_rolling_line(names, samples_by_name), file=sys.stderr)
+            if not taken:
+                # Every provider is skipped for lack of a key; more rounds change nothing
+                break
+    except KeyboardInterrupt:
+        pass
+
+    results = report(names, samples_by_name)
     print(json.dumps(results, indent=2))
-    
-    # Summary
-    working_apis = [api for api, result in results.items() if result["status"] == "success"]
-    failing_apis = [api for api, result in results.items() if result["status"] == "error"]
-    
-    print("\nSummary:")
-    print(f"Working APIs ({len(working_apis)}): {', '.join(working_apis)}")
-    print(f"Failing APIs ({len(failing_apis)}): {', '.join(failing_apis)}")
-    
-    for api in failing_apis:
-        print(f"\n{api} error: {results[api]['message']}")
+    print_summary(results)
+
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
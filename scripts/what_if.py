@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+What-if analysis over a fixed comparable set.
+
+Analysts often price one address many times, changing only its size,
+bedrooms or bathrooms to see what each is worth. A what-if request fetches
+the comparables, recent rentals and market summary once and then evaluates
+every variant of the subject against that same comp set:
+
+    adjustment   each comp's rent is adjusted to the variant with the
+                 market's hedonic model, from feature vectors extracted once
+    similarity   the distance, recency and credibility weights do not depend
+                 on the subject and are computed once; the beds, baths and
+                 size kernels are computed once per distinct value on the
+                 grid and reused by every variant that shares it
+    rent range   the outlier screen, weighted median and bootstrap interval
+                 run per variant, with one set of bootstrap resamples for
+                 every variant, so differences between variants come from
+                 the change and not from resampling noise (a variant's range
+                 can therefore differ by a few dollars from a standalone
+                 analysis of it)
+
+Variants with the same size, bedrooms and bathrooms are evaluated once.
+Only those three fields enter the rent estimate, so they are the only fields
+a variant may change.
+
+The request is an ordinary engine input with a "whatIf" object:
+
+    {"address": "...", "zipCode": "94107", "beds": 2, "baths": 1, "squareFeet": 900,
+     "whatIf": {"grid": {"squareFeet": [800, 900, 1000], "beds": [1, 2, 3]},
+                "variants": [{"baths": 2}],
+                "bootstrapSamples": 500}}
+
+"grid" is expanded to every combination of its values and "variants" lists
+further variants; each variant overrides the subject's fields with positive
+numbers (beds may be 0). "bootstrapSamples" is capped at MAX_BOOTSTRAP_SAMPLES (5000).
+
+Environment:
+    WHAT_IF_MAX_VARIANTS   largest number of variants per request (default 1000)
+
+Usage:
+    python scripts/rentcast_agent.py < what_if_request.json
+"""
+import time
+import hashlib
+import logging
+import itertools
+
+import hedonic_model
+import rent_estimator
+import rentcast_agent
+from engine_settings import env_int
+
+logger = logging.getLogger('rentcast_agent.what_if')
+
+# Subject fields a variant may change
+VARIABLE_FIELDS = ("squareFeet", "beds", "baths")
+# Fields a variant may set to zero (a studio has no bedrooms)
+ZERO_ALLOWED = ("beds",)
+# Most bootstrap resamples a request may ask for
+MAX_BOOTSTRAP_SAMPLES = 5000
+
+
+def _number(value):
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def variants_of(spec):
+    """
+    Expand a whatIf object into the list of variant overrides.
+    Raises ValueError for fields that cannot vary, values that are not
+    positive numbers or too many variants.
+    """
+    grid = spec.get("grid") or {}
+    explicit = spec.get("variants") or []
+    if not isinstance(grid, dict) or not isinstance(explicit, list):
+        raise ValueError("whatIf.grid must be an object and whatIf.variants a list of objects")
+    if not all(isinstance(variant, dict) for variant in explicit):
+        raise ValueError("whatIf.grid must be an object and whatIf.variants a list of objects")
+    axes = {field: values if isinstance(values, list) else [values] for field, values in grid.items()}
+    for field, values in list(axes.items()) + [(field, [value]) for variant in explicit for field, value in variant.items()]:
+        if field not in VARIABLE_FIELDS:
+            raise ValueError(
+                f"whatIf cannot vary '{field}'; rent estimates depend only on {', '.join(VARIABLE_FIELDS)}"
+            )
+        for value in values:
+            if not _number(value) or value < 0 or (value == 0 and field not in ZERO_ALLOWED):
+                raise ValueError(f"whatIf value {value!r} for '{field}' is not a positive number")
+
+    variants = []
+    if axes:
+        fields = list(axes)
+        axes = [axes[field] for field in fields]
+        variants.extend(dict(zip(fields, values)) for values in itertools.product(*axes))
+    variants.extend(dict(variant) for variant in explicit)
+
+    limit = env_int("WHAT_IF_MAX_VARIANTS", 1000)
+    if len(variants) > limit:
+        raise ValueError(f"whatIf has {len(variants)} variants; at most {limit} are allowed")
+    return variants
+
+
+def bootstrap_samples(spec):
+    """
+    Return the bootstrap resamples a whatIf object asks for, capped at
+    MAX_BOOTSTRAP_SAMPLES. Raises ValueError when it is not a positive number.
+    """
+    samples = spec.get("bootstrapSamples")
+    if samples is None:
+        return rent_estimator.BOOTSTRAP_SAMPLES
+    if not _number(samples) or samples < 1:
+        raise ValueError(f"whatIf.bootstrapSamples must be a positive integer, not {samples!r}")
+    return min(int(samples), MAX_BOOTSTRAP_SAMPLES)
+
+
+class CompSet:
+    """
+    A subject's comparables prepared once for evaluating many variants.
+    """
+
+    def __init__(self, subject, comps, samples=rent_estimator.BOOTSTRAP_SAMPLES, now=None):
+        self.subject = subject
+        self.samples = samples
+        self.model = hedonic_model.load_model(subject.get("zipCode") or subject.get("zip_code"))
+        # Columns on the unadjusted rents; adjustments are redone per variant
+        raw = [dict(comp, adjustedRent=None) for comp in comps]
+        self.columns = rent_estimator.comp_columns(subject, raw)
+        self.features = [hedonic_model.feature_vector(raw[i]) for i in self.columns["index"]]
+        self.factors = rent_estimator.weight_factors(subject, self.columns, now)
+        digest = hashlib.sha256(repr((self.columns["rent"], self.columns["distance"])).encode()).hexdigest()
+        self.seed = int(digest[:16], 16)
+        self._kernels = {}
+        self._resamples = {}
+        # Size, bedrooms and bathrooms -> result of the variants that have them
+        self.results = {}
+
+    def _kernel(self, name, target):
+        key = (name, target)
+        if key not in self._kernels:
+            scale, transform = rent_estimator.SIMILARITY_KERNELS[name]
+            self._kernels[key] = rent_estimator.similarity_kernel(self.columns[name], target, scale, transform)
+        return self._kernels[key]
+
+    def resamples(self, n):
+        """
+        Return the bootstrap resamples shared by every variant with n comps.
+        """
+        if n not in self._resamples:
+            self._resamples[n] = rent_estimator.resample_counts(n, self.samples, self.seed)
+        return self._resamples[n]
+
+    def evaluate(self, overrides):
+        """
+        Return the rent range and estimate details of the subject with the
+        given fields overridden.
+        """
+        variant = dict(self.subject, **overrides)
+        subject_x = hedonic_model.feature_vector(variant)
+        key = tuple(subject_x[1:])
+        if key in self.results:
+            return dict(self.results[key])
+
+        rents = [
+            hedonic_model.adjusted_rent(self.model, rent, subject_x, comp_x)
+            for rent, comp_x in zip(self.columns["rent"], self.features)
+        ]
+        factors = dict(self.factors)
+        for name, target in rent_estimator.subject_features(variant).items():
+            factors[name] = self._kernel(name, target)
+        weights = rent_estimator.combine_weights(factors)
+
+        keep = [i for i, rent in enumerate(rents) if rent > 0]
+        estimate = None
+        if keep:
+            estimate = rent_estimator.estimate_from_columns(
+                {"index": [self.columns["index"][i] for i in keep], "rent": [rents[i] for i in keep]},
+                [weights[i] for i in keep],
+                self.samples,
+                resamples=self.resamples
+            )
+
+        result = {"modelEstimate": round(hedonic_model.predict(self.model, variant), -1)}
+        if estimate:
+            result["rentRange"] = {
+                "low": int(round(estimate["low"], -1)),
+                "median": int(round(estimate["median"], -1)),
+                "high": int(round(estimate["high"], -1))
+            }
+            result["weightedMean"] = round(estimate["weightedMean"], 2)
+            result["compsUsed"] = estimate["compsUsed"]
+            result["effectiveSampleSize"] = estimate["effectiveSampleSize"]
+        else:
+            result["rentRange"] = None
+        self.results[key] = result
+        return dict(result)
+
+
+def fetch_comparables(subject):
+    """
+    Locate the subject and fetch what the rent estimate needs, once.
+    Returns (estimator comps, market summary row or None).
+    """
+    rentcast_agent.apply_location(subject, rentcast_agent.resolve_location(subject))
+    candidates = rentcast_agent.find_comparable_properties(subject, limit=None)
+    recent_rentals = None
+    if subject.get("analysisDepth") != rentcast_agent.QUICK_DEPTH:
+        recent_rentals = rentcast_agent.fetch_rentcast("recent_rentals", subject)
+    summary, _ = rentcast_agent.get_market_summary(subject)
+    return rentcast_agent.estimator_comparables(candidates, recent_rentals), summary
+
+
+def analyze_what_if(property_details):
+    """
+    Evaluate the whatIf variants of a property. Returns the baseline, one
+    result per variant with its median change from the baseline, and
+    timings.
+    """
+    spec = property_details.get("whatIf") or {}
+    variants = variants_of(spec)
+    samples = bootstrap_samples(spec)
+    subject = {key: value for key, value in property_details.items() if key != "whatIf"}
+
+    started = time.perf_counter()
+    comps, summary = fetch_comparables(subject)
+    fetched = time.perf_counter()
+
+    comp_set = CompSet(subject, comps, samples)
+    baseline = comp_set.evaluate({})
+    base_median = (baseline["rentRange"] or {}).get("median")
+    results = []
+    for overrides in variants:
+        result = comp_set.evaluate(overrides)
+        median = (result["rentRange"] or {}).get("median")
+        result["medianChange"] = median - base_median if median is not None and base_median is not None else None
+        results.append(dict({"variant": overrides}, **result))
+    finished = time.perf_counter()
+    logger.info(
+        f"What-if: {len(variants)} variants ({len(comp_set.results)} distinct) over "
+        f"{len(comp_set.columns['rent'])} comps in {(finished - fetched) * 1000:.1f}ms"
+    )
+
+    analysis = {
+        "baseline": baseline,
+        "variants": results,
+        "compsConsidered": len(comp_set.columns["rent"]),
+        "bootstrapSamples": samples,
+        "timing": {
+            "fetchMs": round((fetched - started) * 1000, 1),
+            "evaluateMs": round((finished - fetched) * 1000, 1)
+        }
+    }
+    if summary:
+        analysis["marketSummary"] = {
+            "zipCode": summary["zip_code"],
+            "medianRent": summary["median_rent"],
+            "averageRent": summary["average_rent"]
+        }
+    return analysis
@@ -0,0 +1,438 @@
+#!/usr/bin/env python3
+"""
+Local US ZIP code reference data.
+
+scripts/data/zip_reference.csv.gz lists every active ZIP code with its
+type, city, state, county, centroid and housing units. It is compiled once into a compact
+binary file in the cache directory, which every process memory-maps:
+
+    index      one slot per possible 5-digit ZIP code holding its record
+               number, so a lookup is a single array access
+    records    fixed-width ZIP, centroid, city/county string offsets, state,
+               type and a slice of the neighbor table
+    neighbors  for each ZIP, the nearest residential ZIPs (by centroid, up
+               to MAX_NEIGHBORS within NEIGHBOR_MILES), closest first
+    grid       residential ZIPs sorted by GRID_DEGREES cell, for reverse
+               lookups from coordinates
+    strings    length-prefixed city and county names
+
+Nothing is parsed at startup and the pages are shared between processes.
+The compiled file is rebuilt automatically when the CSV changes, and can be
+built ahead of time with the "build" command. It is written in the host's
+native byte order.
+
+Reverse lookups and neighbors only consider residential ZIP codes: standard
+(street delivery) ZIPs with at least MIN_HOUSING_UNITS housing units. PO box
+and single-organization ZIPs sit on a building or on the city centroid, and
+so do the building and post office ZIPs the source lists as standard
+(94143, 10118, ...), which have no housing and no rental listings.
+
+Environment:
+    ZIP_REFERENCE_PATH   compiled file (default <cache dir>/zip_reference.bin)
+
+Usage:
+    python scripts/zip_reference.py build
+    python scripts/zip_reference.py zip 94105
+    python scripts/zip_reference.py nearest 37.7885 -122.3939
+"""
+import os
+import sys
+import csv
+import gzip
+import json
+import math
+import mmap
+import time
+import struct
+import bisect
+import logging
+import threading
+from array import array
+from collections import namedtuple
+
+from engine_settings import SCRIPTS_DIR, cache_dir
+
+logger = logging.getLogger('rentcast_agent.zip_reference')
+
+DATA_PATH = os.path.join(SCRIPTS_DIR, 'data', 'zip_reference.csv.gz')
+
+# Grid cell size for the reverse lookup index (about 14 miles of latitude)
+GRID_DEGREES = 0.2
+
+# Neighbor ZIPs stored per ZIP code
+MAX_NEIGHBORS = 8
+NEIGHBOR_MILES = 15.0
+
+# Fewest housing units of a ZIP used as a neighbor or reverse lookup result
+MIN_HOUSING_UNITS = 10
+
+ZIP_TYPES = {"S": "standard", "P": "po_box", "U": "unique"}
+
+ZipRecord = namedtuple(
+    "ZipRecord", "zip_code zip_type city state county latitude longitude neighbors"
+)
+
+_MAGIC = b"FRZR"
+_VERSION = 1
+_INDEX_SLOTS = 100000
+# magic, version, records, grid entries, neighbors offset, grid offset,
+# strings offset, source size, source mtime
+_HEADER = struct.Struct("=4sHxxIIIIIQQ")
+# zip, latitude, longitude, city, county, first neighbor, state, type, neighbor count
+_RECORD = struct.Struct("=IffIII2scB")
+_COORDINATES = struct.Struct("=ff")
+
+# Seconds between checks that the compiled file has not been replaced
+_RECHECK_SECONDS = 5.0
+
+_mapped = None
+_mapped_lock = threading.Lock()
+
+
+def reference_path():
+    """
+    Return the path of the compiled reference file.
+    """
+    return os.environ.get("ZIP_REFERENCE_PATH") or os.path.join(cache_dir(), 'zip_reference.bin')
+
+
+def normalize_zip(value):
+    """
+    Return the 5-digit ZIP code in a value such as 94105, "94105-1234" or
+    "CA 94105", or None.
+    """
+    if value is None:
+        return None
+    if isinstance(value, int):
+        value = f"{value:05d}"
+    digits = "".join(ch for ch in str(value).split("-")[0] if ch.isdigit())
+    return digits[-5:] if len(digits) >= 5 else None
+
+
+def distance_miles(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in miles.
+    """
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 3956 * 2 * math.asin(math.sqrt(min(a, 1.0)))
+
+
+def _cell(latitude, longitude):
+    return (int(math.floor(latitude / GRID_DEGREES)), int(math.floor(longitude / GRID_DEGREES)))
+
+
+def _cell_key(row, col):
+    return ((row + 1024) << 12) | (col + 2048)
+
+
+def _ring_cells(row, col, ring):
+    """
+    Yield the cells exactly `ring` cells away from (row, col).
+    """
+    for r in range(row - ring, row + ring + 1):
+        if abs(r - row) == ring:
+            for c in range(col - ring, col + ring + 1):
+                yield r, c
+        else:
+            yield r, col - ring
+            yield r, col + ring
+
+
+def _read_source(source):
+    rows = []
+    with gzip.open(source, 'rt', encoding='utf-8', newline='') as f:
+        for row in csv.DictReader(f):
+            latitude = float(row["latitude"]) if row["latitude"] else None
+            longitude = float(row["longitude"]) if row["longitude"] else None
+            housing_units = int(row["housing_units"]) if row.get("housing_units") else None
+            rows.append((row["zip_code"], row["type"], row["city"], row["state"],
+                         row["county"], latitude, longitude, housing_units))
+    rows.sort()
+    return rows
+
+
+def _is_residential(row):
+    """
+    Return True for a standard ZIP with a centroid and at least
+    MIN_HOUSING_UNITS housing units. ZIPs without a Census count have no
+    residential tabulation area.
+    """
+    return row[1] == "S" and row[5] is not None and (row[7] or 0) >= MIN_HOUSING_UNITS
+
+
+def _find_neighbors(rows, grid):
+    """
+    Return, per row, the nearest residential ZIPs within NEIGHBOR_MILES.
+    Uses an equirectangular approximation, which is exact enough at these
+    distances to rank neighbors.
+    """
+    neighbors = []
+    for zip_code, _, _, _, _, latitude, longitude, _ in rows:
+        if latitude is None:
+            neighbors.append(())
+            continue
+        row, col = _cell(latitude, longitude)
+        lon_scale = max(math.cos(math.radians(latitude)), 0.1)
+        rings = int(math.ceil(NEIGHBOR_MILES / (69.0 * GRID_DEGREES * lon_scale)))
+        found = []
+        for ring in range(rings + 1):
+            for cell in _ring_cells(row, col, ring):
+                for other in grid.get(cell, ()):
+                    other_zip, other_lat, other_lon = rows[other][0], rows[other][5], rows[other][6]
+                    if other_zip == zip_code:
+                        continue
+                    dy = (other_lat - latitude) * 69.0
+                    dx = (other_lon - longitude) * 69.0 * lon_scale
+                    miles = math.sqrt(dx * dx + dy * dy)
+                    if miles <= NEIGHBOR_MILES:
+                        found.append((miles, other))
+        found.sort()
+        neighbors.append(tuple(other for _, other in found[:MAX_NEIGHBORS]))
+    return neighbors
+
+
+def build(source=None, path=None):
+    """
+    Compile the CSV reference data into the memory-mappable binary format,
+    replacing any existing file atomically. Returns the number of ZIP codes.
+    """
+    source = source or DATA_PATH
+    path = path or reference_path()
+    rows = _read_source(source)
+
+    grid = {}
+    for number, row in enumerate(rows):
+        if _is_residential(row):
+            grid.setdefault(_cell(row[5], row[6]), []).append(number)
+    neighbors = _find_neighbors(rows, grid)
+
+    strings = bytearray(b"\x00")
+    string_offsets = {"": 0}
+
+    def intern(text):
+        if text not in string_offsets:
+            encoded = text.encode("utf-8")[:255]
+            string_offsets[text] = len(strings)
+            strings.append(len(encoded))
+            strings.extend(encoded)
+        return string_offsets[text]
+
+    index = array("I", bytes(4 * _INDEX_SLOTS))
+    records = bytearray()
+    neighbor_table = array("I")
+    for number, (zip_code, zip_type, city, state, county, latitude, longitude, _) in enumerate(rows):
+        index[int(zip_code)] = number + 1
+        records += _RECORD.pack(
+            int(zip_code),
+            latitude if latitude is not None else math.nan,
+            longitude if longitude is not None else math.nan,
+            intern(city), intern(county), len(neighbor_table),
+            state.encode("ascii")[:2], zip_type.encode("ascii")[:1], len(neighbors[number])
+        )
+        neighbor_table.extend(int(rows[other][0]) for other in neighbors[number])
+
+    cells = sorted((_cell_key(*cell), number) for cell, numbers in grid.items() for number in numbers)
+    grid_keys = array("I", (key for key, _ in cells))
+    grid_records = array("I", (number for _, number in cells))
+
+    neighbors_offset = _HEADER.size + index.itemsize * len(index) + len(records)
+    grid_offset = neighbors_offset + neighbor_table.itemsize * len(neighbor_table)
+    strings_offset = grid_offset + 2 * grid_keys.itemsize * len(grid_keys)
+    stat = os.stat(source)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(
+            _MAGIC, _VERSION, len(rows), len(cells), neighbors_offset, grid_offset,
+            strings_offset, stat.st_size, stat.st_mtime_ns
+        ))
+        index.tofile(f)
+        f.write(records)
+        neighbor_table.tofile(f)
+        grid_keys.tofile(f)
+        grid_records.tofile(f)
+        f.write(strings)
+    os.replace(tmp_path, path)
+    logger.info(f"Compiled {len(rows)} ZIP codes to {path}")
+    return len(rows)
+
+
+class _MappedReference:
+    """
+    A memory-mapped compiled reference file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = os.path.getmtime(path)
+        self.checked_at = time.monotonic()
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = _HEADER.unpack_from(self._map, 0)
+        (magic, version, self.count, grid_count, self.neighbors_offset,
+         grid_offset, self.strings_offset, self.source_size, self.source_mtime) = header
+        if magic != _MAGIC or version != _VERSION:
+            self.close()
+            raise ValueError("Unrecognized ZIP reference file")
+        self.records_offset = _HEADER.size + 4 * _INDEX_SLOTS
+        view = memoryview(self._map)
+        self.index = view[_HEADER.size:self.records_offset].cast("I")
+        self.grid_keys = view[grid_offset:grid_offset + 4 * grid_count].cast("I")
+        self.grid_records = view[grid_offset + 4 * grid_count:grid_offset + 8 * grid_count].cast("I")
+
+    def is_current(self, source):
+        try:
+            stat = os.stat(source)
+        except OSError:
+            return True
+        return (stat.st_size, stat.st_mtime_ns) == (self.source_size, self.source_mtime)
+
+    def _string(self, offset):
+        start = self.strings_offset + offset
+        return self._map[start + 1:start + 1 + self._map[start]].decode("utf-8")
+
+    def record_number(self, zip_code):
+        return self.index[int(zip_code)] - 1
+
+    def record(self, number):
+        (zip_int, latitude, longitude, city, county, first_neighbor,
+         state, zip_type, neighbor_count) = _RECORD.unpack_from(self._map, self.records_offset + number * _RECORD.size)
+        start = self.neighbors_offset + 4 * first_neighbor
+        neighbors = struct.unpack_from(f"={neighbor_count}I", self._map, start)
+        return ZipRecord(
+            f"{zip_int:05d}",
+            ZIP_TYPES.get(zip_type.decode("ascii"), zip_type.decode("ascii")),
+            self._string(city),
+            state.decode("ascii"),
+            self._string(county) or None,
+            None if math.isnan(latitude) else round(latitude, 4),
+            None if math.isnan(longitude) else round(longitude, 4),
+            tuple(f"{n:05d}" for n in neighbors)
+        )
+
+    def coordinates(self, number):
+        return _COORDINATES.unpack_from(self._map, self.records_offset + number * _RECORD.size + 4)
+
+    def cell_records(self, row, col):
+        key = _cell_key(row, col)
+        start = bisect.bisect_left(self.grid_keys, key)
+        end = bisect.bisect_right(self.grid_keys, key, start)
+        return self.grid_records[start:end].tolist()
+
+    def close(self):
+        for name in ("index", "grid_keys", "grid_records"):
+            view = getattr(self, name, None)
+            if view is not None:
+                view.release()
+        self._map.close()
+        self._file.close()
+
+
+def _reference():
+    """
+    Return the mapped reference, compiling it first when missing or stale.
+    Returns None when the data cannot be read or compiled.
+    """
+    global _mapped
+    current = _mapped
+    if current is not None and time.monotonic() - current.checked_at < _RECHECK_SECONDS:
+        return current
+
+    path = reference_path()
+    if current is not None and current.path == path:
+        try:
+            if os.path.getmtime(path) == current.mtime:
+                current.checked_at = time.monotonic()
+                return current
+        except OSError:
+            pass
+
+    with _mapped_lock:
+        try:
+            if _mapped is not None:
+                _mapped.close()
+                _mapped = None
+            mapped = _MappedReference(path) if os.path.exists(path) else None
+            if mapped is None or not mapped.is_current(DATA_PATH):
+                if mapped is not None:
+                    mapped.close()
+                build(DATA_PATH, path)
+                mapped = _MappedReference(path)
+            _mapped = mapped
+        except (OSError, ValueError, struct.error, csv.Error) as e:
+            logger.error(f"ZIP reference data unavailable: {str(e)}")
+            return None
+    return _mapped
+
+
+def lookup(zip_code):
+    """
+    Return the ZipRecord for a ZIP code, or None when unknown.
+    """
+    zip_code = normalize_zip(zip_code)
+    reference = _reference() if zip_code else None
+    if reference is None:
+        return None
+    number = reference.record_number(zip_code)
+    return reference.record(number) if number >= 0 else None
+
+
+def neighbors(zip_code):
+    """
+    Return the neighboring residential ZIP codes of a ZIP code, closest first.
+    """
+    record = lookup(zip_code)
+    return list(record.neighbors) if record else []
+
+
+def nearest(latitude, longitude, max_miles=25):
+    """
+    Return (record, miles) for the residential ZIP whose centroid is closest to
+    the coordinates, or None when none lies within max_miles.
+    """
+    reference = _reference()
+    if reference is None:
+        return None
+    row, col = _cell(latitude, longitude)
+    # Longitude cells narrow toward the poles, so search wider there
+    lon_scale = max(math.cos(math.radians(latitude)), 0.1)
+    cell_miles = 69.0 * GRID_DEGREES * lon_scale
+    max_rings = int(math.ceil(max_miles / cell_miles)) + 1
+
+    best = None
+    for ring in range(max_rings + 1):
+        for r, c in _ring_cells(row, col, ring):
+            for number in reference.cell_records(r, c):
+                miles = distance_miles(latitude, longitude, *reference.coordinates(number))
+                if best is None or miles < best[1]:
+                    best = (number, miles)
+        # Every unsearched cell is at least `ring` cells away
+        if best is not None and best[1] <= ring * cell_miles:
+            break
+    if best is None or best[1] > max_miles:
+        return None
+    return reference.record(best[0]), best[1]
+
+
+def main():
+    """
+    Reference data CLI.
+    """
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    if command == "build":
+        count = build()
+        print(json.dumps({"path": reference_path(), "zipCodes": count}, indent=2))
+    elif command == "zip" and len(sys.argv) > 2:
+        record = lookup(sys.argv[2])
+        print(json.dumps(record._asdict() if record else None, indent=2))
+    elif command == "nearest" and len(sys.argv) > 3:
+        found = nearest(float(sys.argv[2]), float(sys.argv[3]))
+        print(json.dumps({"miles": round(found[1], 2), **found[0]._asdict()} if found else None, indent=2))
+    else:
+        print("Usage: zip_reference.py build | zip <zip> | nearest <lat> <lon>", file=sys.stderr)
+        sys.exit(2)
+
+
+if __name__ == "__main__":
+    main()
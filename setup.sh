@@ -38,6 +38,9 @@ echo "Installing Python dependencies..."
 source venv/bin/activate
 pip install -r requirements.txt
 
+# Compile the local ZIP reference dataset used for offline location lookups
+python scripts/zip_reference.py build
+
 # Check if .env.local exists, create template if it doesn't
 if [ ! -f ".env.local" ]; then
     echo "Creating .env.local template..."